@@ -2,14 +2,13 @@
 Change Detection Module for Reddit Pain Point Finder
 变化检测模块 - 检测clusters的显著变化
 """
-import json
 import logging
 import time
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
 from utils.db import db
-from utils.llm_client import llm_client
+from utils.config_loader import load_yaml_config
 
 logger = logging.getLogger(__name__)
 
@@ -33,11 +32,8 @@ class ChangeDetector:
     def _load_config(self) -> Dict[str, Any]:
         """加载配置"""
         try:
-            import yaml
-            config_path = "config/thresholds.yaml"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                return config.get('significant_change_thresholds', {})
+            config = load_yaml_config("config/thresholds.yaml")
+            return config.get('significant_change_thresholds', {})
         except Exception as e:
             logger.error(f"Failed to load config: {e}")
             return self._get_default_config()
@@ -171,63 +167,44 @@ Processing time: {processing_time:.2f}s
     def _calculate_cluster_metrics(self, cluster_id: int) -> Dict[str, Any]:
         """计算cluster的当前指标"""
         try:
-            # 获取cluster的pain_event_ids
-            with db.get_connection("clusters") as conn:
+            with db.get_connection("clusters", readonly=True) as conn:
+                # 获取cluster的pain_event_ids；cluster_size由JSON1在SQLite内计算
                 cursor = conn.execute("""
-                    SELECT pain_event_ids
+                    SELECT pain_event_ids, json_array_length(pain_event_ids) AS cluster_size
                     FROM clusters
                     WHERE id = ?
                 """, (cluster_id,))
                 result = cursor.fetchone()
-                if not result:
+                if not result or not result['cluster_size']:
                     return {}
-                pain_event_ids = json.loads(result['pain_event_ids'])
-
-            if not pain_event_ids:
-                return {}
-
-            # 计算指标
-            with db.get_connection("pain") as conn:
-                placeholders = ','.join('?' for _ in pain_event_ids)
 
                 # 1. Cluster size
-                cluster_size = len(pain_event_ids)
+                cluster_size = result['cluster_size']
+                pain_event_ids_json = result['pain_event_ids']
 
-                # 2. Unique authors
-                cursor = conn.execute(f"""
-                    SELECT COUNT(DISTINCT fp.author) as unique_count
-                    FROM pain_events pe
-                    JOIN filtered_posts fp ON pe.post_id = fp.id
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
-                unique_authors = cursor.fetchone()['unique_count']
-
-                # 3. Cross-subreddit count
-                cursor = conn.execute(f"""
-                    SELECT COUNT(DISTINCT fp.subreddit) as subreddit_count
+                # 2-3, 5. Unique authors / cross-subreddit count / latest extracted_at（一次聚合）
+                cursor = conn.execute("""
+                    SELECT COUNT(DISTINCT fp.author) AS unique_count,
+                           COUNT(DISTINCT fp.subreddit) AS subreddit_count,
+                           MAX(pe.extracted_at) AS latest_at
                     FROM pain_events pe
-                    JOIN filtered_posts fp ON pe.post_id = fp.id
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
-                cross_subreddit_count = cursor.fetchone()['subreddit_count']
+                    LEFT JOIN filtered_posts fp ON pe.post_id = fp.id
+                    WHERE pe.id IN (SELECT value FROM json_each(?))
+                """, (pain_event_ids_json,))
+                aggregates = cursor.fetchone()
+                unique_authors = aggregates['unique_count']
+                cross_subreddit_count = aggregates['subreddit_count']
+                latest_event_extracted_at = aggregates['latest_at']
 
                 # 4. Avg frequency score
-                cursor = conn.execute(f"""
+                cursor = conn.execute("""
                     SELECT pe.frequency
                     FROM pain_events pe
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
+                    WHERE pe.id IN (SELECT value FROM json_each(?))
+                """, (pain_event_ids_json,))
                 frequencies = [row['frequency'] or '' for row in cursor.fetchall()]
                 avg_frequency_score = self._frequency_to_score(frequencies)
 
-                # 5. Latest event extracted_at
-                cursor = conn.execute(f"""
-                    SELECT MAX(pe.extracted_at) as latest_at
-                    FROM pain_events pe
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
-                latest_event_extracted_at = cursor.fetchone()['latest_at']
-
             return {
                 'cluster_size': cluster_size,
                 'unique_authors': unique_authors,
@@ -8,10 +8,12 @@ import time
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import numpy as np
+import orjson
 
-from utils.embedding import pain_clustering
-from utils.llm_client import llm_client
-from utils.db import db
+from utils.embedding import get_pain_clustering
+from utils.llm_client import get_llm_client
+from utils.db import db, decode_embedding
+from utils.config_loader import load_yaml_config
 
 logger = logging.getLogger(__name__)
 
@@ -32,10 +34,8 @@ class PainEventClusterer:
     def _load_thresholds(self) -> Dict[str, Any]:
         """加载阈值配置"""
         try:
-            import yaml
-            with open("config/thresholds.yaml", 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                return config.get("clustering", {}).get("llm_validation", {})
+            config = load_yaml_config("config/thresholds.yaml")
+            return config.get("clustering", {}).get("llm_validation", {})
         except Exception as e:
             logger.error(f"Failed to load clustering thresholds: {e}")
             # 返回默认值
@@ -50,7 +50,7 @@ class PainEventClusterer:
         """找到与目标事件相似的事件"""
         try:
             # 使用相似度搜索找到相似事件
-            similar_events = pain_clustering.find_similar_events(
+            similar_events = get_pain_clustering().find_similar_events(
                 target_event=target_event,
                 candidate_events=candidate_events,
                 threshold=threshold,
@@ -71,7 +71,7 @@ class PainEventClusterer:
         """Use LLM to validate cluster with JTBD extraction"""
         try:
             # Call LLM for cluster validation
-            response = llm_client.cluster_pain_events(pain_events)
+            response = get_llm_client().cluster_pain_events(pain_events)
             validation_result = response["content"]
 
             # Extract workflow_similarity score
@@ -113,13 +113,14 @@ class PainEventClusterer:
         """
         try:
             # 标准化排序以便比较
-            pain_events_json = json.dumps(sorted(pain_event_ids))
+            pain_events_json = orjson.dumps(sorted(pain_event_ids)).decode()
 
             with db.get_connection("clusters") as conn:
+                # json()统一为紧凑格式，新旧写入方式（带/不带空格）的记录都能匹配
                 cursor = conn.execute("""
                     SELECT id, cluster_name, pain_event_ids, created_at, cluster_size
                     FROM clusters
-                    WHERE pain_event_ids = ?
+                    WHERE json(pain_event_ids) = ?
                     LIMIT 1
                 """, (pain_events_json,))
 
@@ -148,8 +149,6 @@ class PainEventClusterer:
             如果找到相似cluster，返回cluster信息；否则返回None
         """
         try:
-            import pickle
-
             # 从配置读取阈值
             if threshold is None:
                 threshold = self.thresholds.get("cluster_similarity_threshold", 0.75)
@@ -181,7 +180,7 @@ class PainEventClusterer:
 
                 for cluster_row in cursor.fetchall():
                     cluster = dict(cluster_row)
-                    event_ids = json.loads(cluster['pain_event_ids'])
+                    event_ids = orjson.loads(cluster['pain_event_ids'])
 
                     # 跳过过小的clusters
                     if cluster['cluster_size'] < 3:
@@ -201,10 +200,10 @@ class PainEventClusterer:
                         for row in pain_cursor.fetchall():
                             if row['embedding_vector']:
                                 try:
-                                    vector = pickle.loads(row['embedding_vector'])
+                                    vector = decode_embedding(row['embedding_vector'])
                                     existing_vectors.append(vector)
                                 except Exception as e:
-                                    logger.debug(f"Failed to unpickle vector: {e}")
+                                    logger.debug(f"Failed to decode vector: {e}")
                                     continue
 
                     if not existing_vectors:
@@ -248,7 +247,7 @@ class PainEventClusterer:
         """
         try:
             existing_id = existing_cluster['id']
-            existing_event_ids = json.loads(existing_cluster['pain_event_ids'])
+            existing_event_ids = orjson.loads(existing_cluster['pain_event_ids'])
             new_event_ids = [e['id'] for e in new_events]
 
             # 合并pain event IDs（去重）
@@ -294,15 +293,15 @@ class PainEventClusterer:
                         product_impact = ?
                     WHERE id = ?
                 """, (
-                    json.dumps(merged_event_ids),
+                    orjson.dumps(merged_event_ids).decode(),
                     len(merged_event_ids),
                     summary_result.get('centroid_summary', ''),
                     summary_result.get('common_pain', ''),
                     summary_result.get('common_context', ''),
-                    json.dumps(summary_result.get('example_events', [])),
+                    orjson.dumps(summary_result.get('example_events', [])).decode(),
                     summary_result.get('job_statement', ''),
-                    json.dumps(summary_result.get('job_steps', [])),
-                    json.dumps(summary_result.get('desired_outcomes', [])),
+                    orjson.dumps(summary_result.get('job_steps', [])).decode(),
+                    orjson.dumps(summary_result.get('desired_outcomes', [])).decode(),
                     summary_result.get('job_context', ''),
                     summary_result.get('customer_profile', ''),
                     summary_result.get('semantic_category', ''),
@@ -437,17 +436,13 @@ class PainEventClusterer:
         start_time = time.time()
 
         try:
-            # 获取所有有嵌入向量的痛点事件，并包含source信息
-            pain_events = self._get_pain_events_with_source_and_embeddings()
+            # 获取有嵌入向量的痛点事件（数量限制在SQL中完成），并包含source信息
+            pain_events = self._get_pain_events_with_source_and_embeddings(limit=limit)
 
             if len(pain_events) < 4:
                 logger.info("Not enough pain events for clustering (need at least 4)")
                 return {"clusters_created": 0, "events_processed": 0}
 
-            # 限制处理数量
-            if len(pain_events) > limit:
-                pain_events = pain_events[:limit]
-
             logger.info(f"Processing {len(pain_events)} pain events for source-aware clustering")
 
             # 按source类型分组
@@ -466,7 +461,7 @@ class PainEventClusterer:
                 logger.info(f"\n=== Processing source: {source_type} ({len(events_in_source)} events) ===")
 
                 # 使用向量聚类
-                vector_clusters = pain_clustering.cluster_pain_events(events_in_source)
+                vector_clusters = get_pain_clustering().cluster_pain_events(events_in_source)
 
                 if not vector_clusters:
                     logger.info(f"No clusters found for source {source_type}")
@@ -514,10 +509,13 @@ Processing time: {processing_time:.2f}s
             logger.error(f"Failed to cluster pain events: {e}")
             raise
 
-    def _get_pain_events_with_source_and_embeddings(self) -> List[Dict[str, Any]]:
-        """获取有嵌入向量且未聚类（cluster_id IS NULL）的痛点事件"""
+    def _get_pain_events_with_source_and_embeddings(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取有嵌入向量且未聚类（cluster_id IS NULL）的痛点事件
+
+        Args:
+            limit: 最多返回的数量，None表示不限制
+        """
         try:
-            import pickle
             with db.get_connection("pain") as conn:
                 # 从posts表获取source信息
                 cursor = conn.execute("""
@@ -529,14 +527,15 @@ Processing time: {processing_time:.2f}s
                     LEFT JOIN posts po ON p.post_id = po.id
                     WHERE p.cluster_id IS NULL
                     ORDER BY p.extracted_at DESC
-                """)
+                    LIMIT ?
+                """, (limit if limit is not None else -1,))
 
                 results = []
                 for row in cursor.fetchall():
                     event_data = dict(row)
                     # 反序列化嵌入向量
                     if event_data["embedding_vector"]:
-                        event_data["embedding_vector"] = pickle.loads(event_data["embedding_vector"])
+                        event_data["embedding_vector"] = decode_embedding(event_data["embedding_vector"])
                     results.append(event_data)
                 return results
         except Exception as e:
@@ -673,7 +672,7 @@ Processing time: {processing_time:.2f}s
     def _summarize_source_cluster(self, pain_events: List[Dict[str, Any]], source_type: str) -> Dict[str, Any]:
         """使用Cluster Summarizer生成source内聚类摘要（包含JTBD）"""
         try:
-            response = llm_client.summarize_source_cluster(pain_events, source_type)
+            response = get_llm_client().summarize_source_cluster(pain_events, source_type)
             summary_result = response.get("content", {})
 
             # 提取JTBD字段（如果存在）
@@ -726,7 +725,7 @@ Processing time: {processing_time:.2f}s
             cluster_info = dict(cluster_data)
 
             # 获取聚类中的痛点事件
-            pain_event_ids = json.loads(cluster_info["pain_event_ids"])
+            pain_event_ids = orjson.loads(cluster_info["pain_event_ids"])
             pain_events = []
 
             with db.get_connection("pain") as conn:
@@ -745,9 +744,9 @@ Processing time: {processing_time:.2f}s
             cluster_info["cluster_summary"] = cluster_summary
 
             # 反序列化JTBD字段
-            cluster_info["job_steps"] = json.loads(cluster_info.get("job_steps", "[]"))
-            cluster_info["desired_outcomes"] = json.loads(cluster_info.get("desired_outcomes", "[]"))
-            cluster_info["example_events"] = json.loads(cluster_info.get("example_events", "[]"))
+            cluster_info["job_steps"] = orjson.loads(cluster_info.get("job_steps", "[]"))
+            cluster_info["desired_outcomes"] = orjson.loads(cluster_info.get("desired_outcomes", "[]"))
+            cluster_info["example_events"] = orjson.loads(cluster_info.get("example_events", "[]"))
 
             return cluster_info
 
@@ -784,7 +783,7 @@ Processing time: {processing_time:.2f}s
             stats["processing_rate"] = 0
 
         # 添加嵌入客户端统计
-        embedding_stats = pain_clustering.embedding_client.get_embedding_statistics()
+        embedding_stats = get_pain_clustering().embedding_client.get_embedding_statistics()
         stats["embedding_stats"] = embedding_stats
 
         return stats
@@ -814,7 +813,7 @@ Processing time: {processing_time:.2f}s
                 clusters = []
                 for row in cursor.fetchall():
                     cluster = dict(row)
-                    cluster["job_steps"] = json.loads(cluster.get("job_steps", "[]"))
+                    cluster["job_steps"] = orjson.loads(cluster.get("job_steps", "[]"))
                     clusters.append(cluster)
 
                 return clusters
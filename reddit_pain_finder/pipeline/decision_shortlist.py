@@ -10,10 +10,9 @@ import os
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
-import yaml
-
-from utils.llm_client import llm_client
+from utils.llm_client import get_llm_client
 from utils.db import db
+from utils.config_loader import load_yaml_config
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +29,7 @@ class DecisionShortlistGenerator:
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """加载配置文件"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = load_yaml_config(config_path)
             return config.get('decision_shortlist', {})
         except Exception as e:
             logger.error(f"Failed to load config: {e}")
@@ -75,7 +73,7 @@ class DecisionShortlistGenerator:
                     f"cluster_size>={min_cluster_size}, trust>={min_trust}")
 
         try:
-            with db.get_connection("clusters") as conn:
+            with db.get_connection("clusters", readonly=True) as conn:
                 cursor = conn.execute("""
                     SELECT
                         o.id as opportunity_id,
@@ -94,17 +92,15 @@ class DecisionShortlistGenerator:
                         c.centroid_summary as cluster_summary
                     FROM opportunities o
                     JOIN clusters c ON o.cluster_id = c.id
-                    WHERE o.raw_total_score >= ?
+                    -- 反连接排除忽略的聚类（LEFT JOIN ... IS NULL，对NULL安全）
+                    LEFT JOIN json_each(?) ignored ON ignored.value = c.cluster_name
+                    WHERE ignored.value IS NULL
+                      AND o.raw_total_score >= ?
                       AND c.cluster_size >= ?
                       AND o.trust_level >= ?
-                      AND c.cluster_name NOT IN (
-                        SELECT value FROM json_each(?)
-                        WHERE json_valid(?) AND json_each.value IS NOT NULL
-                      )
                     ORDER BY o.raw_total_score DESC
-                """, (min_viability, min_cluster_size, min_trust,
-                      json.dumps(list(ignored_clusters)),
-                      json.dumps(list(ignored_clusters))))
+                """, (json.dumps(list(ignored_clusters)),
+                      min_viability, min_cluster_size, min_trust))
 
                 opportunities = [dict(row) for row in cursor.fetchall()]
 
@@ -279,7 +275,7 @@ class DecisionShortlistGenerator:
             messages = [
                 {"role": "user", "content": prompt}
             ]
-            response = llm_client.chat_completion(
+            response = get_llm_client().chat_completion(
                 messages=messages,
                 model_type="main",
                 temperature=0.7,
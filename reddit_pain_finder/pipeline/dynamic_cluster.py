@@ -13,10 +13,11 @@ import time
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
+import orjson
 
 from utils.chroma_client import get_chroma_client
-from utils.llm_client import llm_client
-from utils.db import db
+from utils.llm_client import get_llm_client
+from utils.db import db, decode_embedding
 
 logger = logging.getLogger(__name__)
 
@@ -277,14 +278,15 @@ class DynamicClusterUpdater:
         """
         try:
             cluster_id = cluster['id']
-            existing_event_ids = json.loads(cluster.get('pain_event_ids', '[]'))
+            existing_event_ids = orjson.loads(cluster.get('pain_event_ids', '[]'))
 
             # Add new event
             if pain_event_id not in existing_event_ids:
                 existing_event_ids.append(pain_event_id)
 
-            # Update pain_event
-            with db.get_connection("pain") as conn:
+            # 事件归属和聚类成员在同一个事务中更新（一次提交）
+            with db.get_connection("clusters") as conn:
+                # Update pain_event
                 conn.execute("""
                     UPDATE pain_events
                     SET cluster_id = ?,
@@ -293,10 +295,8 @@ class DynamicClusterUpdater:
                         orphan_since = NULL
                     WHERE id = ?
                 """, (cluster_id, pain_event_id))
-                conn.commit()
 
-            # Update cluster
-            with db.get_connection("clusters") as conn:
+                # Update cluster
                 conn.execute("""
                     UPDATE clusters
                     SET pain_event_ids = ?,
@@ -304,7 +304,7 @@ class DynamicClusterUpdater:
                         created_at = datetime('now')  -- Update to show recent activity
                     WHERE id = ?
                 """, (
-                    json.dumps(sorted(existing_event_ids)),
+                    orjson.dumps(sorted(existing_event_ids)).decode(),
                     len(existing_event_ids),
                     cluster_id
                 ))
@@ -361,6 +361,7 @@ class DynamicClusterUpdater:
             cluster_description = validation_result.get('cluster_description', '')
             workflow_similarity = validation_result.get('workflow_similarity', 0.0)
 
+            # 聚类记录和所有事件的归属更新在同一个事务中提交（一次fsync）
             with db.get_connection("clusters") as conn:
                 cursor = conn.execute("""
                     INSERT INTO clusters (
@@ -373,28 +374,26 @@ class DynamicClusterUpdater:
                     cluster_name,
                     cluster_description,
                     'reddit',  # Default source type
-                    json.dumps(sorted(pain_event_ids)),
+                    orjson.dumps(sorted(pain_event_ids)).decode(),
                     len(pain_event_ids),
                     workflow_similarity,
                     validation_result.get('confidence', 0.0)
                 ))
 
                 cluster_id = cursor.lastrowid
+
+                # Update pain_events
+                conn.executemany("""
+                    UPDATE pain_events
+                    SET cluster_id = ?,
+                        lifecycle_stage = 'active',
+                        last_clustered_at = datetime('now'),
+                        orphan_since = NULL
+                    WHERE id = ?
+                """, [(cluster_id, event_id) for event_id in pain_event_ids])
                 conn.commit()
 
-            # Update pain_events
             for event_id in pain_event_ids:
-                with db.get_connection("pain") as pain_conn:
-                    pain_conn.execute("""
-                        UPDATE pain_events
-                        SET cluster_id = ?,
-                            lifecycle_stage = 'active',
-                            last_clustered_at = datetime('now'),
-                            orphan_since = NULL
-                        WHERE id = ?
-                    """, (cluster_id, event_id))
-                    pain_conn.commit()
-
                 # Update Chroma metadata
                 self.chroma.update_metadata(
                     event_id,
@@ -424,7 +423,7 @@ class DynamicClusterUpdater:
         """
         try:
             # Use existing cluster validation logic
-            response = llm_client.cluster_pain_events(pain_events[:20])  # Limit to 20 for validation
+            response = get_llm_client().cluster_pain_events(pain_events[:20])  # Limit to 20 for validation
             return response.get("content", {})
 
         except Exception as e:
@@ -484,7 +483,7 @@ class DynamicClusterUpdater:
 
             for cluster_row in affected_clusters:
                 cluster_id = cluster_row['id']
-                pain_event_ids = json.loads(cluster_row['pain_event_ids'])
+                pain_event_ids = orjson.loads(cluster_row['pain_event_ids'])
 
                 # Get all pain events in cluster
                 with db.get_connection("pain") as pain_conn:
@@ -511,7 +510,7 @@ class DynamicClusterUpdater:
                         summary_result.get('centroid_summary', ''),
                         summary_result.get('common_pain', ''),
                         summary_result.get('common_context', ''),
-                        json.dumps(summary_result.get('example_events', [])),
+                        orjson.dumps(summary_result.get('example_events', [])).decode(),
                         cluster_id
                     ))
                     conn.commit()
@@ -534,7 +533,7 @@ class DynamicClusterUpdater:
             Summary dict
         """
         try:
-            response = llm_client.summarize_source_cluster(pain_events[:20], 'reddit')
+            response = get_llm_client().summarize_source_cluster(pain_events[:20], 'reddit')
             return response.get("content", {})
 
         except Exception as e:
@@ -591,6 +590,10 @@ def main():
         """)
         pain_events = [dict(row) for row in cursor.fetchall()]
 
+    for event in pain_events:
+        if event['embedding_vector']:
+            event['embedding_vector'] = decode_embedding(event['embedding_vector'])
+
     logger.info(f"Found {len(pain_events)} recent pain events for testing")
 
     # Process
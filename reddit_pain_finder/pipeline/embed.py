@@ -9,7 +9,9 @@ import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from utils.embedding import embedding_client
+import numpy as np
+
+from utils.embedding import EmbeddingClient, get_embedding_client
 from utils.db import db
 from utils.chroma_client import get_chroma_client
 
@@ -30,23 +32,8 @@ class PainEventEmbedder:
 
     def _create_embedding_text(self, pain_event: Dict[str, Any]) -> str:
         """创建用于嵌入的文本"""
-        text_parts = []
-
-        # 核心要素
-        if pain_event.get("actor"):
-            text_parts.append(pain_event["actor"])
-
-        if pain_event.get("context"):
-            text_parts.append(pain_event["context"])
-
-        if pain_event.get("problem"):
-            text_parts.append(pain_event["problem"])
-
-        if pain_event.get("current_workaround"):
-            text_parts.append(pain_event["current_workaround"])
-
-        # 用连接符保持语义结构
-        embedding_text = " | ".join(text_parts)
+        # 核心要素，用连接符保持语义结构
+        embedding_text = EmbeddingClient.pain_event_text(pain_event)
 
         # 检查文本长度
         if len(embedding_text) > 2000:
@@ -72,7 +59,7 @@ class PainEventEmbedder:
                 return None
 
             # 创建嵌入向量
-            embedding = embedding_client.create_embedding(embedding_text)
+            embedding = get_embedding_client().create_embedding(embedding_text)
 
             self.stats["embeddings_created"] += 1
             return embedding
@@ -114,7 +101,7 @@ class PainEventEmbedder:
                 "extracted_at": pain_event_data.get('extracted_at', '') or "",
                 "cluster_id": pain_event_data.get('cluster_id') or 0,
                 "lifecycle_stage": pain_event_data.get('lifecycle_stage', 'orphan'),
-                "embedding_model": embedding_client.model_name
+                "embedding_model": get_embedding_client().model_name
             }
 
             # Save to Chroma
@@ -163,7 +150,7 @@ class PainEventEmbedder:
         self.stats["processing_time"] = processing_time
 
         # 添加嵌入客户端统计
-        embedding_stats = embedding_client.get_embedding_statistics()
+        embedding_stats = get_embedding_client().get_embedding_statistics()
         self.stats["cache_hits"] = embedding_stats.get("cache_hits", 0)
 
         logger.info(f"Embedding complete: {saved_count}/{len(pain_events)} embeddings saved to Chroma")
@@ -243,7 +230,7 @@ class PainEventEmbedder:
             stats["processing_rate"] = 0
 
         # 添加嵌入客户端统计
-        embedding_stats = embedding_client.get_embedding_statistics()
+        embedding_stats = get_embedding_client().get_embedding_statistics()
         stats["embedding_client_stats"] = embedding_stats
 
         return stats
@@ -263,11 +250,8 @@ class PainEventEmbedder:
         logger.info(f"Verifying {limit} embeddings")
 
         try:
-            # 获取所有有嵌入向量的痛点事件
-            pain_events = db.get_all_pain_events_with_embeddings()
-
-            if len(pain_events) > limit:
-                pain_events = pain_events[:limit]
+            # 只读取前limit个有嵌入向量的痛点事件
+            pain_events = db.get_all_pain_events_with_embeddings(limit=limit)
 
             if not pain_events:
                 return {"verified": 0, "issues": []}
@@ -278,7 +262,7 @@ class PainEventEmbedder:
             for event in pain_events:
                 try:
                     embedding = event.get("embedding_vector")
-                    if not embedding:
+                    if embedding is None:
                         issues.append(f"Event {event['id']}: Missing embedding vector")
                         continue
 
@@ -288,12 +272,12 @@ class PainEventEmbedder:
                         continue
 
                     # 检查是否包含有效数值
-                    if not all(isinstance(x, (int, float)) for x in embedding):
+                    if not np.all(np.isfinite(embedding)):
                         issues.append(f"Event {event['id']}: Invalid embedding data types")
                         continue
 
                     # 检查是否全为零（异常）
-                    if all(abs(x) < 1e-6 for x in embedding):
+                    if np.all(np.abs(embedding) < 1e-6):
                         issues.append(f"Event {event['id']}: All-zero embedding vector")
                         continue
 
@@ -3,12 +3,13 @@ Extract Pain module for Reddit Pain Point Finder
 痛点事件抽取模块 - 使用LLM进行结构化抽取
 """
 import json
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import time
 
-from utils.llm_client import llm_client
+from utils.llm_client import get_llm_client, is_json_parse_failure
 from utils.db import db
 
 logger = logging.getLogger(__name__)
@@ -26,59 +27,37 @@ class PainPointExtractor:
             "processing_time": 0.0
         }
 
-    def _extract_from_single_post(self, post_data: Dict[str, Any], retry_count: int = 0) -> List[Dict[str, Any]]:
-        """从单个帖子抽取痛点事件"""
-        max_retries = 2
-        try:
-            title = post_data.get("title", "")
-            body = post_data.get("body", "")
-            subreddit = post_data.get("subreddit", "")
-            upvotes = post_data.get("score", 0)
-            comments_count = post_data.get("num_comments", 0)
-
-            # 调用LLM进行抽取（不再包含评论上下文 - comments功能已移除）
-            response = llm_client.extract_pain_points(
-                title=title,
-                body=body,
-                subreddit=subreddit,
-                upvotes=upvotes,
-                comments_count=comments_count,
-                top_comments=[]  # 传入空列表，不再加载comments
-            )
+    @staticmethod
+    def _is_usable_response(response: Any) -> bool:
+        """LLM响应能否作为抽取结果：content为dict，且不是JSON修复失败的错误占位结果
 
-            extraction_result = response["content"]
-            pain_events = extraction_result.get("pain_events", [])
+        不可用的响应按失败处理，帖子不登记为已抽取，下次运行重试
+        """
+        content = response.get("content") if isinstance(response, dict) else None
+        return isinstance(content, dict) and not is_json_parse_failure(content)
 
-            # 为每个痛点事件添加元数据
-            for event in pain_events:
-                event.update({
-                    "post_id": post_data["id"],
-                    "subreddit": subreddit,
-                    "original_score": upvotes,
-                    "extraction_model": response["model"],
-                    "extraction_timestamp": datetime.now().isoformat(),
-                    "confidence": event.get("confidence", 0.0),
-                    "comments_used": 0,  # comments功能已移除
-                    "evidence_sources": event.get("evidence_sources", ["post"])  # 仅来自post
-                })
+    def _annotate_post_events(self, post_data: Dict[str, Any], response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """为LLM返回的帖子痛点事件添加元数据"""
+        extraction_result = response["content"]
+        pain_events = extraction_result.get("pain_events", [])
 
-            self.stats["total_pain_events"] += len(pain_events)
-            logger.debug(f"Extracted {len(pain_events)} pain events from post {post_data['id']}")
+        # 为每个痛点事件添加元数据
+        for event in pain_events:
+            event.update({
+                "post_id": post_data["id"],
+                "subreddit": post_data.get("subreddit", ""),
+                "original_score": post_data.get("score", 0),
+                "extraction_model": response["model"],
+                "extraction_timestamp": datetime.now().isoformat(),
+                "confidence": event.get("confidence", 0.0),
+                "comments_used": 0,  # comments功能已移除
+                "evidence_sources": event.get("evidence_sources", ["post"])  # 仅来自post
+            })
 
-            return pain_events
+        self.stats["total_pain_events"] += len(pain_events)
+        logger.debug(f"Extracted {len(pain_events)} pain events from post {post_data['id']}")
 
-        except Exception as e:
-            error_msg = f"Failed to extract pain from post {post_data.get('id')}: {e}"
-
-            # 如果是超时错误且还有重试机会
-            if "timeout" in str(e).lower() and retry_count < max_retries:
-                logger.warning(f"{error_msg} (retry {retry_count + 1}/{max_retries})")
-                time.sleep(5)  # 等待5秒后重试
-                return self._extract_from_single_post(post_data, retry_count + 1)
-            else:
-                logger.error(error_msg)
-                self.stats["extraction_errors"] += 1
-                return []
+        return pain_events
 
     def _extract_from_single_comment(self, comment_data: Dict[str, Any], retry_count: int = 0) -> List[Dict[str, Any]]:
         """从单条评论抽取痛点事件 - Phase 2: Include Comments
@@ -102,7 +81,7 @@ class PainPointExtractor:
             logger.debug(f"Loaded parent post context for comment {comment_id}: {parent_post.get('title', 'N/A')[:50]}...")
 
             # 2. 调用LLM进行抽取（comment作为主要来源）
-            response = llm_client.extract_pain_points(
+            response = get_llm_client().extract_pain_points(
                 title=parent_post.get("title", "[Comment context]"),  # 仅作为上下文
                 body=body,  # PRIMARY: 评论本身
                 subreddit=parent_post.get("subreddit", ""),
@@ -277,51 +256,185 @@ class PainPointExtractor:
             logger.error(f"Error enhancing pain event: {e}")
             return pain_event
 
-    def extract_from_posts_batch(self, posts: List[Dict[str, Any]], batch_size: int = 10) -> List[Dict[str, Any]]:
-        """批量从帖子中抽取痛点事件"""
-        logger.info(f"Extracting pain points from {len(posts)} posts")
+    def _extract_with_batch_api(self, posts: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """通过Batch API抽取痛点事件
 
-        all_pain_events = []
+        Returns:
+            (验证并增强后的痛点事件列表, 批处理中失败的帖子ID列表)
+        """
         start_time = time.time()
+        responses = get_llm_client().extract_pain_points_batch_api([
+            {
+                "title": post.get("title", ""),
+                "body": post.get("body", ""),
+                "subreddit": post.get("subreddit", ""),
+                "upvotes": post.get("score", 0),
+                "comments_count": post.get("num_comments", 0),
+                "top_comments": []
+            }
+            for post in posts
+        ])
+
+        pain_events = []
+        failed_posts = []
+        for post, response in zip(posts, responses):
+            # 请求失败或输出无法解析为JSON（_try_fix_json的错误占位结果）的帖子不登记为已抽取
+            if not self._is_usable_response(response):
+                failed_posts.append(post.get("id"))
+                self.stats["extraction_errors"] += 1
+                continue
+            for event in self._annotate_post_events(post, response):
+                if self._validate_pain_event(event):
+                    pain_events.append(self._enhance_pain_event(event, post))
 
-        for i, post in enumerate(posts):
-            if i % 10 == 0:
-                logger.info(f"Processed {i}/{len(posts)} posts")
+        self.stats["total_processed"] = len(posts)
+        self.stats["processing_time"] = time.time() - start_time
+        return pain_events, failed_posts
 
-            # 抽取痛点事件
-            pain_events = self._extract_from_single_post(post)
+    def _save_and_mark_extracted(
+        self,
+        posts: List[Dict[str, Any]],
+        pain_events: List[Dict[str, Any]],
+        failed_posts: List[Any]
+    ) -> int:
+        """保存痛点事件，并登记已处理的帖子（没有抽取出痛点的帖子也不再重复抽取）
 
-            # 验证和增强每个痛点事件
-            for event in pain_events:
-                if self._validate_pain_event(event):
-                    enhanced_event = self._enhance_pain_event(event, post)
-                    all_pain_events.append(enhanced_event)
+        保存不完整时不登记，下次运行重试
+
+        Returns:
+            保存的痛点事件数量
+        """
+        saved_count = self.save_pain_events(pain_events) if pain_events else 0
+        if saved_count == len(pain_events):
+            failed = set(failed_posts)
+            db.mark_posts_extracted([post.get('id') for post in posts if post.get('id') not in failed])
+        return saved_count
 
-            # 添加延迟避免API限制
-            time.sleep(2.0)  # 增加到2秒间隔
+    async def _extract_pipelined(
+        self,
+        posts: List[Dict[str, Any]],
+        save_batch_size: int = 20
+    ) -> Tuple[List[Dict[str, Any]], List[Any], int]:
+        """以asyncio队列串联的流水线抽取痛点：投放帖子组 -> 并发LLM抽取 -> 验证/增强并分批保存
 
-        # 更新统计信息
-        processing_time = time.time() - start_time
-        self.stats["total_processed"] = len(posts)
-        self.stats["processing_time"] = processing_time
+        每组帖子数取api_settings.batch.max_batch_size，多于1个时用一次批量请求抽取整组；
+        队列有界（并发数的2倍），内存占用不随帖子数量增长；并发数取api_settings.concurrency，
+        限流由LLM客户端的令牌桶负责
+
+        Returns:
+            (痛点事件列表, 失败的帖子ID列表, 保存的痛点事件数量)
+        """
+        llm = get_llm_client()
+        api_settings = llm.config.get("api_settings", {})
+        concurrency = api_settings.get("concurrency", 16)
+        group_size = max(api_settings.get("batch", {}).get("max_batch_size", 1), 1)
+        post_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        result_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+        pain_events: List[Dict[str, Any]] = []
+        failed_posts: List[Any] = []
+        saved_total = 0
+        start_time = time.time()
+
+        async def produce():
+            for i in range(0, len(posts), group_size):
+                await post_queue.put(posts[i:i + group_size])
+            # 每个抽取worker一个结束标记
+            for _ in range(concurrency):
+                await post_queue.put(None)
+
+        async def extract_worker():
+            while (group := await post_queue.get()) is not None:
+                items = [
+                    {
+                        "title": post.get("title", ""),
+                        "body": post.get("body", ""),
+                        "subreddit": post.get("subreddit", ""),
+                        "upvotes": post.get("score", 0),
+                        "comments_count": post.get("num_comments", 0)
+                    }
+                    for post in group
+                ]
+                try:
+                    if len(group) > 1:
+                        responses = await llm.aextract_pain_points_batch(items)
+                    else:
+                        responses = [await llm.aextract_pain_points(**items[0], top_comments=[])]
+                except Exception as e:
+                    responses = [e] * len(group)
+                for post, response in zip(group, responses):
+                    await result_queue.put((post, response))
+            await result_queue.put(None)
+
+        async def save_worker():
+            nonlocal saved_total
+            finished_workers = 0
+            done = 0
+            batch_posts, batch_events, batch_failed = [], [], []
+            while finished_workers < concurrency:
+                item = await result_queue.get()
+                if item is None:
+                    finished_workers += 1
+                    continue
 
-        if all_pain_events:
-            avg_confidence = sum(event.get("confidence", 0) for event in all_pain_events) / len(all_pain_events)
-            self.stats["avg_confidence"] = avg_confidence
+                post, response = item
+                batch_posts.append(post)
+                done += 1
+                if isinstance(response, Exception):
+                    logger.error(f"Failed to process post {post.get('id')}: {response}")
+                    batch_failed.append(post.get('id'))
+                    self.stats["extraction_errors"] += 1
+                elif not self._is_usable_response(response):
+                    # JSON无法修复（_try_fix_json的错误占位结果）：按失败处理，下次运行重试
+                    logger.error(f"Unparseable extraction response for post {post.get('id')}")
+                    batch_failed.append(post.get('id'))
+                    self.stats["extraction_errors"] += 1
+                else:
+                    for event in self._annotate_post_events(post, response):
+                        if self._validate_pain_event(event):
+                            batch_events.append(self._enhance_pain_event(event, post))
+
+                if done % 10 == 0:
+                    logger.info(f"Processed {done}/{len(posts)} posts")
+
+                if len(batch_posts) >= save_batch_size:
+                    # 数据库写入放到线程中，事件循环继续接收其它LLM响应
+                    saved_total += await asyncio.to_thread(
+                        self._save_and_mark_extracted, batch_posts, batch_events, batch_failed
+                    )
+                    pain_events.extend(batch_events)
+                    failed_posts.extend(batch_failed)
+                    batch_posts, batch_events, batch_failed = [], [], []
+
+            if batch_posts:
+                saved_total += await asyncio.to_thread(
+                    self._save_and_mark_extracted, batch_posts, batch_events, batch_failed
+                )
+                pain_events.extend(batch_events)
+                failed_posts.extend(batch_failed)
 
-        logger.info(f"Extraction complete: {len(all_pain_events)} pain events from {len(posts)} posts")
-        logger.info(f"Processing time: {processing_time:.2f}s, Avg per post: {processing_time/len(posts):.2f}s")
+        try:
+            await asyncio.gather(
+                produce(),
+                save_worker(),
+                *(extract_worker() for _ in range(concurrency))
+            )
+        finally:
+            # 在同一事件循环内关闭异步客户端的连接池
+            await llm.aclose()
 
-        return all_pain_events
+        self.stats["total_processed"] = len(posts)
+        self.stats["processing_time"] = time.time() - start_time
+        return pain_events, failed_posts, saved_total
 
     def save_pain_events(self, pain_events: List[Dict[str, Any]]) -> int:
         """保存痛点事件到数据库（支持post和comment来源）"""
-        saved_count = 0
+        event_rows = []
 
         for event in pain_events:
             try:
                 # 准备数据库记录
-                event_data = {
+                event_rows.append({
                     "post_id": event["post_id"],
                     "source_type": event.get("source_type", "post"),  # NEW
                     "source_id": event.get("source_id"),              # NEW
@@ -334,17 +447,14 @@ class PainPointExtractor:
                     "emotional_signal": event.get("emotional_signal", ""),
                     "mentioned_tools": event.get("mentioned_tools", []),
                     "extraction_confidence": event.get("confidence", 0.0)
-                }
-
-                # 保存到数据库
-                pain_event_id = db.insert_pain_event(event_data)
-                if pain_event_id:
-                    saved_count += 1
-                    logger.debug(f"Saved pain event {pain_event_id}: {event['problem'][:50]}...")
+                })
 
             except Exception as e:
                 logger.error(f"Failed to save pain event: {e}")
 
+        # 单个事务批量保存到数据库
+        saved_count = db.insert_pain_events(event_rows)
+
         logger.info(f"Saved {saved_count}/{len(pain_events)} pain events to database")
         return saved_count
 
@@ -362,40 +472,15 @@ class PainPointExtractor:
 
             logger.info(f"Found {len(unextracted_posts)} posts to extract from")
 
-            # 记录失败的帖子ID，用于后续跳过
-            failed_posts = []
-
-            # 抽取痛点事件（带失败恢复）
-            pain_events = []
-            for i, post in enumerate(unextracted_posts):
-                if i % 10 == 0:
-                    logger.info(f"Processed {i}/{len(unextracted_posts)} posts")
-
-                try:
-                    # 尝试抽取单个帖子
-                    post_events = self._extract_from_single_post(post)
-
-                    # 验证和增强每个痛点事件
-                    for event in post_events:
-                        if self._validate_pain_event(event):
-                            enhanced_event = self._enhance_pain_event(event, post)
-                            pain_events.append(enhanced_event)
-
-                    logger.debug(f"Successfully processed post {post.get('id')}")
-
-                except Exception as e:
-                    logger.error(f"Failed to process post {post.get('id')}: {e}")
-                    failed_posts.append(post.get('id'))
-                    self.stats["extraction_errors"] += 1
-                    continue
-
-                # 添加延迟避免API限制，使用动态延迟
-                delay = 3.0 + (i % 5)  # 3-7秒动态延迟
-                logger.debug(f"Waiting {delay:.1f}s before next post...")
-                time.sleep(delay)
-
-            # 保存成功处理的痛点事件
-            saved_count = self.save_pain_events(pain_events)
+            # api.use_batch_api开启时整批离线提交（费用减半，等待时间较长）
+            if get_llm_client().config["api"].get("use_batch_api", False):
+                pain_events, failed_posts = self._extract_with_batch_api(unextracted_posts)
+                saved_count = self._save_and_mark_extracted(unextracted_posts, pain_events, failed_posts)
+            else:
+                # 抽取与保存流水线并行：先完成的帖子先保存，LLM请求不等待数据库写入
+                pain_events, failed_posts, saved_count = asyncio.run(
+                    self._extract_pipelined(unextracted_posts)
+                )
 
             # 记录失败统计
             if failed_posts:
@@ -425,7 +510,7 @@ class PainPointExtractor:
             stats["processing_rate"] = 0
 
         # 添加LLM客户端统计
-        llm_stats = llm_client.get_statistics()
+        llm_stats = get_llm_client().get_statistics()
         stats["llm_stats"] = llm_stats
 
         return stats
@@ -8,7 +8,6 @@ import sys
 import time
 import logging
 import praw
-import yaml
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
@@ -16,6 +15,8 @@ from datetime import datetime, timedelta
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+from utils.config_loader import load_yaml_config
+
 # 导入工具模块
 try:
     from utils.db import db
@@ -76,8 +77,7 @@ class RedditSourceFetcher:
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """加载配置文件"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_yaml_config(config_path)
         except Exception as e:
             logger.error(f"Failed to load config from {config_path}: {e}")
             raise
@@ -6,10 +6,11 @@ import os
 import json
 import logging
 import re
-import yaml
 from typing import List, Dict, Any, Set, Tuple
 from datetime import datetime
 
+from utils.config_loader import load_yaml_config
+
 logger = logging.getLogger(__name__)
 
 class PainSignalFilter:
@@ -30,8 +31,7 @@ class PainSignalFilter:
     def _load_thresholds(self, config_path: str) -> Dict[str, Any]:
         """加载阈值配置"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_yaml_config(config_path)
         except Exception as e:
             logger.error(f"Failed to load thresholds from {config_path}: {e}")
             return {}
@@ -39,8 +39,7 @@ class PainSignalFilter:
     def _load_subreddits_config(self, config_path: str) -> Dict[str, Any]:
         """加载子版块配置"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_yaml_config(config_path)
         except Exception as e:
             logger.error(f"Failed to load subreddits config from {config_path}: {e}")
             return {}
@@ -569,11 +568,8 @@ def main():
             filtered_posts = [p for p in filtered_posts if p.get("pain_score", 0) >= args.min_score]
             logger.info(f"After applying min_score threshold: {len(filtered_posts)} posts")
 
-        # 保存过滤结果
-        saved_count = 0
-        for post in filtered_posts:
-            if db.insert_filtered_post(post):
-                saved_count += 1
+        # 保存过滤结果（单个事务批量写入）
+        saved_count = db.insert_filtered_posts(filtered_posts)
 
         logger.info(f"Saved {saved_count}/{len(filtered_posts)} filtered posts to database")
 
@@ -8,7 +8,9 @@ import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from utils.llm_client import llm_client
+import orjson
+
+from utils.llm_client import get_llm_client
 from utils.db import db
 
 logger = logging.getLogger(__name__)
@@ -30,28 +32,35 @@ class OpportunityMapper:
         """丰富聚类数据"""
         try:
             # 获取聚类中的痛点事件详情
-            pain_event_ids = json.loads(cluster_data.get("pain_event_ids", "[]"))
-
-            pain_events = []
-            with db.get_connection("pain") as conn:
-                for event_id in pain_event_ids:
-                    cursor = conn.execute("""
-                        SELECT * FROM pain_events WHERE id = ?
-                    """, (event_id,))
-                    event_data = cursor.fetchone()
-                    if event_data:
-                        pain_events.append(dict(event_data))
-
-            # 添加原始帖子信息
+            pain_event_ids = orjson.loads(cluster_data.get("pain_event_ids", "[]"))
+
+            # 一次查询取回全部事件（json_each展开ID列表，按原顺序返回），
+            # 再一次查询取回对应帖子，避免逐条查询
+            with db.get_connection("pain", readonly=True) as conn:
+                cursor = conn.execute("""
+                    SELECT pe.*
+                    FROM json_each(?) ids
+                    JOIN pain_events pe ON pe.id = ids.value
+                    ORDER BY ids.key
+                """, (orjson.dumps(pain_event_ids).decode(),))
+                pain_events = [dict(row) for row in cursor.fetchall()]
+
+                # 添加原始帖子信息
+                post_ids = list({event["post_id"] for event in pain_events})
+                cursor = conn.execute("""
+                    SELECT fp.id, fp.title, fp.subreddit, fp.score, fp.num_comments, fp.pain_score
+                    FROM json_each(?) ids
+                    JOIN filtered_posts fp ON fp.id = ids.value
+                """, (orjson.dumps(post_ids).decode(),))
+                posts = {}
+                for row in cursor.fetchall():
+                    post_data = dict(row)
+                    posts[post_data.pop("id")] = post_data
+
             for event in pain_events:
-                with db.get_connection("filtered") as conn:
-                    cursor = conn.execute("""
-                        SELECT title, subreddit, score, num_comments, pain_score
-                        FROM filtered_posts WHERE id = ?
-                    """, (event["post_id"],))
-                    post_data = cursor.fetchone()
-                    if post_data:
-                        event.update(dict(post_data))
+                post_data = posts.get(event["post_id"])
+                if post_data:
+                    event.update(post_data)
 
             # 构建丰富的聚类摘要
             enriched_cluster = {
@@ -217,7 +226,7 @@ class OpportunityMapper:
             logger.info(f"Data compression: {original_size} → {compact_size} chars ({reduction_pct:.1f}% reduction)")
 
             # 调用LLM进行机会映射，使用紧凑摘要
-            response = llm_client.map_opportunity(compact_summary)
+            response = get_llm_client().map_opportunity(compact_summary)
 
             opportunity_data = response["content"]
 
@@ -351,7 +360,7 @@ class OpportunityMapper:
                 "cluster_id": cluster_id,
                 "opportunity_name": opportunity.get("name", ""),
                 "description": opportunity.get("description", ""),
-                "current_tools": json.dumps(current_tools),
+                "current_tools": orjson.dumps(current_tools).decode(),
                 "missing_capability": missing_capability,
                 "why_existing_fail": why_existing_fail,
                 "target_users": opportunity.get("target_users", ""),
@@ -362,7 +371,7 @@ class OpportunityMapper:
                 "competition_risk_score": 0.0,
                 "integration_complexity_score": 0.0,
                 "total_score": 0.0,
-                "killer_risks": json.dumps([]),
+                "killer_risks": orjson.dumps([]).decode(),
                 "recommendation": ""
             }
 
@@ -574,15 +583,15 @@ Processing time: {processing_time:.2f}s
             if not cluster_ids:
                 return []
 
-            with db.get_connection("clusters") as conn:
-                placeholders = ','.join('?' for _ in cluster_ids)
-                cursor = conn.execute(f"""
+            # ID列表作为单个JSON参数传入json_each：SQL文本固定，不受绑定参数个数上限限制
+            with db.get_connection("clusters", readonly=True) as conn:
+                cursor = conn.execute("""
                     SELECT id, cluster_name, source_type, centroid_summary,
                            common_pain, pain_event_ids, cluster_size,
                            cluster_description, workflow_confidence, created_at
                     FROM clusters
-                    WHERE id IN ({placeholders})
-                """, cluster_ids)
+                    WHERE id IN (SELECT value FROM json_each(?))
+                """, (orjson.dumps(cluster_ids).decode(),))
 
                 clusters = [dict(row) for row in cursor.fetchall()]
                 return clusters
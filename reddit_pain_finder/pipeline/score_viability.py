@@ -7,11 +7,11 @@ import logging
 import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import yaml
 from pathlib import Path
 
-from utils.llm_client import llm_client
+from utils.llm_client import get_llm_client
 from utils.db import db
+from utils.config_loader import load_yaml_config
 
 logger = logging.getLogger(__name__)
 
@@ -40,8 +40,7 @@ class ViabilityScorer:
         """加载配置文件"""
         try:
             config_path = Path(__file__).parent.parent / "config" / "thresholds.yaml"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+            config = load_yaml_config(str(config_path))
             logger.info(f"Configuration loaded from {config_path}")
             return config
         except Exception as e:
@@ -49,19 +48,22 @@ class ViabilityScorer:
             return {"filtering_rules": {"enabled": False}}
 
     def _calculate_unique_authors(self, pain_event_ids: List[int]) -> int:
-        """计算独立作者数量"""
+        """计算独立作者数量
+
+        事件ID列表以单个JSON参数经json_each传入：SQL文本固定可复用预编译语句，
+        且不受SQLite绑定参数个数上限限制（以下几个聚类统计同理）
+        """
         if not pain_event_ids:
             return 0
 
         try:
             with db.get_connection("pain") as conn:
-                placeholders = ','.join(['?' for _ in pain_event_ids])
-                cursor = conn.execute(f"""
+                cursor = conn.execute("""
                     SELECT COUNT(DISTINCT fp.author) as unique_count
                     FROM pain_events pe
                     JOIN filtered_posts fp ON pe.post_id = fp.id
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
+                    WHERE pe.id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(pain_event_ids),))
                 result = cursor.fetchone()
                 return result['unique_count'] if result else 0
         except Exception as e:
@@ -75,13 +77,12 @@ class ViabilityScorer:
 
         try:
             with db.get_connection("pain") as conn:
-                placeholders = ','.join(['?' for _ in pain_event_ids])
-                cursor = conn.execute(f"""
+                cursor = conn.execute("""
                     SELECT COUNT(DISTINCT fp.subreddit) as subreddit_count
                     FROM pain_events pe
                     JOIN filtered_posts fp ON pe.post_id = fp.id
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
+                    WHERE pe.id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(pain_event_ids),))
                 result = cursor.fetchone()
                 return result['subreddit_count'] if result else 0
         except Exception as e:
@@ -95,12 +96,11 @@ class ViabilityScorer:
 
         try:
             with db.get_connection("pain") as conn:
-                placeholders = ','.join(['?' for _ in pain_event_ids])
-                cursor = conn.execute(f"""
+                cursor = conn.execute("""
                     SELECT pe.frequency
                     FROM pain_events pe
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
+                    WHERE pe.id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(pain_event_ids),))
 
                 frequencies = [row['frequency'] or '' for row in cursor.fetchall()]
                 return self._frequency_to_score(frequencies)
@@ -115,13 +115,12 @@ class ViabilityScorer:
 
         try:
             with db.get_connection("pain") as conn:
-                placeholders = ','.join(['?' for _ in pain_event_ids])
-                cursor = conn.execute(f"""
+                cursor = conn.execute("""
                     SELECT AVG(fp.trust_level) as avg_trust
                     FROM pain_events pe
                     JOIN filtered_posts fp ON pe.post_id = fp.id
-                    WHERE pe.id IN ({placeholders})
-                """, pain_event_ids)
+                    WHERE pe.id IN (SELECT value FROM json_each(?))
+                """, (json.dumps(pain_event_ids),))
                 result = cursor.fetchone()
                 return result['avg_trust'] if result and result['avg_trust'] else 0.5
         except Exception as e:
@@ -533,11 +532,9 @@ class ViabilityScorer:
             logger.error(f"Failed to identify differentiation opportunity: {e}")
             return "Unable to determine"
 
-    def _score_with_llm(self, opportunity_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """使用LLM进行可行性评分"""
-        try:
-            # 构建机会描述文本
-            description = f"""
+    def _build_viability_description(self, opportunity_data: Dict[str, Any]) -> str:
+        """构建机会描述文本"""
+        return f"""
 Opportunity: {opportunity_data.get('opportunity_name', '')}
 
 Description: {opportunity_data.get('description', '')}
@@ -555,8 +552,11 @@ Market Analysis: {opportunity_data.get('market_analysis', {})}
 Competition Analysis: {opportunity_data.get('competition_analysis', {})}
 """
 
+    def _score_with_llm(self, opportunity_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """使用LLM进行可行性评分"""
+        try:
             # 调用LLM进行评分
-            response = llm_client.score_viability(description)
+            response = get_llm_client().score_viability(self._build_viability_description(opportunity_data))
 
             scoring_result = response["content"]
 
@@ -566,6 +566,25 @@ Competition Analysis: {opportunity_data.get('competition_analysis', {})}
             logger.error(f"Failed to score with LLM: {e}")
             return None
 
+    def _score_many_with_llm(self, opportunities: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """并发地为多个机会进行LLM可行性评分，失败的位置返回None"""
+        try:
+            responses = get_llm_client().score_viability_many([
+                self._build_viability_description(opportunity) for opportunity in opportunities
+            ])
+        except Exception as e:
+            logger.error(f"Failed to score with LLM: {e}")
+            return [None] * len(opportunities)
+
+        results = []
+        for opportunity, response in zip(opportunities, responses):
+            if isinstance(response, BaseException):
+                logger.error(f"Failed to score with LLM ({opportunity.get('opportunity_name', '')}): {response}")
+                results.append(None)
+            else:
+                results.append(response["content"])
+        return results
+
     def _combine_scores(self, llm_scores: Dict[str, Any], opportunity_data: Dict[str, Any]) -> Dict[str, Any]:
         """结合LLM评分和规则评分（Phase 3：添加trust_level加权）"""
         try:
@@ -865,16 +884,18 @@ Competition Analysis: {opportunity_data.get('competition_analysis', {})}
             good_count = 0
             excellent_count = 0
 
-            for i, opportunity in enumerate(opportunities):
-                logger.info(f"Scoring opportunity {i+1}/{len(opportunities)}: {opportunity['opportunity_name']}")
+            # 增强机会数据
+            enhanced_opportunities = [self._enhance_opportunity_data(opportunity) for opportunity in opportunities]
 
-                try:
-                    # 增强机会数据
-                    enhanced_opportunity = self._enhance_opportunity_data(opportunity)
+            # LLM评分：所有机会并发请求（并发数见api_settings.concurrency，速率由LLMClient限流）
+            llm_results = self._score_many_with_llm(enhanced_opportunities)
 
-                    # LLM评分
-                    llm_result = self._score_with_llm(enhanced_opportunity)
+            for i, (opportunity, enhanced_opportunity, llm_result) in enumerate(
+                zip(opportunities, enhanced_opportunities, llm_results)
+            ):
+                logger.info(f"Scoring opportunity {i+1}/{len(opportunities)}: {opportunity['opportunity_name']}")
 
+                try:
                     if llm_result:
                         # 结合评分
                         final_scores = self._combine_scores(llm_result, enhanced_opportunity)
@@ -908,9 +929,6 @@ Competition Analysis: {opportunity_data.get('competition_analysis', {})}
                     logger.error(f"Failed to score opportunity {opportunity['opportunity_name']}: {e}")
                     continue
 
-                # 添加延迟避免API限制
-                time.sleep(2)
-
             # ⚠️ Phase 3 关键改动：LLM评分完成后，应用filtering rules（如果启用）
             # 此时所有opportunities都已经有LLM评分了
             if not skip_filtering and self.filtering_rules.get("enabled", False):
@@ -28,7 +28,8 @@ from pipeline.decision_shortlist import DecisionShortlistGenerator
 
 # 导入工具模块
 from utils.db import db
-from utils.llm_client import LLMClient
+from utils.llm_client import close_llm_client
+from utils.config_loader import load_yaml_config
 from utils.performance_monitor import performance_monitor
 
 # 设置日志
@@ -69,10 +70,7 @@ class WiseCollectionPipeline:
     def _load_config(self, config_path: str = "config/llm.yaml") -> Dict[str, Any]:
         """加载配置文件"""
         try:
-            import yaml
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            return config
+            return load_yaml_config(config_path)
         except Exception as e:
             logger.warning(f"Failed to load config from {config_path}: {e}")
             # 返回默认配置
@@ -168,48 +166,51 @@ class WiseCollectionPipeline:
                     performance_monitor.end_stage("filter", 0)
             else:
                 logger.info(f"Filtering {len(unfiltered_posts)} posts")
-                logger.info("Using incremental save mode - each post is saved immediately after processing")
-
-                # 改进：逐个处理并立即保存，避免批量失败导致数据丢失
-                for i, post in enumerate(unfiltered_posts):
-                    if i % 100 == 0:
-                        logger.info(f"Processed {i}/{len(unfiltered_posts)} posts, saved: {saved_count}, failed: {failed_count}")
-
-                    try:
-                        # 过滤单个帖子
-                        passed, filter_result = filter.filter_post(post)
-
-                        if passed:
-                            # 为帖子添加过滤结果
-                            filtered_post = post.copy()
-                            filtered_post.update({
-                                "pain_score": filter_result["pain_score"],
-                                "pain_keywords": filter_result.get("matched_keywords", []),
-                                "pain_patterns": filter_result.get("matched_patterns", []),
-                                "emotional_intensity": filter_result.get("emotional_intensity", 0.0),
-                                "filter_reason": "pain_signal_passed",
-                                "aspiration_keywords": filter_result.get("matched_aspirations", []),
-                                "aspiration_score": filter_result.get("aspiration_score", 0.0),
-                                "pass_type": filter_result.get("pass_type", "pain"),
-                                "engagement_score": filter_result.get("engagement_score", 0.0),
-                                "trust_level": filter_result.get("trust_level", 0.5)
-                            })
-
-                            # 立即保存到数据库
-                            if db.insert_filtered_post(filtered_post):
-                                saved_count += 1
-                            else:
-                                logger.warning(f"Failed to save post {post.get('id')}")
+                logger.info("Using incremental save mode - posts are committed every 100 posts")
+
+                # 改进：逐个处理并保存，每100个帖子在一个bulk_session中提交一次（一次fsync）；
+                # 单个帖子失败不影响其它帖子，中断时最多丢失当前未提交的一批
+                commit_every = 100
+                for chunk_start in range(0, len(unfiltered_posts), commit_every):
+                    logger.info(f"Processed {chunk_start}/{len(unfiltered_posts)} posts, saved: {saved_count}, failed: {failed_count}")
+
+                    with db.bulk_session("filtered"):
+                        for post in unfiltered_posts[chunk_start:chunk_start + commit_every]:
+                            try:
+                                # 过滤单个帖子
+                                passed, filter_result = filter.filter_post(post)
+
+                                if passed:
+                                    # 为帖子添加过滤结果
+                                    filtered_post = post.copy()
+                                    filtered_post.update({
+                                        "pain_score": filter_result["pain_score"],
+                                        "pain_keywords": filter_result.get("matched_keywords", []),
+                                        "pain_patterns": filter_result.get("matched_patterns", []),
+                                        "emotional_intensity": filter_result.get("emotional_intensity", 0.0),
+                                        "filter_reason": "pain_signal_passed",
+                                        "aspiration_keywords": filter_result.get("matched_aspirations", []),
+                                        "aspiration_score": filter_result.get("aspiration_score", 0.0),
+                                        "pass_type": filter_result.get("pass_type", "pain"),
+                                        "engagement_score": filter_result.get("engagement_score", 0.0),
+                                        "trust_level": filter_result.get("trust_level", 0.5)
+                                    })
+
+                                    # 保存到数据库（随本批次一起提交）
+                                    if db.insert_filtered_post(filtered_post):
+                                        saved_count += 1
+                                    else:
+                                        logger.warning(f"Failed to save post {post.get('id')}")
+                                        failed_count += 1
+                                        failed_posts.append(post.get('id'))
+                                # 如果未通过过滤，不保存（这是正常的）
+
+                            except Exception as e:
+                                logger.error(f"Error processing post {post.get('id')}: {e}")
                                 failed_count += 1
                                 failed_posts.append(post.get('id'))
-                        # 如果未通过过滤，不保存（这是正常的）
-
-                    except Exception as e:
-                        logger.error(f"Error processing post {post.get('id')}: {e}")
-                        failed_count += 1
-                        failed_posts.append(post.get('id'))
-                        # 继续处理下一个帖子，不中断整个流程
-                        continue
+                                # 继续处理下一个帖子，不中断整个流程
+                                continue
 
                 post_result = {
                     "processed": len(unfiltered_posts),
@@ -506,6 +507,14 @@ class WiseCollectionPipeline:
                 logger.info(f"   • LLM Calls: {monitor_summary['total_llm_calls']:,}")
                 logger.info(f"   • Total Tokens: {monitor_summary['total_tokens']:,}")
                 logger.info(f"   • Est. Cost: ${monitor_summary['estimated_cost_usd']:.4f} USD")
+                for stage_name, stage in monitor_summary["llm_stages"].items():
+                    logger.info(
+                        f"   • LLM [{stage_name}]: {stage['calls']} calls, "
+                        f"cache hit {stage['cache_hit_ratio']:.0%}, "
+                        f"{stage['retries']} retries ({stage['backoff_seconds']:.1f}s backoff), "
+                        f"{stage['errors']} errors, "
+                        f"p50 {stage['latency_p50_seconds']:.2f}s / p99 {stage['latency_p99_seconds']:.2f}s"
+                    )
 
                 # 保存metrics到文件
                 if save_metrics:
@@ -1003,6 +1012,9 @@ def main():
     except Exception as e:
         logger.error(f"Pipeline failed: {e}")
         sys.exit(1)
+    finally:
+        # 关闭全局LLM客户端的连接池和缓存连接
+        close_llm_client()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
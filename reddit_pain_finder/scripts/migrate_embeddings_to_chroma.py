@@ -22,6 +22,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from utils.chroma_client import ChromaClient
+from utils.db import decode_embedding
 
 logging.basicConfig(
     level=logging.INFO,
@@ -103,13 +104,11 @@ def migrate_embeddings_to_chroma(
     migrated_count = 0
 
     for row in cursor.fetchall():
-        import pickle
-
         pain_event_id, problem, context, extracted_at, cluster_id, lifecycle_stage, vector_blob, model = row
 
         # Deserialize embedding vector
         try:
-            embedding = pickle.loads(vector_blob)
+            embedding = decode_embedding(vector_blob)
             # Convert to list if it's a numpy array
             if hasattr(embedding, 'tolist'):
                 embedding = embedding.tolist()
@@ -193,7 +192,7 @@ def migrate_embeddings_to_chroma(
 
         if test_row:
             test_id, test_vector_blob = test_row
-            test_vector = pickle.loads(test_vector_blob)
+            test_vector = decode_embedding(test_vector_blob)
 
             # Convert to list if needed
             if hasattr(test_vector, 'tolist'):
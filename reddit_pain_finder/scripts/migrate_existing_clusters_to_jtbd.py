@@ -6,7 +6,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.db import db
-from utils.llm_client import llm_client
+from utils.llm_client import get_llm_client, is_json_parse_failure
 import json
 import logging
 import time
@@ -14,6 +14,39 @@ import time
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _jtbd_input(cluster_dict: dict) -> dict:
+    """构建JTBD生成所需的聚类数据"""
+    return {
+        "cluster_name": cluster_dict["cluster_name"],
+        "cluster_description": cluster_dict.get("cluster_description", ""),
+        "common_pain": cluster_dict.get("common_pain", ""),
+        "common_context": cluster_dict.get("common_context", ""),
+        "example_events": json.loads(cluster_dict.get("example_events", "[]"))
+    }
+
+def _save_jtbd(conn, cluster_id: int, jtbd_content: dict):
+    """写入JTBD字段"""
+    conn.execute("""
+        UPDATE clusters
+        SET job_statement = ?,
+            job_steps = ?,
+            desired_outcomes = ?,
+            job_context = ?,
+            customer_profile = ?,
+            semantic_category = ?,
+            product_impact = ?
+        WHERE id = ?
+    """, (
+        jtbd_content.get("job_statement", ""),
+        json.dumps(jtbd_content.get("job_steps", [])),
+        json.dumps(jtbd_content.get("desired_outcomes", [])),
+        jtbd_content.get("job_context", ""),
+        jtbd_content.get("customer_profile", ""),
+        jtbd_content.get("semantic_category", ""),
+        jtbd_content.get("product_impact", 0.0),
+        cluster_id
+    ))
+
 def migrate_cluster(cluster_id: int) -> bool:
     """为单个cluster生成JTBD"""
     try:
@@ -47,37 +80,12 @@ def migrate_cluster(cluster_id: int) -> bool:
             # 生成JTBD
             logger.info(f"Generating JTBD for cluster {cluster_id}: {cluster_dict['cluster_name']}")
 
-            jtbd_result = llm_client.generate_jtbd_from_cluster({
-                "cluster_name": cluster_dict["cluster_name"],
-                "cluster_description": cluster_dict.get("cluster_description", ""),
-                "common_pain": cluster_dict.get("common_pain", ""),
-                "common_context": cluster_dict.get("common_context", ""),
-                "example_events": json.loads(cluster_dict.get("example_events", "[]"))
-            })
+            jtbd_result = get_llm_client().generate_jtbd_from_cluster(_jtbd_input(cluster_dict))
 
             jtbd_content = jtbd_result.get("content", {})
 
             # 更新数据库
-            cursor.execute("""
-                UPDATE clusters
-                SET job_statement = ?,
-                    job_steps = ?,
-                    desired_outcomes = ?,
-                    job_context = ?,
-                    customer_profile = ?,
-                    semantic_category = ?,
-                    product_impact = ?
-                WHERE id = ?
-            """, (
-                jtbd_content.get("job_statement", ""),
-                json.dumps(jtbd_content.get("job_steps", [])),
-                json.dumps(jtbd_content.get("desired_outcomes", [])),
-                jtbd_content.get("job_context", ""),
-                jtbd_content.get("customer_profile", ""),
-                jtbd_content.get("semantic_category", ""),
-                jtbd_content.get("product_impact", 0.0),
-                cluster_id
-            ))
+            _save_jtbd(conn, cluster_id, jtbd_content)
 
             conn.commit()
             logger.info(f"✅ Migrated cluster {cluster_id}")
@@ -87,6 +95,48 @@ def migrate_cluster(cluster_id: int) -> bool:
         logger.error(f"Failed to migrate cluster {cluster_id}: {e}")
         return False
 
+def migrate_clusters_offline(cluster_ids: list, poll_interval: int = 60) -> int:
+    """通过Batch API一次性提交所有cluster的JTBD请求（费用减半，等待时间较长）"""
+    # ID列表作为单个JSON参数传入json_each，不受绑定参数个数上限限制
+    with db.get_connection("clusters", readonly=True) as conn:
+        clusters = [dict(row) for row in conn.execute("""
+            SELECT id, cluster_name, cluster_description, common_pain,
+                   common_context, example_events
+            FROM clusters
+            WHERE id IN (SELECT value FROM json_each(?))
+            ORDER BY id
+        """, (json.dumps(cluster_ids),))]
+
+    if not clusters:
+        return 0
+
+    batch_id = get_llm_client().submit_offline_batch([
+        get_llm_client().build_jtbd_job(_jtbd_input(cluster)) for cluster in clusters
+    ])
+
+    while True:
+        results = get_llm_client().poll_batch(batch_id, len(clusters))
+        if results is not None:
+            break
+        logger.info(f"Offline batch {batch_id} still running, checking again in {poll_interval}s")
+        time.sleep(poll_interval)
+
+    success_count = 0
+    with db.get_connection("clusters") as conn:
+        for cluster, result in zip(clusters, results):
+            if result is None:
+                logger.error(f"Failed to migrate cluster {cluster['id']}: no batch result")
+                continue
+            if is_json_parse_failure(result["content"]):
+                # 不写入空的JTBD字段，下次迁移时重试
+                logger.error(f"Failed to migrate cluster {cluster['id']}: unparseable JTBD response")
+                continue
+            _save_jtbd(conn, cluster["id"], result.get("content", {}))
+            success_count += 1
+        conn.commit()
+
+    return success_count
+
 def main():
     """迁移所有现有clusters"""
     with db.get_connection("clusters") as conn:
@@ -106,12 +156,16 @@ def main():
         logger.info("No clusters need migration")
         return
 
-    success_count = 0
-    for i, cluster_id in enumerate(cluster_ids, 1):
-        logger.info(f"\n[{i}/{len(cluster_ids)}] Processing cluster {cluster_id}")
-        if migrate_cluster(cluster_id):
-            success_count += 1
-            time.sleep(2)  # 避免API限流
+    # LLM_BATCH_MODE=1时走离线Batch API
+    if os.getenv("LLM_BATCH_MODE") == "1":
+        success_count = migrate_clusters_offline(cluster_ids)
+    else:
+        success_count = 0
+        for i, cluster_id in enumerate(cluster_ids, 1):
+            logger.info(f"\n[{i}/{len(cluster_ids)}] Processing cluster {cluster_id}")
+            if migrate_cluster(cluster_id):
+                success_count += 1
+                time.sleep(2)  # 避免API限流
 
     logger.info(f"\n=== Migration Complete ===")
     logger.info(f"Successfully migrated: {success_count}/{len(cluster_ids)}")
@@ -199,7 +199,8 @@ Examples:
             }
 
             with open(args.export, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, ensure_ascii=False)
+                # cross_source_validation是只读映射（MappingProxyType），导出时转为dict
+                json.dump(export_data, f, indent=2, ensure_ascii=False, default=dict)
 
             logger.info(f"Exported to {args.export}")
 
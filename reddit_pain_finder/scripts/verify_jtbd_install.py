@@ -48,8 +48,9 @@ def main():
     print("\n[3/3] 验证代码模块...")
     try:
         # 检查LLM客户端
-        from utils.llm_client import llm_client
-        if hasattr(llm_client, 'generate_jtbd_from_cluster'):
+        # 只检查类定义，不创建客户端（不需要API密钥）
+        from utils.llm_client import LLMClient
+        if hasattr(LLMClient, 'generate_jtbd_from_cluster'):
             print("✅ LLM客户端已更新 (generate_jtbd_from_cluster存在)")
         else:
             print("❌ LLM客户端未更新")
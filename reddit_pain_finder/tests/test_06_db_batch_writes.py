@@ -0,0 +1,321 @@
+"""
+Test 6: Batch writes in WiseCollectionDB
+验证批量写入（单事务 + executemany）的正确性
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.db import WiseCollectionDB
+
+
+# 迁移脚本添加的列（新建库时不在基础表结构中）
+MIGRATION_COLUMNS = [
+    ("filtered_posts", "author TEXT"),
+    ("pain_events", "source_type TEXT DEFAULT 'post'"),
+    ("pain_events", "source_id TEXT"),
+    ("pain_events", "parent_post_id TEXT"),
+]
+
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """临时数据库"""
+    test_db = WiseCollectionDB(str(tmp_path / "data"))
+    with test_db.get_connection("raw") as conn:
+        for table, column in MIGRATION_COLUMNS:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        conn.commit()
+    return test_db
+
+
+def _post(post_id):
+    return {
+        "id": post_id,
+        "title": f"title {post_id}",
+        "body": "body",
+        "subreddit": "test",
+        "url": f"https://example.com/{post_id}",
+        "score": 10,
+        "num_comments": 2,
+        "pain_score": 0.8,
+        "pain_keywords": ["slow"],
+    }
+
+
+def test_insert_filtered_posts_batch(temp_db):
+    """批量插入过滤帖子，跳过无效记录"""
+    posts = [_post(f"reddit_{i}") for i in range(50)]
+    posts.append(_post(""))            # 空ID
+    posts.append({"id": "reddit_bad"})  # 缺少必填字段
+
+    saved = temp_db.insert_filtered_posts(posts)
+    assert saved == 50
+
+    rows = temp_db.get_filtered_posts(limit=100)
+    assert len(rows) == 50
+    assert rows[0]["pain_keywords"] == '["slow"]'
+
+
+def test_insert_pain_events_batch(temp_db):
+    """批量插入痛点事件"""
+    temp_db.insert_filtered_posts([_post("reddit_1")])
+    events = [
+        {"post_id": "reddit_1", "problem": f"problem {i}", "mentioned_tools": ["excel"]}
+        for i in range(20)
+    ]
+    events.append({"post_id": "reddit_1"})  # 缺少problem
+
+    saved = temp_db.insert_pain_events(events)
+    assert saved == 20
+
+    with temp_db.get_connection("pain", readonly=True) as conn:
+        count = conn.execute("SELECT COUNT(*) FROM pain_events").fetchone()[0]
+    assert count == 20
+
+    # 已提取的帖子不再出现在待抽取列表中
+    assert temp_db.get_filtered_posts() == []
+
+
+def test_batch_rolls_back_on_error(temp_db):
+    """批次内出错时整体回滚"""
+    with temp_db.get_connection("filtered") as conn:
+        with pytest.raises(Exception):
+            with temp_db._transaction(conn):
+                conn.execute("DELETE FROM filtered_posts")
+                conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+    temp_db.insert_filtered_posts([_post("reddit_1")])
+    with temp_db.get_connection("filtered") as conn:
+        with pytest.raises(Exception):
+            with temp_db._transaction(conn):
+                conn.execute("DELETE FROM filtered_posts")
+                raise RuntimeError("boom")
+
+    assert len(temp_db.get_filtered_posts()) == 1
+
+
+def test_insert_pain_embeddings_batch(temp_db):
+    """批量插入嵌入向量并按float32读回"""
+    temp_db.insert_filtered_posts([_post("reddit_1")])
+    temp_db.insert_pain_events([
+        {"post_id": "reddit_1", "problem": f"problem {i}"} for i in range(3)
+    ])
+
+    items = [(i + 1, [0.1 * i, 0.2, 0.3], "test-model") for i in range(3)]
+    assert temp_db.insert_pain_embeddings(items) == 3
+    assert temp_db.insert_pain_embedding(1, [1.0, 0.0, 0.0], "test-model")
+
+    events = {e["id"]: e for e in temp_db.get_all_pain_events_with_embeddings()}
+    assert len(events) == 3
+    assert events[1]["embedding_vector"].tolist() == [1.0, 0.0, 0.0]
+    assert events[3]["embedding_vector"].dtype.name == "float32"
+
+
+def test_mark_posts_extracted(temp_db):
+    """已抽取（含无痛点）的帖子不再返回"""
+    temp_db.insert_filtered_posts([_post(f"reddit_{i}") for i in range(3)])
+    temp_db.insert_pain_events([{"post_id": "reddit_0", "problem": "p"}])
+    assert temp_db.mark_posts_extracted(["reddit_1"]) == 1
+
+    remaining = [p["id"] for p in temp_db.get_filtered_posts()]
+    assert remaining == ["reddit_2"]
+
+
+def test_get_top_opportunities_returns_rows(temp_db):
+    """机会查询直接返回sqlite3.Row，按列名访问"""
+    import sqlite3
+
+    cluster_id = temp_db.insert_cluster({
+        "cluster_name": "c1",
+        "cluster_description": "desc",
+        "source_type": "reddit",
+        "centroid_summary": "summary",
+        "common_pain": "pain",
+        "pain_event_ids": [],
+        "cluster_size": 0,
+    })
+    temp_db.insert_opportunity({
+        "cluster_id": cluster_id,
+        "opportunity_name": "opp",
+        "description": "desc",
+        "total_score": 0.9,
+    })
+
+    rows = temp_db.get_top_opportunities()
+    assert len(rows) == 1
+    assert isinstance(rows[0], sqlite3.Row)
+    assert rows[0]["opportunity_name"] == "opp"
+    assert rows[0]["cluster_name"] == "c1"
+
+
+def _raw_post(post_id):
+    return {
+        "id": post_id,
+        "source_id": post_id,
+        "title": f"title {post_id}",
+        "url": f"https://example.com/{post_id}",
+        "score": 1,
+        "num_comments": 0,
+    }
+
+
+def test_bulk_session_commits_once(temp_db):
+    """bulk_session内的单条写入在会话退出时统一提交"""
+    def visible_count():
+        with temp_db.get_connection("raw", readonly=True) as conn:
+            return conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    with temp_db.bulk_session("raw") as s:
+        for i in range(10):
+            assert s.insert_raw_post(_raw_post(f"reddit_{i}"))
+        # 会话未结束前，其它连接看不到未提交的写入
+        assert visible_count() == 0
+
+    assert visible_count() == 10
+
+
+def test_bulk_session_rolls_back_on_error(temp_db):
+    """会话中抛出异常时全部回滚"""
+    with pytest.raises(RuntimeError):
+        with temp_db.bulk_session("raw") as s:
+            s.insert_raw_post(_raw_post("reddit_1"))
+            raise RuntimeError("boom")
+
+    assert temp_db.get_unprocessed_posts() == []
+    # 会话结束后单条写入恢复逐条提交
+    assert temp_db.insert_raw_post(_raw_post("reddit_2"))
+    assert [p["id"] for p in temp_db.get_unprocessed_posts()] == ["reddit_2"]
+
+
+def test_cross_source_validated_opportunities(temp_db):
+    """已对齐聚类的机会通过跨源验证"""
+    for name, aligned in [("aligned_cluster", "AP_01"), ("plain_cluster", None)]:
+        cluster_id = temp_db.insert_cluster({
+            "cluster_name": name,
+            "cluster_description": "desc",
+            "source_type": "reddit",
+            "centroid_summary": "summary",
+            "common_pain": "pain",
+            "pain_event_ids": [],
+            "cluster_size": 0,
+        })
+        temp_db.insert_opportunity({
+            "cluster_id": cluster_id,
+            "opportunity_name": f"opp for {name}",
+            "description": "desc",
+        })
+        if aligned:
+            temp_db.update_cluster_alignment_status(name, "aligned", aligned)
+
+    validated = temp_db.get_cross_source_validated_opportunities()
+    assert [o["cluster_name"] for o in validated] == ["aligned_cluster"]
+    assert validated[0]["cross_source_validation"]["validation_level"] == 1
+    # 共享的验证结果是只读的，一行的修改不会影响其它行和后续调用
+    with pytest.raises(TypeError):
+        validated[0]["cross_source_validation"]["validation_level"] = 0
+
+    everything = temp_db.get_cross_source_validated_opportunities(
+        min_validation_level=0, include_validated_only=False
+    )
+    assert len(everything) == 2
+
+
+def test_cross_source_validation_matches_cluster_name(temp_db):
+    """同名聚类的任一记录已对齐时，机会也视为通过验证"""
+    first_id = temp_db.insert_cluster({
+        "cluster_name": "reddit_01",
+        "cluster_description": "desc",
+        "pain_event_ids": [],
+        "cluster_size": 0,
+    })
+    temp_db.update_cluster_alignment_status("reddit_01", "aligned", "AP_02")
+    second_id = temp_db.insert_cluster({
+        "cluster_name": "reddit_01",
+        "cluster_description": "desc",
+        "pain_event_ids": [],
+        "cluster_size": 0,
+    })
+    with temp_db.get_connection("clusters") as conn:
+        conn.execute("UPDATE clusters SET aligned_problem_id = NULL WHERE id = ?", (second_id,))
+        conn.commit()
+    temp_db.insert_opportunity({
+        "cluster_id": second_id,
+        "opportunity_name": "opp",
+        "description": "desc",
+    })
+
+    validated = temp_db.get_cross_source_validated_opportunities()
+    assert len(validated) == 1
+    assert "AP_02" in validated[0]["cross_source_validation"]["evidence"]
+    assert first_id != second_id
+
+
+def test_reader_pool_reuses_connections(temp_db):
+    """只读连接用完归还连接池，跨线程复用"""
+    import threading
+
+    with temp_db.get_connection("raw", readonly=True) as outer:
+        # 嵌套借出时拿到另一个连接
+        with temp_db.get_connection("raw", readonly=True) as inner:
+            assert inner is not outer
+
+    seen = []
+
+    def worker():
+        with temp_db.get_connection("raw", readonly=True) as conn:
+            seen.append(conn)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    assert seen[0] in (outer, inner)
+
+
+def test_clusters_for_opportunity_mapping_skips_mapped(temp_db):
+    """默认只返回尚未映射机会的聚类，force时返回全部"""
+    cluster_ids = [
+        temp_db.insert_cluster({
+            "cluster_name": f"cluster_{i}",
+            "cluster_description": "desc",
+            "pain_event_ids": [],
+            "cluster_size": 0,
+        })
+        for i in range(3)
+    ]
+    for _ in range(2):
+        temp_db.insert_opportunity({
+            "cluster_id": cluster_ids[0],
+            "opportunity_name": "opp",
+            "description": "desc",
+        })
+
+    unmapped = temp_db.get_clusters_for_opportunity_mapping()
+    assert sorted(c["id"] for c in unmapped) == cluster_ids[1:]
+    assert len(temp_db.get_clusters_for_opportunity_mapping(force=True)) == 3
+
+
+def test_score_statistics_buckets(temp_db):
+    """相似度汇总与分桶在一条语句中计算"""
+    for i, similarity in enumerate([0.9, 0.85, 0.7, 0.2]):
+        cluster_id = temp_db.insert_cluster({
+            "cluster_name": f"cluster_{i}",
+            "cluster_description": "desc",
+            "pain_event_ids": [],
+            "cluster_size": 0,
+        })
+        with temp_db.get_connection("clusters") as conn:
+            conn.execute("UPDATE clusters SET workflow_similarity = ? WHERE id = ?",
+                         (similarity, cluster_id))
+            conn.commit()
+
+    stats = temp_db.get_score_statistics()
+    assert stats["workflow_similarity"]["total_clusters"] == 4
+    assert stats["workflow_similarity"]["max_similarity"] == 0.9
+    assert stats["workflow_similarity_distribution"] == {"high": 2, "medium": 1, "low": 1}
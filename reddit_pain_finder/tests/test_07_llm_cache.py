@@ -0,0 +1,118 @@
+"""
+Test 7: LLM response cache
+验证LLM响应缓存的键计算与读写，以及语义缓存的相似度命中
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.llm_cache import LLMResponseCache, SemanticResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """临时缓存数据库"""
+    response_cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+    yield response_cache
+    response_cache.close()
+
+
+MESSAGES = [
+    {"role": "system", "content": "You are a pain signal validator."},
+    {"role": "user", "content": "这个工具太慢了"},
+]
+
+
+def test_key_depends_on_all_request_params():
+    """模型、消息、温度、max_tokens、json_mode任一不同，键都不同"""
+    base = LLMResponseCache.make_key("model-a", MESSAGES, 0.1, 400, True)
+    assert base == LLMResponseCache.make_key("model-a", list(MESSAGES), 0.1, 400, True)
+
+    variants = [
+        LLMResponseCache.make_key("model-b", MESSAGES, 0.1, 400, True),
+        LLMResponseCache.make_key("model-a", MESSAGES[:1], 0.1, 400, True),
+        LLMResponseCache.make_key("model-a", MESSAGES, 0.0, 400, True),
+        LLMResponseCache.make_key("model-a", MESSAGES, 0.1, 800, True),
+        LLMResponseCache.make_key("model-a", MESSAGES, 0.1, 400, False),
+    ]
+    assert base not in variants
+    assert len(set(variants)) == len(variants)
+
+
+def test_get_set_roundtrip(cache):
+    """写入后按键读回同样的结果，未命中返回None"""
+    key = LLMResponseCache.make_key("model-a", MESSAGES, 0.1, 400, True)
+    assert cache.get(key) is None
+
+    result = {
+        "content": {"is_pain_point": True, "keywords": ["慢"]},
+        "model": "model-a",
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        "request_time": 1.2,
+    }
+    assert cache.set(key, result)
+    assert cache.get(key) == result
+
+    # 缓存跨实例持久化
+    reopened = LLMResponseCache(cache.cache_path)
+    assert reopened.get(key) == result
+    reopened.close()
+
+    assert cache.clear() == 1
+    assert cache.get(key) is None
+
+
+def test_memory_layer_and_ttl(tmp_path, monkeypatch):
+    """进程内LRU按容量淘汰，超过ttl的条目视为未命中"""
+    response_cache = LLMResponseCache(str(tmp_path / "llm_cache.db"), ttl=60, memory_size=2)
+    keys = [LLMResponseCache.make_key(f"model-{i}", MESSAGES, 0.1, 400, True) for i in range(3)]
+    for i, key in enumerate(keys):
+        assert response_cache.set(key, {"content": i, "model": f"model-{i}"})
+    assert list(response_cache._memory) == keys[1:]
+
+    # 被淘汰的条目从SQLite读回，返回值的修改不影响缓存
+    hit = response_cache.get(keys[0])
+    assert hit == {"content": 0, "model": "model-0"}
+    hit["content"] = "mutated"
+    assert response_cache.get(keys[0])["content"] == 0
+    assert list(response_cache._memory) == [keys[2], keys[0]]
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert response_cache.get(keys[0]) is None
+    response_cache.close()
+
+    # 重新打开时删除过期条目
+    reopened = LLMResponseCache(str(tmp_path / "llm_cache.db"), ttl=60)
+    assert reopened._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0] == 0
+    reopened.close()
+
+
+def test_semantic_cache_threshold_and_namespace(tmp_path):
+    """相似度不低于阈值且namespace相同才命中，重新打开后向量从SQLite载入"""
+    cache_path = str(tmp_path / "semantic.db")
+    semantic_cache = SemanticResponseCache(cache_path, threshold=0.9)
+    stored = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    result = {"content": {"pain_events": []}, "model": "model-a"}
+    assert semantic_cache.get("ns", stored) is None
+    assert semantic_cache.set("ns", stored, result)
+
+    near = np.array([0.95, np.sqrt(1 - 0.95 ** 2), 0.0], dtype=np.float32)
+    far = np.array([0.8, 0.6, 0.0], dtype=np.float32)
+    assert semantic_cache.get("ns", near) == result
+    assert semantic_cache.get("ns", far) is None
+    assert semantic_cache.get("other", near) is None
+    semantic_cache.close()
+
+    reopened = SemanticResponseCache(cache_path, threshold=0.9)
+    assert reopened.get("ns", near) == result
+    assert reopened.clear() == 1
+    assert reopened.get("ns", near) is None
+    reopened.close()
@@ -0,0 +1,63 @@
+"""
+Test 8: Performance monitor LLM metrics
+验证按阶段记录LLM调用、缓存命中、重试与耗时分位数
+"""
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.performance_monitor import PerformanceMonitor
+
+
+USAGE = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}
+
+
+def test_llm_stage_summary():
+    """成功、缓存命中、失败与重试分别计数，耗时按阶段计算分位数"""
+    monitor = PerformanceMonitor()
+    for i in range(1, 101):
+        monitor.record_llm_call("pain_extraction", USAGE, request_time=i / 100)
+    monitor.record_llm_call("pain_extraction", cache_hit=True)
+    monitor.record_llm_retry("pain_extraction", 1.5)
+    monitor.record_llm_retry("pain_extraction", 2.5)
+    monitor.record_llm_call("clustering", request_time=3.0, failed=True)
+
+    summary = monitor.get_summary()
+    assert summary["total_llm_calls"] == 100
+    assert summary["total_tokens"] == 1500
+
+    extraction = summary["llm_stages"]["pain_extraction"]
+    assert extraction["calls"] == 100
+    assert extraction["cache_hits"] == 1
+    assert extraction["cache_hit_ratio"] == round(1 / 101, 4)
+    assert extraction["retries"] == 2
+    assert extraction["backoff_seconds"] == 4.0
+    assert extraction["latency_p50_seconds"] == 0.5
+    assert extraction["latency_p99_seconds"] == 0.99
+
+    clustering = summary["llm_stages"]["clustering"]
+    assert clustering["calls"] == 0
+    assert clustering["errors"] == 1
+    assert clustering["latency_p99_seconds"] == 3.0
+
+
+def test_save_metrics_includes_stage_summary(tmp_path):
+    """保存的指标文件包含各阶段的缓存命中率与耗时分位数，且可重新加载"""
+    monitor = PerformanceMonitor()
+    monitor.record_llm_call("viability_scoring", USAGE, request_time=0.4)
+
+    metrics_file = tmp_path / "metrics.json"
+    monitor.save_metrics(str(metrics_file))
+
+    saved = json.loads(metrics_file.read_text(encoding="utf-8"))
+    stage = saved["llm_calls"]["calls_by_stage"]["viability_scoring"]
+    assert stage["latency_p50_seconds"] == 0.4
+    assert stage["cache_hit_ratio"] == 0.0
+
+    reloaded = PerformanceMonitor.load_metrics(str(metrics_file))
+    reloaded.record_llm_call("viability_scoring", USAGE)
+    assert reloaded.get_summary()["llm_stages"]["viability_scoring"]["calls"] == 2
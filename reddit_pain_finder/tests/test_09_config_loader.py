@@ -0,0 +1,33 @@
+"""
+Test 9: Cached YAML config loader
+验证配置解析结果按(路径, mtime, 大小)缓存，且返回值相互独立
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import config_loader
+from utils.config_loader import load_yaml_config
+
+
+def test_cached_until_file_changes(tmp_path):
+    """同一文件只解析一次，修改后重新解析；调用方修改返回值不影响缓存"""
+    config_path = tmp_path / "thresholds.yaml"
+    config_path.write_text("clustering:\n  min_size: 3\n", encoding="utf-8")
+    config_loader._parse_config.cache_clear()
+
+    first = load_yaml_config(str(config_path))
+    first["clustering"]["min_size"] = 99
+    second = load_yaml_config(str(config_path))
+    assert second == {"clustering": {"min_size": 3}}
+    assert config_loader._parse_config.cache_info().misses == 1
+
+    config_path.write_text("clustering:\n  min_size: 5\n", encoding="utf-8")
+    stat = config_path.stat()
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_yaml_config(str(config_path)) == {"clustering": {"min_size": 5}}
+    assert config_loader._parse_config.cache_info().misses == 2
@@ -0,0 +1,110 @@
+"""
+Test 10: LLM streaming responses
+验证流式响应在JSON闭合后仍读取到用量数据块，并丢弃JSON之后的输出；
+用量用于结算令牌桶
+"""
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.llm_client import LLMClient
+from utils.rate_limiter import RateLimiter
+
+USAGE = SimpleNamespace(prompt_tokens=100, completion_tokens=20, total_tokens=120)
+
+
+def _chunk(content=None, usage=None):
+    """构造流式数据块；只带用量的最后一块choices为空"""
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _FakeStream:
+    """记录被读取的数据块数量与是否关闭"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+    async def _aiter(self):
+        for chunk in self:
+            yield chunk
+
+    def __aiter__(self):
+        return self._aiter()
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeAsyncStream(_FakeStream):
+    async def close(self):
+        self.closed = True
+
+
+def _chunks():
+    return [
+        _chunk('```json\n{"workflow_name": '),
+        _chunk('"ci"} trailing'),
+        _chunk(" explanation"),
+        _chunk(usage=USAGE),
+        _chunk("never read"),
+    ]
+
+
+def test_usage_survives_early_json_close():
+    """JSON闭合后继续读取到用量数据块，之后立即关闭连接"""
+    stream = _FakeStream(_chunks())
+    response = LLMClient._read_stream(stream, json_mode=True)
+
+    assert response.choices[0].message.content == '{"workflow_name": "ci"}'
+    assert response.usage is USAGE
+    assert stream.consumed == 4
+    assert stream.closed
+
+
+def test_async_usage_survives_early_json_close():
+    """异步读取与同步读取行为一致"""
+    stream = _FakeAsyncStream(_chunks())
+    response = asyncio.run(LLMClient._aread_stream(stream, json_mode=True))
+
+    assert response.choices[0].message.content == '{"workflow_name": "ci"}'
+    assert response.usage is USAGE
+    assert stream.consumed == 4
+    assert stream.closed
+
+
+def test_stream_without_usage_reads_to_end():
+    """服务端不返回用量时读取到流结束，用量为None"""
+    stream = _FakeStream([_chunk('{"a": 1}'), _chunk(" tail")])
+    response = LLMClient._read_stream(stream, json_mode=True)
+
+    assert response.choices[0].message.content == '{"a": 1}'
+    assert response.usage is None
+    assert stream.consumed == 2
+
+
+def test_streamed_response_settles_token_bucket():
+    """流式响应的实际用量用于结算令牌桶，退还按max_tokens多预约的配额"""
+    endpoint = SimpleNamespace(token_limiter=RateLimiter(10000))
+    estimated = 2000
+    endpoint.token_limiter.acquire(estimated)
+
+    response = LLMClient._read_stream(_FakeStream(_chunks()), json_mode=True)
+    LLMClient._settle_tokens(endpoint, estimated, response)
+
+    # 补充速率很低，这里只比较到整数附近
+    assert endpoint.token_limiter._tokens == pytest.approx(10000 - USAGE.total_tokens, abs=1)
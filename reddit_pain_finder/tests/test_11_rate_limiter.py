@@ -0,0 +1,62 @@
+"""
+Test 11: Rate limiter
+验证令牌桶的预约、等待时间计算与按实际用量结算（退还/补扣）
+"""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    """冻结time.monotonic，令牌桶不随真实时间补充"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_reserve_and_wait(frozen_clock):
+    """配额不足时返回按欠额计算的等待时间，时间推进后按速率补充"""
+    limiter = RateLimiter(600)  # 每秒补充10
+    assert limiter._reserve(600) == 0.0
+    assert limiter._reserve(50) == pytest.approx(5.0)
+
+    frozen_clock[0] += 5.0
+    assert limiter._reserve(0) == 0.0
+
+
+def test_refund_returns_overestimate(frozen_clock):
+    """实际用量少于预约时退还差额，之后的请求不再等待"""
+    limiter = RateLimiter(1000)
+    estimated, actual = 900, 120
+    limiter.acquire(estimated)
+    assert limiter._reserve(0) == 0.0
+
+    # 退还前再预约300需要等待；退还后配额足够
+    limiter.refund(estimated - actual)
+    assert limiter._tokens == pytest.approx(1000 - actual)
+    assert limiter._reserve(300) == 0.0
+
+
+def test_refund_caps_at_capacity_and_charges_shortfall(frozen_clock):
+    """退还不超过桶容量；实际用量超过预约时补扣，不等待"""
+    limiter = RateLimiter(1000)
+    limiter.refund(500)
+    assert limiter._tokens == pytest.approx(1000)
+
+    limiter.acquire(100)
+    limiter.refund(100 - 400)
+    assert limiter._tokens == pytest.approx(600)
+
+
+def test_rejects_non_positive_quota():
+    with pytest.raises(ValueError):
+        RateLimiter(0)
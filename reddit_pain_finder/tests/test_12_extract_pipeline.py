@@ -0,0 +1,219 @@
+"""
+Test 12: Pipelined pain extraction
+验证流水线抽取的记账：失败与无法解析的响应计入failed_posts、按批保存（含最后不满一批）、
+只有事件全部保存成功时才登记已抽取的帖子；以及多帖子批量请求的分组、解析与逐个回退
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pipeline.extract_pain as extract_pain
+from utils.db import WiseCollectionDB
+from utils.llm_client import LLMClient
+
+
+MIGRATION_COLUMNS = [
+    ("filtered_posts", "author TEXT"),
+    ("pain_events", "source_type TEXT DEFAULT 'post'"),
+    ("pain_events", "source_id TEXT"),
+    ("pain_events", "parent_post_id TEXT"),
+]
+
+FAILING_POST = "reddit_3"
+UNPARSEABLE_POST = "reddit_21"
+
+
+def _fake_response(post_id):
+    """按帖子返回一个痛点事件；指定的帖子抛出异常或返回JSON解析失败的占位结果"""
+    if post_id == FAILING_POST:
+        raise RuntimeError("retries exhausted")
+    if post_id == UNPARSEABLE_POST:
+        content = {"error": "Failed to parse JSON", "raw_content": "not json"}
+    else:
+        content = {"pain_events": [{
+            "problem": f"deploys take thirty minutes for {post_id}",
+            "context": "ci",
+            "confidence": 0.8,
+        }]}
+    return {"content": content, "model": "fake-model", "usage": {}, "request_time": 0.0}
+
+
+class FakeLLM:
+    """替代LLMClient，记录每次批量请求的帖子数"""
+
+    def __init__(self, max_batch_size=1):
+        self.config = {"api_settings": {"concurrency": 4, "batch": {"max_batch_size": max_batch_size}}}
+        self.batch_sizes = []
+        self.closed = False
+
+    async def aextract_pain_points(self, title, **kwargs):
+        await asyncio.sleep(0)
+        return _fake_response(title.split()[-1])
+
+    async def aextract_pain_points_batch(self, items):
+        self.batch_sizes.append(len(items))
+        return await asyncio.gather(
+            *(self.aextract_pain_points(**item) for item in items), return_exceptions=True
+        )
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """临时数据库，替换extract_pain模块使用的全局db"""
+    test_db = WiseCollectionDB(str(tmp_path / "data"))
+    with test_db.get_connection("raw") as conn:
+        for table, column in MIGRATION_COLUMNS:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+        conn.commit()
+    monkeypatch.setattr(extract_pain, "db", test_db)
+    return test_db
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(extract_pain, "get_llm_client", lambda: llm)
+    return llm
+
+
+def _posts(count):
+    return [
+        {
+            "id": f"reddit_{i}",
+            "title": f"title reddit_{i}",
+            "body": "body",
+            "subreddit": "test",
+            "url": f"https://example.com/{i}",
+            "score": 10,
+            "num_comments": 2,
+            "pain_score": 0.8,
+            "pain_keywords": ["slow"],
+        }
+        for i in range(count)
+    ]
+
+
+def test_pipelined_extraction_bookkeeping(temp_db, fake_llm):
+    """25个帖子：每20个保存一批再保存剩余5个；失败和无法解析的帖子不登记，下次运行重试"""
+    posts = _posts(25)
+    temp_db.insert_filtered_posts(posts)
+
+    extractor = extract_pain.PainPointExtractor()
+    pain_events, failed_posts, saved = asyncio.run(extractor._extract_pipelined(posts, save_batch_size=20))
+
+    assert sorted(failed_posts) == sorted([FAILING_POST, UNPARSEABLE_POST])
+    assert len(pain_events) == saved == 23
+    assert extractor.stats["extraction_errors"] == 2
+    assert fake_llm.closed
+
+    remaining = sorted(p["id"] for p in temp_db.get_filtered_posts(limit=100))
+    assert remaining == sorted([FAILING_POST, UNPARSEABLE_POST])
+    assert fake_llm.batch_sizes == []
+
+
+def test_grouped_extraction_bookkeeping(temp_db, monkeypatch):
+    """max_batch_size>1时按组批量请求，最后剩1个帖子时逐个请求；记账与逐个请求一致"""
+    llm = FakeLLM(max_batch_size=4)
+    monkeypatch.setattr(extract_pain, "get_llm_client", lambda: llm)
+    posts = _posts(25)
+    temp_db.insert_filtered_posts(posts)
+
+    extractor = extract_pain.PainPointExtractor()
+    pain_events, failed_posts, saved = asyncio.run(extractor._extract_pipelined(posts, save_batch_size=20))
+
+    assert llm.batch_sizes == [4] * 6
+    assert sorted(failed_posts) == sorted([FAILING_POST, UNPARSEABLE_POST])
+    assert len(pain_events) == saved == 23
+    remaining = sorted(p["id"] for p in temp_db.get_filtered_posts(limit=100))
+    assert remaining == sorted([FAILING_POST, UNPARSEABLE_POST])
+
+
+def test_failed_group_marks_every_post_failed(temp_db, monkeypatch):
+    """整组请求抛出异常时组内帖子都记为失败"""
+    llm = FakeLLM(max_batch_size=3)
+
+    async def broken_batch(items):
+        raise RuntimeError("connection reset")
+
+    llm.aextract_pain_points_batch = broken_batch
+    monkeypatch.setattr(extract_pain, "get_llm_client", lambda: llm)
+    posts = _posts(3)
+    temp_db.insert_filtered_posts(posts)
+
+    extractor = extract_pain.PainPointExtractor()
+    pain_events, failed_posts, saved = asyncio.run(extractor._extract_pipelined(posts))
+
+    assert sorted(failed_posts) == ["reddit_0", "reddit_1", "reddit_2"]
+    assert pain_events == [] and saved == 0
+    assert len(temp_db.get_filtered_posts(limit=100)) == 3
+
+
+def test_batch_request_falls_back_for_missing_posts(monkeypatch):
+    """批量响应漏掉的帖子、格式不符的输出和无法解析的整批响应都逐个重新请求"""
+    client = LLMClient.__new__(LLMClient)
+    client.semantic_cache = None
+    items = [{"title": f"title reddit_{i}", "body": "x" * 10} for i in range(5)]
+    requested, retried = [], []
+
+    async def batch_request(all_items, batch):
+        requested.append(batch)
+        if batch == [0, 1, 2]:
+            outputs = [
+                {"id": 0, "pain_events": [{"problem": "p0"}]},
+                {"id": 1, "pain_events": "not a list"},
+                {"id": 9, "pain_events": []},
+            ]
+            content = {"outputs": outputs}
+        else:
+            content = {"error": "Failed to parse JSON", "raw_content": "{"}
+        return {"content": content, "model": "batch-model", "usage": {}, "request_time": 0.0}
+
+    async def single(title, **kwargs):
+        retried.append(title)
+        return _fake_response(title.split()[-1])
+
+    monkeypatch.setattr(client, "_aextract_pain_batch_request", batch_request)
+    monkeypatch.setattr(client, "aextract_pain_points", single)
+
+    results = asyncio.run(client.aextract_pain_points_batch(items, max_batch_chars=75))
+
+    assert requested == [[0, 1, 2], [3, 4]]
+    assert results[0]["content"] == {"pain_events": [{"problem": "p0"}]}
+    assert results[0]["model"] == "batch-model"
+    assert retried == ["title reddit_1", "title reddit_2", "title reddit_3", "title reddit_4"]
+    assert isinstance(results[3], RuntimeError)
+    assert all(r["model"] == "fake-model" for r in (results[1], results[2], results[4]))
+
+
+def test_incomplete_save_does_not_mark_posts(temp_db, fake_llm, monkeypatch):
+    """某批事件没有全部保存时不登记该批帖子；已保存事件的帖子由pain_events触发器登记，
+    未保存事件的帖子留待下次运行重试"""
+    posts = _posts(5)
+    temp_db.insert_filtered_posts(posts)
+
+    dropped = []
+    real_insert = temp_db.insert_pain_events
+
+    def insert_all_but_last(rows):
+        dropped.append(rows[-1]["post_id"])
+        return real_insert(rows[:-1])
+
+    monkeypatch.setattr(temp_db, "insert_pain_events", insert_all_but_last)
+
+    extractor = extract_pain.PainPointExtractor()
+    _, failed_posts, saved = asyncio.run(extractor._extract_pipelined(posts, save_batch_size=20))
+
+    assert failed_posts == [FAILING_POST]
+    assert saved == 3
+
+    remaining = sorted(p["id"] for p in temp_db.get_filtered_posts(limit=100))
+    assert remaining == sorted([FAILING_POST, dropped[0]])
@@ -0,0 +1,29 @@
+"""
+Config loader for Reddit Pain Point Finder
+YAML配置加载 - 按(路径, mtime, 大小)缓存解析结果，多个模块/实例读取同一配置只解析一次
+"""
+import os
+import copy
+import functools
+from typing import Dict, Any
+
+import yaml
+
+# 有libyaml时使用C实现的SafeLoader（解析速度约为纯Python实现的10倍）
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_config(config_path: str, mtime_ns: int, size: int) -> Any:
+    """解析YAML配置；以(路径, mtime, 大小)为键缓存，文件修改后自动重新解析"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
+def load_yaml_config(config_path: str) -> Dict[str, Any]:
+    """加载配置（返回缓存结果的深拷贝，调用方修改不会影响缓存）"""
+    stat = os.stat(config_path)
+    return copy.deepcopy(_parse_config(os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size))
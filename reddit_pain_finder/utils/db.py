@@ -3,16 +3,386 @@ Database utilities for Wise Collection
 SQLite数据库操作工具
 """
 import sqlite3
-import json
+import atexit
 import logging
-import hashlib
+import functools
+import threading
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Mapping
 from contextlib import contextmanager
 import os
+import queue
+import pickle
+
+import numpy as np
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# 表结构定义（单一来源，初始化时通过一次executescript执行）
+
+# 结构迁移记录表
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# 原始帖子表（升级版 - 支持多数据源）
+POSTS_DDL = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    body TEXT,
+    subreddit TEXT,
+    url TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT 'reddit',
+    source_id TEXT NOT NULL,
+    platform_data TEXT,
+    score INTEGER NOT NULL,
+    num_comments INTEGER NOT NULL,
+    upvote_ratio REAL,
+    is_self INTEGER,
+    created_utc REAL NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    author TEXT,
+    category TEXT,
+    trust_level REAL DEFAULT 0.5,
+    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    raw_data TEXT,  -- 原始JSON数据
+    UNIQUE(source, source_id)
+);
+"""
+
+# 过滤帖子表
+FILTERED_POSTS_DDL = """
+CREATE TABLE IF NOT EXISTS filtered_posts (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    body TEXT,
+    subreddit TEXT NOT NULL,
+    url TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    num_comments INTEGER NOT NULL,
+    upvote_ratio REAL NOT NULL,
+    pain_score REAL NOT NULL,
+    pain_keywords TEXT,
+    filtered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    filter_reason TEXT,
+    aspiration_keywords TEXT,
+    aspiration_score REAL DEFAULT 0.0,
+    pass_type TEXT DEFAULT 'pain',
+    engagement_score REAL DEFAULT 0.0,
+    trust_level REAL DEFAULT 0.5
+);
+"""
+
+# 痛点事件表
+PAIN_EVENTS_DDL = """
+CREATE TABLE IF NOT EXISTS pain_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    post_id TEXT NOT NULL,
+    cluster_id INTEGER,
+    actor TEXT,
+    context TEXT,
+    problem TEXT NOT NULL,
+    current_workaround TEXT,
+    frequency TEXT,
+    emotional_signal TEXT,
+    mentioned_tools TEXT,
+    extraction_confidence REAL,
+    extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (post_id) REFERENCES filtered_posts(id),
+    FOREIGN KEY (cluster_id) REFERENCES clusters(id)
+);
+"""
+
+# 已抽取帖子表：记录已完成痛点抽取的帖子（包括未抽取出痛点的帖子）
+# 插入pain_events时由触发器自动登记
+EXTRACTED_POSTS_DDL = """
+CREATE TABLE IF NOT EXISTS extracted_posts (
+    post_id TEXT PRIMARY KEY,
+    extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_pain_events_mark_extracted
+AFTER INSERT ON pain_events
+BEGIN
+    INSERT OR IGNORE INTO extracted_posts (post_id) VALUES (NEW.post_id);
+END;
+"""
+
+# 嵌入向量表
+PAIN_EMBEDDINGS_DDL = """
+CREATE TABLE IF NOT EXISTS pain_embeddings (
+    pain_event_id INTEGER PRIMARY KEY,
+    embedding_vector BLOB NOT NULL,
+    embedding_model TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (pain_event_id) REFERENCES pain_events(id)
+);
+"""
+
+# 聚类表
+CLUSTERS_DDL = """
+CREATE TABLE IF NOT EXISTS clusters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cluster_name TEXT NOT NULL,
+    cluster_description TEXT,
+    source_type TEXT,  -- 新增：数据源类型 (hn_ask, hn_show, reddit, etc.)
+    centroid_summary TEXT,  -- 新增：聚类中心摘要
+    common_pain TEXT,  -- 新增：共同痛点
+    common_context TEXT,  -- 新增：共同上下文
+    example_events TEXT,  -- 新增：代表性事件 (JSON数组)
+    pain_event_ids TEXT NOT NULL,  -- JSON数组
+    cluster_size INTEGER NOT NULL,
+    avg_pain_score REAL,
+    workflow_confidence REAL,
+    workflow_similarity REAL DEFAULT 0.0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- JTBD产品语义字段
+    job_statement TEXT,
+    job_steps TEXT,
+    desired_outcomes TEXT,
+    job_context TEXT,
+    customer_profile TEXT,
+    semantic_category TEXT,
+    product_impact REAL DEFAULT 0.0
+);
+"""
+
+# 机会表
+OPPORTUNITIES_DDL = """
+CREATE TABLE IF NOT EXISTS opportunities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cluster_id INTEGER NOT NULL,
+    opportunity_name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    current_tools TEXT,
+    missing_capability TEXT,
+    why_existing_fail TEXT,
+    target_users TEXT,
+    pain_frequency_score REAL,
+    market_size_score REAL,
+    mvp_complexity_score REAL,
+    competition_risk_score REAL,
+    integration_complexity_score REAL,
+    total_score REAL,
+    killer_risks TEXT,  -- JSON数组
+    recommendation TEXT,  -- AI建议：pursue/modify/abandon with reason
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (cluster_id) REFERENCES clusters(id)
+);
+"""
+
+SCHEMA_DDL = (
+    SCHEMA_MIGRATIONS_DDL
+    + POSTS_DDL
+    + FILTERED_POSTS_DDL
+    + PAIN_EVENTS_DDL
+    + EXTRACTED_POSTS_DDL
+    + PAIN_EMBEDDINGS_DDL
+    + CLUSTERS_DDL
+    + OPPORTUNITIES_DDL
+)
+
+# 会话级PRAGMA（每个新连接执行一次）
+SESSION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",       # WAL模式下NORMAL已足够安全，减少fsync
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",      # 256MB
+    "PRAGMA cache_size=-65536",        # 64MB
+)
+
+# 只读连接池中保留的空闲连接数上限（超出的连接用完即关闭）
+READER_POOL_SIZE = 8
+
+# 已启用WAL的数据库文件（journal_mode持久化在文件中，每个文件只需设置一次）
+_wal_enabled_paths = set()
+_wal_lock = threading.Lock()
+
+def _json_dumps(obj: Any) -> str:
+    """JSON序列化（orjson，比json.dumps快数倍；解码为str以保持TEXT列类型）"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+# 嵌入向量BLOB格式：魔数头 + float32原始字节（旧数据为pickle，读取时兼容）
+EMBEDDING_BLOB_MAGIC = b"f32:"
+
+
+def encode_embedding(embedding_vector) -> bytes:
+    """将嵌入向量编码为BLOB（float32）"""
+    return EMBEDDING_BLOB_MAGIC + np.asarray(embedding_vector, dtype=np.float32).tobytes()
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """将BLOB解码为float32向量（兼容旧的pickle格式）"""
+    if blob[:len(EMBEDDING_BLOB_MAGIC)] == EMBEDDING_BLOB_MAGIC:
+        return np.frombuffer(blob, dtype=np.float32, offset=len(EMBEDDING_BLOB_MAGIC))
+    return np.asarray(pickle.loads(blob), dtype=np.float32)
+
+
+# 热路径SQL语句：模块级常量，同一字符串对象可稳定命中连接的预编译语句缓存
+_SQL_INSERT_PAIN_EMBEDDING = """
+    INSERT OR REPLACE INTO pain_embeddings
+    (pain_event_id, embedding_vector, embedding_model)
+    VALUES (?, ?, ?)
+"""
+
+_SQL_STATS_COUNTS = """
+    SELECT
+        (SELECT COUNT(*) FROM posts) AS raw_posts_count,
+        f.filtered_posts_count,
+        f.avg_pain_score,
+        (SELECT COUNT(*) FROM pain_events) AS pain_events_count,
+        (SELECT COUNT(*) FROM clusters) AS clusters_count,
+        (SELECT COUNT(*) FROM opportunities) AS opportunities_count
+    FROM (
+        SELECT COUNT(*) AS filtered_posts_count, AVG(pain_score) AS avg_pain_score
+        FROM filtered_posts
+    ) f
+"""
+
+_SQL_INSERT_RAW_POST = """
+    INSERT OR REPLACE INTO posts
+    (id, title, body, subreddit, url, source, source_id, platform_data,
+     score, num_comments, upvote_ratio, is_self, created_utc, created_at,
+     author, category, trust_level, raw_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_RAW_FILTERED_POST = """
+    INSERT OR REPLACE INTO filtered_posts
+    (id, title, body, subreddit, url, score, num_comments, upvote_ratio,
+     pain_score, pain_keywords, pain_patterns, emotional_intensity,
+     filter_reason, aspiration_keywords, aspiration_score, pass_type,
+     engagement_score, trust_level, author)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_SELECT_UNPROCESSED_POSTS = """
+    SELECT * FROM posts
+    WHERE NOT EXISTS (
+        SELECT 1 FROM filtered_posts
+        WHERE filtered_posts.id = posts.id
+    )
+    ORDER BY collected_at DESC
+    LIMIT ?
+"""
+
+_SQL_SELECT_UNPROCESSED_POSTS_BY_SOURCE = """
+    SELECT * FROM posts
+    WHERE source = ?
+    AND NOT EXISTS (
+        SELECT 1 FROM filtered_posts
+        WHERE filtered_posts.id = posts.id
+    )
+    ORDER BY collected_at DESC
+    LIMIT ?
+"""
+
+_SQL_SELECT_FILTERED_POSTS = """
+    SELECT * FROM filtered_posts f
+    WHERE f.pain_score >= ?
+    AND NOT EXISTS (
+        SELECT 1 FROM extracted_posts ep
+        WHERE ep.post_id = f.id
+    )
+    ORDER BY f.pain_score DESC
+    LIMIT ?
+"""
+
+_SQL_SELECT_PAIN_EVENTS_WITHOUT_EMBEDDINGS = """
+    SELECT p.* FROM pain_events p
+    LEFT JOIN pain_embeddings e ON p.id = e.pain_event_id
+    WHERE e.pain_event_id IS NULL
+    ORDER BY p.extracted_at DESC
+    LIMIT ?
+"""
+
+_SQL_SELECT_PAIN_EVENTS_WITH_EMBEDDINGS = """
+    SELECT p.*, e.embedding_vector, e.embedding_model
+    FROM pain_events p
+    JOIN pain_embeddings e ON p.id = e.pain_event_id
+    ORDER BY p.extracted_at DESC
+    LIMIT ?
+"""
+
+_SQL_INSERT_CLUSTER = """
+    INSERT INTO clusters
+    (cluster_name, cluster_description, source_type, centroid_summary,
+     common_pain, common_context, example_events, pain_event_ids, cluster_size,
+     avg_pain_score, workflow_confidence, workflow_similarity,
+     job_statement, job_steps, desired_outcomes, job_context,
+     customer_profile, semantic_category, product_impact)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING id
+"""
+
+_SQL_INSERT_OPPORTUNITY = """
+    INSERT INTO opportunities
+    (cluster_id, opportunity_name, description, current_tools,
+     missing_capability, why_existing_fail, target_users,
+     pain_frequency_score, market_size_score, mvp_complexity_score,
+     competition_risk_score, integration_complexity_score, total_score, killer_risks, recommendation)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    RETURNING id
+"""
+
+_SQL_INSERT_FILTERED_POST = """
+    INSERT OR REPLACE INTO filtered_posts
+    (id, title, body, subreddit, url, score, num_comments,
+     upvote_ratio, pain_score, pain_keywords, filter_reason,
+     aspiration_keywords, aspiration_score, pass_type, engagement_score, trust_level, author)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_PAIN_EVENT = """
+    INSERT INTO pain_events
+    (post_id, source_type, source_id, parent_post_id, actor, context,
+     problem, current_workaround, frequency, emotional_signal,
+     mentioned_tools, extraction_confidence)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# 单条插入直接返回新ID（SQLite >= 3.35），批量插入(executemany)使用不带RETURNING的版本
+_SQL_INSERT_PAIN_EVENT_RETURNING_ID = _SQL_INSERT_PAIN_EVENT.rstrip() + "\n    RETURNING id\n"
+
+
+# 跨源验证结果只取决于对齐情况，复用同一份只读映射，避免每个机会分配一次
+# （MappingProxyType：结果行共享同一对象，调用方无法原地修改；需要修改时自行dict()）
+_ALIGNED_SOURCE_VALIDATION: Mapping[str, Any] = MappingProxyType({
+    "has_cross_source": True,
+    "validation_level": 1,
+    "boost_score": 2.0,
+    "validated_problem": True,
+    "evidence": "Independent validation across Reddit + Hacker News"
+})
+
+_NO_CROSS_SOURCE_VALIDATION: Mapping[str, Any] = MappingProxyType({
+    "has_cross_source": False,
+    "validation_level": 0,
+    "boost_score": 0.0,
+    "validated_problem": False,
+    "evidence": "No cross-source validation (only Level 1 detection supported)"
+})
+
+
+@functools.lru_cache(maxsize=4096)
+def _aligned_problem_validation(aligned_problem_id: str) -> Mapping[str, Any]:
+    """同名聚类已对齐时的验证信息（按aligned_problem_id缓存，只读）"""
+    return MappingProxyType({
+        "has_cross_source": True,
+        "validation_level": 1,
+        "boost_score": 2.0,
+        "validated_problem": True,
+        "evidence": f"Found in aligned problem: {aligned_problem_id}"
+    })
+
+
 class WiseCollectionDB:
     """Wise Collection系统数据库管理器"""
 
@@ -24,31 +394,202 @@ class WiseCollectionDB:
         # 使用统一数据库文件
         self.unified_db_path = os.path.join(db_dir, "wise_collection.db")
 
+        # 写连接：单个长连接 + 互斥锁（可重入，允许嵌套的get_connection调用）
+        # 读连接：只读URI连接，不占用写锁；从连接池借出，用完归还而不是关闭
+        self._writer_conn: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        # bulk_session嵌套深度：大于0时单条写入方法不各自提交，由会话退出时统一提交
+        self._bulk_depth = 0
+        # LIFO：优先复用最近归还的连接（页缓存更热）
+        self._reader_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=READER_POOL_SIZE)
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._reader_conns_lock = threading.Lock()
+
+        # 进程退出时关闭所有缓存的连接
+        atexit.register(self.close)
+
         # 初始化数据库
         self._init_database()
 
     @contextmanager
-    def get_connection(self, db_type: str = "raw"):
+    def get_connection(self, db_type: str = "raw", readonly: bool = False,
+                       row_factory=sqlite3.Row):
         """获取数据库连接的上下文管理器
 
         Args:
             db_type: 连接类型（用于语义说明，实际都使用统一数据库）
                      可选值: "raw", "filtered", "pain", "clusters"
+            readonly: 为True时返回只读连接（mode=ro），查询不会与写入争用写锁；
+                      默认返回共享的写连接
+            row_factory: 行工厂，默认sqlite3.Row（支持按列名访问）；
+                         传None返回普通tuple，适合大批量扫描
         """
-        conn = None
+        if readonly:
+            with self._get_read_connection(row_factory) as conn:
+                yield conn
+            return
+
+        with self._writer_lock:
+            if self._writer_conn is None:
+                # BEGIN IMMEDIATE：写事务开始时即获取RESERVED锁，避免升级时死锁
+                self._writer_conn = sqlite3.connect(
+                    self.unified_db_path,
+                    isolation_level="IMMEDIATE",
+                    check_same_thread=False
+                )
+                self._enable_wal(self._writer_conn)
+                self._apply_session_pragmas(self._writer_conn)
+            conn = self._writer_conn
+            # 写连接是共享的，退出时恢复外层调用的行工厂
+            outer_row_factory = conn.row_factory
+            conn.row_factory = row_factory
+            self._writer_depth += 1
+            try:
+                yield conn
+            except Exception as e:
+                if self._writer_depth == 1:
+                    conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
+            finally:
+                conn.row_factory = outer_row_factory
+                self._writer_depth -= 1
+                # 与关闭连接的语义保持一致：最外层退出时丢弃未提交的改动
+                if self._writer_depth == 0 and conn.in_transaction:
+                    conn.rollback()
+
+    @contextmanager
+    def _get_read_connection(self, row_factory=sqlite3.Row):
+        """从连接池借出只读连接，退出上下文时归还（池满时关闭）"""
+        try:
+            conn = self._reader_pool.get_nowait()
+        except queue.Empty:
+            uri = Path(os.path.abspath(self.unified_db_path)).as_uri() + "?mode=ro"
+            # 连接在线程间传递（同一时刻只被一个线程使用），因此关闭check_same_thread
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._apply_session_pragmas(conn)
+            with self._reader_conns_lock:
+                self._reader_conns.append(conn)
+
+        conn.row_factory = row_factory
         try:
-            conn = sqlite3.connect(self.unified_db_path)
-            conn.row_factory = sqlite3.Row
             yield conn
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Database error: {e}")
             raise
         finally:
-            if conn:
+            conn.row_factory = sqlite3.Row
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._reader_pool.put_nowait(conn)
+            except queue.Full:
+                with self._reader_conns_lock:
+                    self._reader_conns.remove(conn)
                 conn.close()
 
+    def close(self):
+        """关闭写连接和所有只读连接"""
+        with self._reader_conns_lock:
+            for conn in self._reader_conns:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._reader_conns.clear()
+        while True:
+            try:
+                self._reader_pool.get_nowait()
+            except queue.Empty:
+                break
+
+        with self._writer_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+
+    def _enable_wal(self, conn: sqlite3.Connection):
+        """为数据库文件启用WAL模式（读写可并发，每个文件只执行一次）"""
+        db_path = os.path.abspath(self.unified_db_path)
+        with _wal_lock:
+            if db_path in _wal_enabled_paths:
+                return
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                logger.warning(f"Failed to enable WAL for {db_path}, journal_mode={mode}")
+            _wal_enabled_paths.add(db_path)
+
+    @staticmethod
+    def _apply_session_pragmas(conn: sqlite3.Connection):
+        """设置会话级PRAGMA"""
+        for pragma in SESSION_PRAGMAS:
+            conn.execute(pragma)
+
+    @contextmanager
+    def _transaction(self, conn):
+        """显式事务：整批写入只提交一次（一次fsync）
+
+        已处于事务中时使用SAVEPOINT嵌套，出错只回滚本批次。
+        """
+        if conn.in_transaction:
+            conn.execute("SAVEPOINT batch_write")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK TO batch_write")
+                conn.execute("RELEASE batch_write")
+                raise
+            else:
+                conn.execute("RELEASE batch_write")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    @contextmanager
+    def bulk_session(self, db_type: str = "raw"):
+        """批量写入会话：会话内的单条写入方法不再逐条commit，退出时统一COMMIT一次
+
+        用法：
+            with db.bulk_session("raw") as s:
+                for post in posts:
+                    s.insert_raw_post(post)
+
+        会话期间持有写连接锁；出现未捕获的异常时整个会话回滚。
+        单条写入失败（方法返回False/None）不影响会话内其它写入。
+        """
+        with self.get_connection(db_type) as conn:
+            with self._transaction(conn):
+                self._bulk_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._bulk_depth -= 1
+
+    def _commit(self, conn: sqlite3.Connection):
+        """提交当前写入；处于bulk_session中时跳过，由会话统一提交"""
+        if self._bulk_depth:
+            return
+        conn.commit()
+
+    @staticmethod
+    def _rows_to_dicts(cursor) -> List[Dict]:
+        """将tuple行转换为字典（列名只从cursor.description取一次）"""
+        return list(WiseCollectionDB._iter_dicts(cursor))
+
+    @staticmethod
+    def _iter_dicts(cursor) -> Iterator[Dict]:
+        """逐行迭代cursor并产出字典，不先fetchall()整个结果集"""
+        columns = [col[0] for col in cursor.description]
+        for row in cursor:
+            yield dict(zip(columns, row))
+
     def _init_database(self):
         """初始化数据库表结构"""
         self._init_unified_database()
@@ -56,139 +597,18 @@ class WiseCollectionDB:
     def _init_unified_database(self):
         """初始化统一数据库，包含所有表"""
         with self.get_connection("raw") as conn:
-            # 创建原始帖子表（升级版 - 支持多数据源）
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS posts (
-                    id TEXT PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    body TEXT,
-                    subreddit TEXT,
-                    url TEXT NOT NULL,
-                    source TEXT NOT NULL DEFAULT 'reddit',
-                    source_id TEXT NOT NULL,
-                    platform_data TEXT,
-                    score INTEGER NOT NULL,
-                    num_comments INTEGER NOT NULL,
-                    upvote_ratio REAL,
-                    is_self INTEGER,
-                    created_utc REAL NOT NULL,
-                    created_at TIMESTAMP NOT NULL,
-                    author TEXT,
-                    category TEXT,
-                    trust_level REAL DEFAULT 0.5,
-                    collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    raw_data TEXT,  -- 原始JSON数据
-                    UNIQUE(source, source_id)
-                )
-            """)
-
-            # 创建过滤帖子表
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS filtered_posts (
-                    id TEXT PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    body TEXT,
-                    subreddit TEXT NOT NULL,
-                    url TEXT NOT NULL,
-                    score INTEGER NOT NULL,
-                    num_comments INTEGER NOT NULL,
-                    upvote_ratio REAL NOT NULL,
-                    pain_score REAL NOT NULL,
-                    pain_keywords TEXT,
-                    filtered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    filter_reason TEXT,
-                    aspiration_keywords TEXT,
-                    aspiration_score REAL DEFAULT 0.0,
-                    pass_type TEXT DEFAULT 'pain',
-                    engagement_score REAL DEFAULT 0.0,
-                    trust_level REAL DEFAULT 0.5
-                )
-            """)
-
-            # 创建痛点事件表
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS pain_events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    post_id TEXT NOT NULL,
-                    cluster_id INTEGER,
-                    actor TEXT,
-                    context TEXT,
-                    problem TEXT NOT NULL,
-                    current_workaround TEXT,
-                    frequency TEXT,
-                    emotional_signal TEXT,
-                    mentioned_tools TEXT,
-                    extraction_confidence REAL,
-                    extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (post_id) REFERENCES filtered_posts(id),
-                    FOREIGN KEY (cluster_id) REFERENCES clusters(id)
-                )
-            """)
-
-            # 创建嵌入向量表
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS pain_embeddings (
-                    pain_event_id INTEGER PRIMARY KEY,
-                    embedding_vector BLOB NOT NULL,
-                    embedding_model TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (pain_event_id) REFERENCES pain_events(id)
-                )
-            """)
-
-            # 创建聚类表
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS clusters (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cluster_name TEXT NOT NULL,
-                    cluster_description TEXT,
-                    source_type TEXT,  -- 新增：数据源类型 (hn_ask, hn_show, reddit, etc.)
-                    centroid_summary TEXT,  -- 新增：聚类中心摘要
-                    common_pain TEXT,  -- 新增：共同痛点
-                    common_context TEXT,  -- 新增：共同上下文
-                    example_events TEXT,  -- 新增：代表性事件 (JSON数组)
-                    pain_event_ids TEXT NOT NULL,  -- JSON数组
-                    cluster_size INTEGER NOT NULL,
-                    avg_pain_score REAL,
-                    workflow_confidence REAL,
-                    workflow_similarity REAL DEFAULT 0.0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    -- JTBD产品语义字段
-                    job_statement TEXT,
-                    job_steps TEXT,
-                    desired_outcomes TEXT,
-                    job_context TEXT,
-                    customer_profile TEXT,
-                    semantic_category TEXT,
-                    product_impact REAL DEFAULT 0.0
-                )
-            """)
-
-            # 创建机会表
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS opportunities (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    cluster_id INTEGER NOT NULL,
-                    opportunity_name TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    current_tools TEXT,
-                    missing_capability TEXT,
-                    why_existing_fail TEXT,
-                    target_users TEXT,
-                    pain_frequency_score REAL,
-                    market_size_score REAL,
-                    mvp_complexity_score REAL,
-                    competition_risk_score REAL,
-                    integration_complexity_score REAL,
-                    total_score REAL,
-                    killer_risks TEXT,  -- JSON数组
-                    recommendation TEXT,  -- AI建议：pursue/modify/abandon with reason
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (cluster_id) REFERENCES clusters(id)
-                )
-            """)
+            # extracted_posts为新增表，首次创建时需要从pain_events回填
+            backfill_extracted_posts = not self._columns_of("extracted_posts")
 
+            # 创建所有表（一次executescript，减少逐条解析往返）
+            conn.executescript(SCHEMA_DDL)
 
+            if backfill_extracted_posts:
+                self._columns_of.cache_clear()
+                conn.execute("""
+                    INSERT OR IGNORE INTO extracted_posts (post_id)
+                    SELECT DISTINCT post_id FROM pain_events
+                """)
 
             # 创建所有索引
             # posts表索引
@@ -197,8 +617,7 @@ class WiseCollectionDB:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_collected_at ON posts(collected_at)")
 
             # 检查新列是否存在，然后创建相应索引
-            cursor = conn.execute("PRAGMA table_info(posts)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
+            existing_columns = self._columns_of("posts")
 
             if 'source' in existing_columns:
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_source ON posts(source)")
@@ -206,6 +625,10 @@ class WiseCollectionDB:
             if 'created_at' in existing_columns:
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_source_created ON posts(source, created_at)")
 
+            if 'source' in existing_columns:
+                # get_unprocessed_posts_by_source: 按source过滤并按collected_at倒序，索引直接提供顺序
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_source_collected ON posts(source, collected_at DESC)")
+
             if 'source' in existing_columns and 'source_id' in existing_columns:
                 conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_unique_source ON posts(source, source_id)")
 
@@ -226,73 +649,132 @@ class WiseCollectionDB:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_score ON opportunities(total_score)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_cluster_id ON opportunities(cluster_id)")
 
-            # 添加对齐跟踪列到clusters表（如果不存在）
-            self._add_alignment_columns_to_clusters(conn)
+            # 执行尚未应用的结构迁移（已应用的记录在schema_migrations中，直接跳过）
+            self._run_migrations(conn)
 
-            # 添加trust_level列到posts表（如果不存在）
-            self._add_trust_level_column(conn)
+            conn.commit()
+            logger.info("Unified database initialized successfully")
 
-            # 添加cluster_id列到pain_events表（如果不存在）
-            self._add_cluster_id_column(conn)
+    def _run_migrations(self, conn):
+        """按顺序执行未应用的迁移，成功后记录到schema_migrations
 
-            # 添加workflow_similarity列到clusters表（如果不存在）
-            self._add_workflow_similarity_column(conn)
+        修改已有迁移的内容时需要使用新的迁移名称，否则已记录的数据库不会再次执行。
+        """
+        migrations = [
+            # 添加对齐跟踪列到clusters表
+            ("clusters_alignment_columns", self._add_alignment_columns_to_clusters),
+            # 添加trust_level列到posts表
+            ("posts_trust_level", self._add_trust_level_column),
+            # 添加cluster_id列到pain_events表
+            ("pain_events_cluster_id", self._add_cluster_id_column),
+            # 添加workflow_similarity列到clusters表
+            ("clusters_workflow_similarity", self._add_workflow_similarity_column),
+            # 添加Phase 2字段到filtered_posts表
+            ("phase2_filtered_posts_columns", self._add_phase2_filtered_posts_columns),
+            # 添加Phase 3字段到opportunities表
+            ("phase3_opportunities_columns", self._add_phase3_opportunities_columns),
+            # 添加JTBD字段到clusters表
+            ("clusters_jtbd_columns", self._add_jtbd_columns),
+            # 按cluster_name查询对齐状态的覆盖索引
+            ("clusters_name_aligned_index", self._add_cluster_name_aligned_index),
+        ]
+
+        applied = {row[0] for row in conn.execute("SELECT name FROM schema_migrations")}
+
+        for name, migration in migrations:
+            if name in applied:
+                continue
+
+            # 每个迁移在SAVEPOINT中执行：多个ALTER/索引要么全部生效，要么全部回滚
+            # 所有迁移最终随初始化一起提交（一次fsync）
+            conn.execute("SAVEPOINT schema_migration")
+            if migration(conn):
+                conn.execute("INSERT OR IGNORE INTO schema_migrations (name) VALUES (?)", (name,))
+                conn.execute("RELEASE schema_migration")
+                logger.info(f"Applied schema migration: {name}")
+            else:
+                conn.execute("ROLLBACK TO schema_migration")
+                conn.execute("RELEASE schema_migration")
+                # 回滚后列缓存可能已过期
+                self._columns_of.cache_clear()
+
+    @functools.lru_cache(maxsize=32)
+    def _columns_of(self, table: str) -> frozenset:
+        """获取表的列名集合（按实例+表名缓存，ALTER后由_ensure_columns失效）"""
+        with self.get_connection("raw") as conn:
+            cursor = conn.execute(f"PRAGMA table_info({table})")
+            return frozenset(row['name'] for row in cursor.fetchall())
 
-            # 添加Phase 2字段到filtered_posts表（如果不存在）
-            self._add_phase2_filtered_posts_columns(conn)
+    def _ensure_columns(self, conn, table: str, columns: Dict[str, str]) -> List[str]:
+        """为表补齐缺失的列
 
-            # 添加Phase 3字段到opportunities表（如果不存在）
-            self._add_phase3_opportunities_columns(conn)
+        Args:
+            conn: 数据库连接
+            table: 表名
+            columns: 列名 -> 列定义
 
-            # 添加JTBD字段到clusters表（如果不存在）
-            self._add_jtbd_columns(conn)
+        Returns:
+            本次新增的列名列表
+        """
+        existing_columns = self._columns_of(table)
+        added = []
 
-            conn.commit()
-            logger.info("Unified database initialized successfully")
+        for column_name, column_def in columns.items():
+            if column_name not in existing_columns:
+                conn.execute(f"""
+                    ALTER TABLE {table}
+                    ADD COLUMN {column_name} {column_def}
+                """)
+                logger.info(f"Added {column_name} column to {table} table")
+                added.append(column_name)
 
-    def _add_alignment_columns_to_clusters(self, conn):
-        """为clusters表添加对齐跟踪列（如果不存在）"""
-        try:
-            # 检查列是否存在
-            cursor = conn.execute("PRAGMA table_info(clusters)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
+        if added:
+            self._columns_of.cache_clear()
 
-            # 添加alignment_status列（如果不存在）
-            if 'alignment_status' not in existing_columns:
-                conn.execute("""
-                    ALTER TABLE clusters
-                    ADD COLUMN alignment_status TEXT DEFAULT 'unprocessed'
-                """)
-                logger.info("Added alignment_status column to clusters table")
+        return added
 
-            # 添加aligned_problem_id列（如果不存在）
-            if 'aligned_problem_id' not in existing_columns:
-                conn.execute("""
-                    ALTER TABLE clusters
-                    ADD COLUMN aligned_problem_id TEXT
-                """)
-                logger.info("Added aligned_problem_id column to clusters table")
+    def _add_alignment_columns_to_clusters(self, conn) -> bool:
+        """为clusters表添加对齐跟踪列（如果不存在）"""
+        try:
+            self._ensure_columns(conn, "clusters", {
+                'alignment_status': "TEXT DEFAULT 'unprocessed'",
+                'aligned_problem_id': 'TEXT'
+            })
 
             # 创建相关索引
             conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_alignment_status ON clusters(alignment_status)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_aligned_problem_id ON clusters(aligned_problem_id)")
+            # 覆盖索引：对齐扫描只需读取索引即可拿到status/problem_id/id
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_clusters_align
+                ON clusters(alignment_status, aligned_problem_id, id)
+            """)
+
+            return True
 
         except Exception as e:
             logger.error(f"Failed to add alignment columns to clusters table: {e}")
+            return False
 
-    def _add_trust_level_column(self, conn):
-        """Add trust_level column to posts table if not exists"""
-        try:
-            cursor = conn.execute("PRAGMA table_info(posts)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
+    def _add_cluster_name_aligned_index(self, conn) -> bool:
+        """为clusters(cluster_name, aligned_problem_id)创建覆盖索引
 
-            if 'trust_level' not in existing_columns:
-                conn.execute("""
-                    ALTER TABLE posts
-                    ADD COLUMN trust_level REAL DEFAULT 0.5
-                """)
-                logger.info("Added trust_level column to posts table")
+        跨源验证按cluster_name查找对齐问题时只需读取索引，不再扫描整表
+        """
+        try:
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_clusters_name_aligned
+                ON clusters(cluster_name, aligned_problem_id)
+            """)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to create cluster name index: {e}")
+            return False
 
+    def _add_trust_level_column(self, conn) -> bool:
+        """Add trust_level column to posts table if not exists"""
+        try:
+            if self._ensure_columns(conn, "posts", {'trust_level': 'REAL DEFAULT 0.5'}):
                 # Migrate existing data: set trust_level based on category
                 category_trust_levels = {
                     'core': 0.9,
@@ -310,22 +792,16 @@ class WiseCollectionDB:
 
                 logger.info("Migrated trust_level for existing posts")
 
+            return True
+
         except Exception as e:
             logger.error(f"Failed to add trust_level column: {e}")
+            return False
 
-    def _add_workflow_similarity_column(self, conn):
+    def _add_workflow_similarity_column(self, conn) -> bool:
         """Add workflow_similarity column to clusters table if not exists"""
         try:
-            cursor = conn.execute("PRAGMA table_info(clusters)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
-
-            if 'workflow_similarity' not in existing_columns:
-                conn.execute("""
-                    ALTER TABLE clusters
-                    ADD COLUMN workflow_similarity REAL DEFAULT 0.0
-                """)
-                logger.info("Added workflow_similarity column to clusters table")
-
+            if self._ensure_columns(conn, "clusters", {'workflow_similarity': 'REAL DEFAULT 0.0'}):
                 # For existing clusters, migrate workflow_confidence to workflow_similarity
                 conn.execute("""
                     UPDATE clusters
@@ -333,22 +809,16 @@ class WiseCollectionDB:
                 """)
                 logger.info("Migrated workflow_confidence to workflow_similarity")
 
+            return True
+
         except Exception as e:
             logger.error(f"Failed to add workflow_similarity column: {e}")
+            return False
 
-    def _add_cluster_id_column(self, conn):
+    def _add_cluster_id_column(self, conn) -> bool:
         """Add cluster_id column to pain_events table if not exists"""
         try:
-            cursor = conn.execute("PRAGMA table_info(pain_events)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
-
-            if 'cluster_id' not in existing_columns:
-                conn.execute("""
-                    ALTER TABLE pain_events
-                    ADD COLUMN cluster_id INTEGER
-                """)
-                logger.info("Added cluster_id column to pain_events table")
-
+            if self._ensure_columns(conn, "pain_events", {'cluster_id': 'INTEGER'}):
                 # Create index for faster queries
                 conn.execute("""
                     CREATE INDEX IF NOT EXISTS idx_pain_events_cluster_id
@@ -360,64 +830,55 @@ class WiseCollectionDB:
                 # They will be processed in next clustering run
                 logger.info("Existing pain_events marked for re-clustering (cluster_id=NULL)")
 
+            # 部分索引：只包含未聚类的事件，聚类阶段按extracted_at扫描并按post_id关联
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_pain_cluster_null
+                ON pain_events(extracted_at, post_id)
+                WHERE cluster_id IS NULL
+            """)
+
+            return True
+
         except Exception as e:
             logger.error(f"Failed to add cluster_id column: {e}")
+            return False
 
-    def _add_phase2_filtered_posts_columns(self, conn):
+    def _add_phase2_filtered_posts_columns(self, conn) -> bool:
         """Add Phase 2 aspiration and trust columns to filtered_posts table if not exist"""
         try:
-            cursor = conn.execute("PRAGMA table_info(filtered_posts)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
-
-            new_columns = {
+            self._ensure_columns(conn, "filtered_posts", {
                 'aspiration_keywords': 'TEXT',
                 'aspiration_score': 'REAL DEFAULT 0.0',
                 'pass_type': 'TEXT DEFAULT \'pain\'',
                 'engagement_score': 'REAL DEFAULT 0.0',
                 'trust_level': 'REAL DEFAULT 0.5'
-            }
+            })
 
-            for column_name, column_def in new_columns.items():
-                if column_name not in existing_columns:
-                    conn.execute(f"""
-                        ALTER TABLE filtered_posts
-                        ADD COLUMN {column_name} {column_def}
-                    """)
-                    logger.info(f"Added {column_name} column to filtered_posts table")
+            return True
 
         except Exception as e:
             logger.error(f"Failed to add Phase 2 columns to filtered_posts table: {e}")
+            return False
 
-    def _add_phase3_opportunities_columns(self, conn):
+    def _add_phase3_opportunities_columns(self, conn) -> bool:
         """Add Phase 3 scoring columns to opportunities table if not exist"""
         try:
-            cursor = conn.execute("PRAGMA table_info(opportunities)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
-
-            new_columns = {
+            self._ensure_columns(conn, "opportunities", {
                 'raw_total_score': 'REAL DEFAULT 0.0',
                 'trust_level': 'REAL DEFAULT 0.5',
                 'scoring_breakdown': 'TEXT'  # JSON格式存储详细计算过程
-            }
+            })
 
-            for column_name, column_def in new_columns.items():
-                if column_name not in existing_columns:
-                    conn.execute(f"""
-                        ALTER TABLE opportunities
-                        ADD COLUMN {column_name} {column_def}
-                    """)
-                    logger.info(f"Added {column_name} column to opportunities table")
+            return True
 
         except Exception as e:
             logger.error(f"Failed to add Phase 3 columns to opportunities table: {e}")
+            return False
 
-    def _add_jtbd_columns(self, conn):
+    def _add_jtbd_columns(self, conn) -> bool:
         """为clusters表添加JTBD产品语义字段（如果不存在）"""
         try:
-            cursor = conn.execute("PRAGMA table_info(clusters)")
-            existing_columns = {row['name'] for row in cursor.fetchall()}
-
-            jtbd_columns = {
+            self._ensure_columns(conn, "clusters", {
                 'job_statement': 'TEXT',
                 'job_steps': 'TEXT',  # JSON数组
                 'desired_outcomes': 'TEXT',  # JSON数组
@@ -425,22 +886,17 @@ class WiseCollectionDB:
                 'customer_profile': 'TEXT',
                 'semantic_category': 'TEXT',
                 'product_impact': 'REAL DEFAULT 0.0'
-            }
-
-            for column_name, column_def in jtbd_columns.items():
-                if column_name not in existing_columns:
-                    conn.execute(f"""
-                        ALTER TABLE clusters
-                        ADD COLUMN {column_name} {column_def}
-                    """)
-                    logger.info(f"Added {column_name} column to clusters table")
+            })
 
             # 创建索引
             conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_semantic_category ON clusters(semantic_category)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_clusters_product_impact ON clusters(product_impact)")
 
+            return True
+
         except Exception as e:
             logger.error(f"Failed to add JTBD columns to clusters table: {e}")
+            return False
 
     # Raw posts operations
     def insert_raw_post(self, post_data: Dict[str, Any]) -> bool:
@@ -451,13 +907,7 @@ class WiseCollectionDB:
         try:
             with self.get_connection("raw") as conn:
                 # 1. 保存到posts表（原始数据，向后兼容）
-                conn.execute("""
-                    INSERT OR REPLACE INTO posts
-                    (id, title, body, subreddit, url, source, source_id, platform_data,
-                     score, num_comments, upvote_ratio, is_self, created_utc, created_at,
-                     author, category, trust_level, raw_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                conn.execute(_SQL_INSERT_RAW_POST, (
                     post_data.get("id"),                    # 统一ID (兼容旧数据)
                     post_data["title"],
                     post_data.get("body", ""),
@@ -465,7 +915,7 @@ class WiseCollectionDB:
                     post_data["url"],
                     post_data.get("source", "reddit"),      # 新字段，默认为reddit
                     post_data.get("source_id"),             # 新字段
-                    json.dumps(post_data.get("platform_data", {})),  # 新字段
+                    _json_dumps(post_data.get("platform_data", {})),  # 新字段
                     post_data["score"],
                     post_data["num_comments"],
                     post_data.get("upvote_ratio"),          # 可能为None (新字段)
@@ -475,19 +925,12 @@ class WiseCollectionDB:
                     post_data.get("author", ""),
                     post_data.get("category", ""),
                     post_data.get("trust_level", 0.5),      # 新字段，默认0.5
-                    json.dumps(post_data)
+                    _json_dumps(post_data)
                 ))
 
                 # 2. 如果包含filter结果，同时保存到filtered_posts表
                 if "pain_score" in post_data and "filter_reason" in post_data:
-                    conn.execute("""
-                        INSERT OR REPLACE INTO filtered_posts
-                        (id, title, body, subreddit, url, score, num_comments, upvote_ratio,
-                         pain_score, pain_keywords, pain_patterns, emotional_intensity,
-                         filter_reason, aspiration_keywords, aspiration_score, pass_type,
-                         engagement_score, trust_level, author)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
+                    conn.execute(_SQL_INSERT_RAW_FILTERED_POST, (
                         post_data.get("id"),
                         post_data["title"],
                         post_data.get("body", ""),
@@ -497,11 +940,11 @@ class WiseCollectionDB:
                         post_data["num_comments"],
                         post_data.get("upvote_ratio", 0.0),
                         post_data.get("pain_score", 0.0),
-                        json.dumps(post_data.get("pain_keywords", [])),
-                        json.dumps(post_data.get("pain_patterns", [])),
+                        _json_dumps(post_data.get("pain_keywords", [])),
+                        _json_dumps(post_data.get("pain_patterns", [])),
                         post_data.get("emotional_intensity", 0.0),
                         post_data.get("filter_reason", ""),
-                        json.dumps(post_data.get("aspiration_keywords", [])),
+                        _json_dumps(post_data.get("aspiration_keywords", [])),
                         post_data.get("aspiration_score", 0.0),
                         post_data.get("pass_type", "pain"),
                         post_data.get("engagement_score", 0.0),
@@ -509,7 +952,7 @@ class WiseCollectionDB:
                         post_data.get("author", "")
                     ))
 
-                conn.commit()
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Failed to insert raw post {post_data.get('id')}: {e}")
@@ -519,17 +962,9 @@ class WiseCollectionDB:
         """获取未处理的帖子"""
         try:
             # 使用 NOT EXISTS 而不是 NOT IN，以正确处理 NULL 值
-            with self.get_connection("raw") as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM posts
-                    WHERE NOT EXISTS (
-                        SELECT 1 FROM filtered_posts
-                        WHERE filtered_posts.id = posts.id
-                    )
-                    ORDER BY collected_at DESC
-                    LIMIT ?
-                """, (limit,))
-                return [dict(row) for row in cursor.fetchall()]
+            with self.get_connection("raw", readonly=True, row_factory=None) as conn:
+                cursor = conn.execute(_SQL_SELECT_UNPROCESSED_POSTS, (limit,))
+                return self._rows_to_dicts(cursor)
         except Exception as e:
             logger.error(f"Failed to get unprocessed posts: {e}")
             return []
@@ -538,18 +973,9 @@ class WiseCollectionDB:
         """获取未处理的帖子，支持按数据源过滤"""
         try:
             # 使用 NOT EXISTS 而不是 NOT IN，以正确处理 NULL 值
-            with self.get_connection("raw") as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM posts
-                    WHERE source = ?
-                    AND NOT EXISTS (
-                        SELECT 1 FROM filtered_posts
-                        WHERE filtered_posts.id = posts.id
-                    )
-                    ORDER BY collected_at DESC
-                    LIMIT ?
-                """, (source, limit))
-                return [dict(row) for row in cursor.fetchall()]
+            with self.get_connection("raw", readonly=True, row_factory=None) as conn:
+                cursor = conn.execute(_SQL_SELECT_UNPROCESSED_POSTS_BY_SOURCE, (source, limit))
+                return self._rows_to_dicts(cursor)
         except Exception as e:
             logger.error(f"Failed to get unprocessed posts for source {source}: {e}")
             return []
@@ -586,7 +1012,7 @@ class WiseCollectionDB:
             for semantic clarity and compatibility with non-unified mode.
         """
         try:
-            with self.get_connection("raw") as conn:
+            with self.get_connection("raw", readonly=True) as conn:
                 cursor = conn.execute("""
                     SELECT title, body, subreddit, score, num_comments
                     FROM posts
@@ -631,6 +1057,29 @@ class WiseCollectionDB:
         return False
 
     # Filtered posts operations
+    @staticmethod
+    def _filtered_post_row(post_data: Dict[str, Any]) -> tuple:
+        """构建filtered_posts插入参数"""
+        return (
+            post_data["id"],
+            post_data["title"],
+            post_data.get("body", ""),
+            post_data["subreddit"],
+            post_data["url"],
+            post_data["score"],
+            post_data["num_comments"],
+            post_data.get("upvote_ratio", 0.0),
+            post_data.get("pain_score", 0.0),
+            _json_dumps(post_data.get("pain_keywords", [])),
+            post_data.get("filter_reason", ""),
+            _json_dumps(post_data.get("aspiration_keywords", [])),
+            post_data.get("aspiration_score", 0.0),
+            post_data.get("pass_type", "pain"),
+            post_data.get("engagement_score", 0.0),
+            post_data.get("trust_level", 0.5),
+            post_data.get("author", "")
+        )
+
     def insert_filtered_post(self, post_data: Dict[str, Any]) -> bool:
         """插入过滤后的帖子"""
         try:
@@ -641,155 +1090,197 @@ class WiseCollectionDB:
                 return False
 
             with self.get_connection("filtered") as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO filtered_posts
-                    (id, title, body, subreddit, url, score, num_comments,
-                     upvote_ratio, pain_score, pain_keywords, filter_reason,
-                     aspiration_keywords, aspiration_score, pass_type, engagement_score, trust_level, author)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    post_id,
-                    post_data["title"],
-                    post_data.get("body", ""),
-                    post_data["subreddit"],
-                    post_data["url"],
-                    post_data["score"],
-                    post_data["num_comments"],
-                    post_data.get("upvote_ratio", 0.0),
-                    post_data.get("pain_score", 0.0),
-                    json.dumps(post_data.get("pain_keywords", [])),
-                    post_data.get("filter_reason", ""),
-                    json.dumps(post_data.get("aspiration_keywords", [])),
-                    post_data.get("aspiration_score", 0.0),
-                    post_data.get("pass_type", "pain"),
-                    post_data.get("engagement_score", 0.0),
-                    post_data.get("trust_level", 0.5),
-                    post_data.get("author", "")
-                ))
-                conn.commit()
+                conn.execute(_SQL_INSERT_FILTERED_POST, self._filtered_post_row(post_data))
+                self._commit(conn)
                 return True
         except Exception as e:
             logger.error(f"Failed to insert filtered post {post_data.get('id')}: {e}")
             return False
 
-    def get_filtered_posts(self, limit: int = 100, min_pain_score: float = 0.0) -> List[Dict]:
-        """获取过滤后的帖子"""
-        try:
-            # 首先获取所有已提取的帖子ID
-            with self.get_connection("pain") as conn:
-                cursor = conn.execute("SELECT DISTINCT post_id FROM pain_events")
-                extracted_ids = {row['post_id'] for row in cursor.fetchall()}
+    def insert_filtered_posts(self, posts: List[Dict[str, Any]]) -> int:
+        """批量插入过滤后的帖子（单个事务）
+
+        Returns:
+            成功插入的数量
+        """
+        rows = []
+        for post_data in posts:
+            post_id = post_data.get("id")
+            if not post_id or post_id.strip() == "":
+                logger.error(f"Invalid post ID: '{post_id}'. Skipping insertion.")
+                continue
+            try:
+                rows.append(self._filtered_post_row(post_data))
+            except KeyError as e:
+                logger.error(f"Failed to insert filtered post {post_id}: missing field {e}")
+
+        if not rows:
+            return 0
 
-            # 然后获取过滤后的帖子
+        try:
             with self.get_connection("filtered") as conn:
-                if extracted_ids:
-                    # 如果有已提取的帖子，排除它们
-                    placeholders = ','.join('?' * len(extracted_ids))
-                    cursor = conn.execute(f"""
-                        SELECT * FROM filtered_posts
-                        WHERE pain_score >= ?
-                        AND id NOT IN ({placeholders})
-                        ORDER BY pain_score DESC
-                        LIMIT ?
-                    """, [min_pain_score] + list(extracted_ids) + [limit])
-                else:
-                    # 如果没有已提取的帖子，直接获取
-                    cursor = conn.execute("""
-                        SELECT * FROM filtered_posts
-                        WHERE pain_score >= ?
-                        ORDER BY pain_score DESC
-                        LIMIT ?
-                    """, (min_pain_score, limit))
-                return [dict(row) for row in cursor.fetchall()]
+                with self._transaction(conn):
+                    conn.executemany(_SQL_INSERT_FILTERED_POST, rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Failed to insert {len(rows)} filtered posts: {e}")
+            return 0
+
+    def get_filtered_posts(self, limit: int = 100, min_pain_score: float = 0.0) -> List[Dict]:
+        """获取过滤后的帖子（排除已抽取痛点的帖子）"""
+        try:
+            # 使用 NOT EXISTS 在SQLite内完成排除，走extracted_posts主键
+            with self.get_connection("filtered", readonly=True, row_factory=None) as conn:
+                cursor = conn.execute(_SQL_SELECT_FILTERED_POSTS, (min_pain_score, limit))
+                return self._rows_to_dicts(cursor)
         except Exception as e:
             logger.error(f"Failed to get filtered posts: {e}")
             return []
 
+    def mark_posts_extracted(self, post_ids: List[str]) -> int:
+        """登记已完成抽取的帖子（包括未抽取出痛点的帖子），避免重复抽取
+
+        Returns:
+            登记的帖子数量
+        """
+        if not post_ids:
+            return 0
+
+        try:
+            with self.get_connection("filtered") as conn:
+                with self._transaction(conn):
+                    conn.executemany("""
+                        INSERT OR IGNORE INTO extracted_posts (post_id) VALUES (?)
+                    """, [(post_id,) for post_id in post_ids])
+            return len(post_ids)
+        except Exception as e:
+            logger.error(f"Failed to mark {len(post_ids)} posts as extracted: {e}")
+            return 0
+
     # Pain events operations
+    @staticmethod
+    def _pain_event_row(pain_data: Dict[str, Any]) -> tuple:
+        """构建pain_events插入参数"""
+        return (
+            pain_data["post_id"],
+            pain_data.get("source_type", "post"),  # NEW: source_type
+            pain_data.get("source_id"),             # NEW: source_id
+            pain_data.get("parent_post_id"),        # NEW: parent_post_id
+            pain_data.get("actor", ""),
+            pain_data.get("context", ""),
+            pain_data["problem"],
+            pain_data.get("current_workaround", ""),
+            pain_data.get("frequency", ""),
+            pain_data.get("emotional_signal", ""),
+            _json_dumps(pain_data.get("mentioned_tools", [])),
+            pain_data.get("extraction_confidence", 0.0)
+        )
+
     def insert_pain_event(self, pain_data: Dict[str, Any]) -> Optional[int]:
         """插入痛点事件（支持post和comment来源）- Phase 2: Include Comments"""
         try:
             with self.get_connection("pain") as conn:
-                cursor = conn.execute("""
-                    INSERT INTO pain_events
-                    (post_id, source_type, source_id, parent_post_id, actor, context,
-                     problem, current_workaround, frequency, emotional_signal,
-                     mentioned_tools, extraction_confidence)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    pain_data["post_id"],
-                    pain_data.get("source_type", "post"),  # NEW: source_type
-                    pain_data.get("source_id"),             # NEW: source_id
-                    pain_data.get("parent_post_id"),        # NEW: parent_post_id
-                    pain_data.get("actor", ""),
-                    pain_data.get("context", ""),
-                    pain_data["problem"],
-                    pain_data.get("current_workaround", ""),
-                    pain_data.get("frequency", ""),
-                    pain_data.get("emotional_signal", ""),
-                    json.dumps(pain_data.get("mentioned_tools", [])),
-                    pain_data.get("extraction_confidence", 0.0)
-                ))
-                pain_event_id = cursor.lastrowid
-                conn.commit()
+                cursor = conn.execute(_SQL_INSERT_PAIN_EVENT_RETURNING_ID, self._pain_event_row(pain_data))
+                pain_event_id = cursor.fetchone()[0]
+                self._commit(conn)
                 return pain_event_id
         except Exception as e:
             logger.error(f"Failed to insert pain event: {e}")
             return None
 
+    def insert_pain_events(self, pain_events: List[Dict[str, Any]]) -> int:
+        """批量插入痛点事件（单个事务 + executemany）
+
+        Returns:
+            成功插入的数量
+        """
+        rows = []
+        for pain_data in pain_events:
+            try:
+                rows.append(self._pain_event_row(pain_data))
+            except KeyError as e:
+                logger.error(f"Failed to insert pain event: missing field {e}")
+
+        if not rows:
+            return 0
+
+        try:
+            with self.get_connection("pain") as conn:
+                with self._transaction(conn):
+                    conn.executemany(_SQL_INSERT_PAIN_EVENT, rows)
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Failed to insert {len(rows)} pain events: {e}")
+            return 0
+
     def insert_pain_embedding(self, pain_event_id: int, embedding_vector: List[float], model_name: str) -> bool:
-        """插入痛点嵌入向量"""
+        """插入痛点嵌入向量
+
+        单条写入会单独提交一次，批量写入请使用insert_pain_embeddings。
+        """
+        return self.insert_pain_embeddings([(pain_event_id, embedding_vector, model_name)]) == 1
+
+    def insert_pain_embeddings(self, items: List[Tuple[int, List[float], str]]) -> int:
+        """批量插入痛点嵌入向量（单个事务 + executemany）
+
+        Args:
+            items: (pain_event_id, embedding_vector, model_name) 列表
+
+        Returns:
+            成功插入的数量
+        """
+        if not items:
+            return 0
+
         try:
-            import pickle
-            embedding_blob = pickle.dumps(embedding_vector)
+            rows = [
+                (pain_event_id, encode_embedding(embedding_vector), model_name)
+                for pain_event_id, embedding_vector, model_name in items
+            ]
 
             with self.get_connection("pain") as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO pain_embeddings
-                    (pain_event_id, embedding_vector, embedding_model)
-                    VALUES (?, ?, ?)
-                """, (pain_event_id, embedding_blob, model_name))
-                conn.commit()
-                return True
+                with self._transaction(conn):
+                    conn.executemany(_SQL_INSERT_PAIN_EMBEDDING, rows)
+            return len(rows)
         except Exception as e:
-            logger.error(f"Failed to insert pain embedding for event {pain_event_id}: {e}")
-            return False
+            event_ids = [item[0] for item in items]
+            logger.error(f"Failed to insert pain embeddings for events {event_ids[:10]}: {e}")
+            return 0
 
     def get_pain_events_without_embeddings(self, limit: int = 100) -> List[Dict]:
         """获取没有嵌入向量的痛点事件"""
         try:
-            with self.get_connection("pain") as conn:
-                cursor = conn.execute("""
-                    SELECT p.* FROM pain_events p
-                    LEFT JOIN pain_embeddings e ON p.id = e.pain_event_id
-                    WHERE e.pain_event_id IS NULL
-                    ORDER BY p.extracted_at DESC
-                    LIMIT ?
-                """, (limit,))
-                return [dict(row) for row in cursor.fetchall()]
+            with self.get_connection("pain", readonly=True, row_factory=None) as conn:
+                cursor = conn.execute(_SQL_SELECT_PAIN_EVENTS_WITHOUT_EMBEDDINGS, (limit,))
+                return self._rows_to_dicts(cursor)
         except Exception as e:
             logger.error(f"Failed to get pain events without embeddings: {e}")
             return []
 
-    def get_all_pain_events_with_embeddings(self) -> List[Dict]:
+    def iter_pain_events_with_embeddings(self, limit: Optional[int] = None) -> Iterator[Dict]:
+        """逐行迭代有嵌入向量的痛点事件（流式读取，不一次性加载全部向量）
+
+        Args:
+            limit: 最多返回的数量，None表示不限制
+        """
+        with self.get_connection("pain", readonly=True, row_factory=None) as conn:
+            # LIMIT -1 表示不限制，SQL文本保持不变以命中语句缓存
+            cursor = conn.execute(
+                _SQL_SELECT_PAIN_EVENTS_WITH_EMBEDDINGS,
+                (limit if limit is not None else -1,)
+            )
+            columns = [col[0] for col in cursor.description]
+            for row in cursor:
+                event_data = dict(zip(columns, row))
+                # 反序列化嵌入向量
+                if event_data["embedding_vector"]:
+                    event_data["embedding_vector"] = decode_embedding(event_data["embedding_vector"])
+                yield event_data
+
+    def get_all_pain_events_with_embeddings(self, limit: Optional[int] = None) -> List[Dict]:
         """获取所有有嵌入向量的痛点事件"""
         try:
-            import pickle
-            with self.get_connection("pain") as conn:
-                cursor = conn.execute("""
-                    SELECT p.*, e.embedding_vector, e.embedding_model
-                    FROM pain_events p
-                    JOIN pain_embeddings e ON p.id = e.pain_event_id
-                    ORDER BY p.extracted_at DESC
-                """)
-                results = []
-                for row in cursor.fetchall():
-                    event_data = dict(row)
-                    # 反序列化嵌入向量
-                    if event_data["embedding_vector"]:
-                        event_data["embedding_vector"] = pickle.loads(event_data["embedding_vector"])
-                    results.append(event_data)
-                return results
+            return list(self.iter_pain_events_with_embeddings(limit))
         except Exception as e:
             logger.error(f"Failed to get pain events with embeddings: {e}")
             return []
@@ -799,37 +1290,29 @@ class WiseCollectionDB:
         """插入聚类（包含JTBD字段）"""
         try:
             with self.get_connection("clusters") as conn:
-                cursor = conn.execute("""
-                    INSERT INTO clusters
-                    (cluster_name, cluster_description, source_type, centroid_summary,
-                     common_pain, common_context, example_events, pain_event_ids, cluster_size,
-                     avg_pain_score, workflow_confidence, workflow_similarity,
-                     job_statement, job_steps, desired_outcomes, job_context,
-                     customer_profile, semantic_category, product_impact)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                cursor = conn.execute(_SQL_INSERT_CLUSTER, (
                     cluster_data["cluster_name"],
                     cluster_data.get("cluster_description", ""),
                     cluster_data.get("source_type", ""),
                     cluster_data.get("centroid_summary", ""),
                     cluster_data.get("common_pain", ""),
                     cluster_data.get("common_context", ""),
-                    json.dumps(cluster_data.get("example_events", [])),
-                    json.dumps(cluster_data["pain_event_ids"]),
+                    _json_dumps(cluster_data.get("example_events", [])),
+                    _json_dumps(cluster_data["pain_event_ids"]),
                     cluster_data["cluster_size"],
                     cluster_data.get("avg_pain_score", 0.0),
                     cluster_data.get("workflow_confidence", 0.0),
                     cluster_data.get("workflow_similarity", 0.0),
                     cluster_data.get("job_statement"),  # JTBD fields
-                    json.dumps(cluster_data.get("job_steps", [])),
-                    json.dumps(cluster_data.get("desired_outcomes", [])),
+                    _json_dumps(cluster_data.get("job_steps", [])),
+                    _json_dumps(cluster_data.get("desired_outcomes", [])),
                     cluster_data.get("job_context"),
                     cluster_data.get("customer_profile"),
                     cluster_data.get("semantic_category"),
                     cluster_data.get("product_impact", 0.0)
                 ))
-                cluster_id = cursor.lastrowid
-                conn.commit()
+                cluster_id = cursor.fetchone()[0]
+                self._commit(conn)
                 return cluster_id
         except Exception as e:
             logger.error(f"Failed to insert cluster: {e}")
@@ -851,13 +1334,14 @@ class WiseCollectionDB:
                 return False
 
             with self.get_connection("pain") as conn:
-                placeholders = ','.join('?' for _ in event_ids)
-                conn.execute(f"""
+                # ID列表以单个JSON参数传入：不受SQLITE_MAX_VARIABLE_NUMBER限制，
+                # 语句文本固定（命中语句缓存），并按主键逐个定位
+                conn.execute("""
                     UPDATE pain_events
                     SET cluster_id = ?
-                    WHERE id IN ({placeholders})
-                """, [cluster_id] + event_ids)
-                conn.commit()
+                    WHERE id IN (SELECT value FROM json_each(?))
+                """, (cluster_id, _json_dumps([int(event_id) for event_id in event_ids])))
+                self._commit(conn)
 
                 logger.info(f"Assigned {len(event_ids)} pain events to cluster {cluster_id}")
                 return True
@@ -870,14 +1354,7 @@ class WiseCollectionDB:
         """插入机会"""
         try:
             with self.get_connection("clusters") as conn:
-                cursor = conn.execute("""
-                    INSERT INTO opportunities
-                    (cluster_id, opportunity_name, description, current_tools,
-                     missing_capability, why_existing_fail, target_users,
-                     pain_frequency_score, market_size_score, mvp_complexity_score,
-                     competition_risk_score, integration_complexity_score, total_score, killer_risks, recommendation)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
+                cursor = conn.execute(_SQL_INSERT_OPPORTUNITY, (
                     opportunity_data["cluster_id"],
                     opportunity_data["opportunity_name"],
                     opportunity_data["description"],
@@ -891,20 +1368,24 @@ class WiseCollectionDB:
                     opportunity_data.get("competition_risk_score", 0.0),
                     opportunity_data.get("integration_complexity_score", 0.0),
                     opportunity_data.get("total_score", 0.0),
-                    json.dumps(opportunity_data.get("killer_risks", [])),
+                    _json_dumps(opportunity_data.get("killer_risks", [])),
                     opportunity_data.get("recommendation", "")
                 ))
-                opportunity_id = cursor.lastrowid
-                conn.commit()
+                opportunity_id = cursor.fetchone()[0]
+                self._commit(conn)
                 return opportunity_id
         except Exception as e:
             logger.error(f"Failed to insert opportunity: {e}")
             return None
 
-    def get_top_opportunities(self, limit: int = 20) -> List[Dict]:
-        """获取最高分的机会"""
+    def get_top_opportunities(self, limit: int = 20) -> List[sqlite3.Row]:
+        """获取最高分的机会
+
+        直接返回sqlite3.Row（支持row["col"]和keys()），不逐行复制为dict；
+        需要修改结果的调用方自行dict(row)
+        """
         try:
-            with self.get_connection("clusters") as conn:
+            with self.get_connection("clusters", readonly=True) as conn:
                 cursor = conn.execute("""
                     SELECT o.*, c.cluster_name, c.cluster_description
                     FROM opportunities o
@@ -912,7 +1393,7 @@ class WiseCollectionDB:
                     ORDER BY o.total_score DESC
                     LIMIT ?
                 """, (limit,))
-                return [dict(row) for row in cursor.fetchall()]
+                return cursor.fetchall()
         except Exception as e:
             logger.error(f"Failed to get top opportunities: {e}")
             return []
@@ -923,31 +1404,16 @@ class WiseCollectionDB:
         stats = {}
 
         try:
-            # Raw posts count
-            with self.get_connection("raw") as conn:
-                cursor = conn.execute("SELECT COUNT(*) as count FROM posts")
-                stats["raw_posts_count"] = cursor.fetchone()["count"]
-
-            # Filtered posts count
-            with self.get_connection("filtered") as conn:
-                cursor = conn.execute("SELECT COUNT(*) as count FROM filtered_posts")
-                stats["filtered_posts_count"] = cursor.fetchone()["count"]
-
-                cursor = conn.execute("SELECT AVG(pain_score) as avg_score FROM filtered_posts")
-                stats["avg_pain_score"] = cursor.fetchone()["avg_score"] or 0
-
-            # Pain events count
-            with self.get_connection("pain") as conn:
-                cursor = conn.execute("SELECT COUNT(*) as count FROM pain_events")
-                stats["pain_events_count"] = cursor.fetchone()["count"]
-
-            # Clusters count
-            with self.get_connection("clusters") as conn:
-                cursor = conn.execute("SELECT COUNT(*) as count FROM clusters")
-                stats["clusters_count"] = cursor.fetchone()["count"]
-
-                cursor = conn.execute("SELECT COUNT(*) as count FROM opportunities")
-                stats["opportunities_count"] = cursor.fetchone()["count"]
+            # 所有统计在同一个连接上完成
+            with self.get_connection("raw", readonly=True) as conn:
+                # 各表计数合并为一条语句（同一快照）
+                row = conn.execute(_SQL_STATS_COUNTS).fetchone()
+                stats["raw_posts_count"] = row["raw_posts_count"]
+                stats["filtered_posts_count"] = row["filtered_posts_count"]
+                stats["avg_pain_score"] = row["avg_pain_score"] or 0
+                stats["pain_events_count"] = row["pain_events_count"]
+                stats["clusters_count"] = row["clusters_count"]
+                stats["opportunities_count"] = row["opportunities_count"]
 
                 cursor = conn.execute("""
                     SELECT alignment_status, COUNT(*) as count
@@ -960,8 +1426,7 @@ class WiseCollectionDB:
                     for row in cursor.fetchall()
                 }
 
-            # 按数据源统计原始帖子
-            with self.get_connection("raw") as conn:
+                # 按数据源统计原始帖子
                 cursor = conn.execute("""
                     SELECT source, COUNT(*) as count
                     FROM posts
@@ -992,7 +1457,7 @@ class WiseCollectionDB:
                     )
                     raise ValueError(f"Cluster '{cluster_name}' not found for alignment update")
 
-                conn.commit()
+                self._commit(conn)
                 logger.info(f"Successfully updated cluster '{cluster_name}' to status='{status}'" + (
                     f", aligned_problem_id='{aligned_problem_id}'" if aligned_problem_id else ""
                 ))
@@ -1010,7 +1475,8 @@ class WiseCollectionDB:
                   如果为False，只返回尚未映射opportunities的clusters（默认行为）
         """
         try:
-            with self.get_connection("clusters") as conn:
+            # 调用方会对结果调用.get()，用tuple行+一次性列名映射构造dict
+            with self.get_connection("clusters", readonly=True, row_factory=None) as conn:
                 if force:
                     # 强制模式：返回所有符合条件的clusters，包括已有opportunities的
                     cursor = conn.execute("""
@@ -1024,21 +1490,19 @@ class WiseCollectionDB:
                     logger.info("Force mode enabled: returning ALL eligible clusters, including those with existing opportunities")
                 else:
                     # 默认模式：只返回尚未有opportunities的clusters
+                    # 反连接（LEFT JOIN ... IS NULL）走 idx_opportunities_cluster_id
                     cursor = conn.execute("""
-                        SELECT id, cluster_name, source_type, centroid_summary,
-                               common_pain, pain_event_ids, cluster_size,
-                               cluster_description, workflow_confidence, created_at
-                        FROM clusters
-                        WHERE (alignment_status IN ('unprocessed', 'processed')
-                               OR alignment_status IS NULL)
-                          AND NOT EXISTS (
-                              SELECT 1 FROM opportunities
-                              WHERE opportunities.cluster_id = clusters.id
-                          )
+                        SELECT c.id, c.cluster_name, c.source_type, c.centroid_summary,
+                               c.common_pain, c.pain_event_ids, c.cluster_size,
+                               c.cluster_description, c.workflow_confidence, c.created_at
+                        FROM clusters c
+                        LEFT JOIN opportunities o ON o.cluster_id = c.id
+                        WHERE (c.alignment_status IN ('unprocessed', 'processed')
+                               OR c.alignment_status IS NULL)
+                          AND o.cluster_id IS NULL
                     """)
 
-                clusters = [dict(row) for row in cursor.fetchall()]
-                return clusters
+                return self._rows_to_dicts(cursor)
 
         except Exception as e:
             logger.error(f"Failed to get clusters for opportunity mapping: {e}")
@@ -1059,7 +1523,7 @@ class WiseCollectionDB:
             跨源验证的机会列表
         """
         try:
-            with self.get_connection("opportunities") as conn:
+            with self.get_connection("opportunities", readonly=True, row_factory=None) as conn:
                 query = """
                     SELECT
                         o.opportunity_name,
@@ -1078,21 +1542,25 @@ class WiseCollectionDB:
                     WHERE 1=1
                 """
 
-                params = []
-
                 query += " ORDER BY o.total_score DESC"
 
-                cursor = conn.execute(query, params)
-                results = [dict(row) for row in cursor.fetchall()]
+                # 一次查询预取所有已对齐的聚类名，循环内只做字典查找（避免每个机会一次查询）
+                aligned_by_name = dict(conn.execute("""
+                    SELECT cluster_name, MIN(aligned_problem_id)
+                    FROM clusters
+                    WHERE aligned_problem_id IS NOT NULL
+                    GROUP BY cluster_name
+                """).fetchall())
 
-                # 在 Python 中进行跨源验证过滤
+                # 流式读取机会并在 Python 中进行跨源验证过滤（单遍，不物化完整结果集）
                 filtered_results = []
-                for result in results:
+                for result in self._iter_dicts(conn.execute(query)):
                     validation_info = self._check_cross_source_validation_sync(
                         result['cluster_name'],
                         result.get('source_type'),
                         result.get('aligned_problem_id'),
-                        result.get('cluster_size', 0)
+                        result.get('cluster_size', 0),
+                        aligned_by_name=aligned_by_name
                     )
 
                     validation_level = validation_info.get('validation_level', 0)
@@ -1113,6 +1581,60 @@ class WiseCollectionDB:
             logger.error(f"Failed to get cross-source validated opportunities: {e}")
             return []
 
+    def _check_cross_source_validation_sync(
+        self,
+        cluster_name: str,
+        source_type: Optional[str],
+        aligned_problem_id: Optional[str],
+        cluster_size: int,
+        aligned_by_name: Optional[Dict[str, str]] = None
+    ) -> Mapping[str, Any]:
+        """同步版本的跨源验证检查（用于数据库查询）
+
+        对齐关系记录在clusters.aligned_problem_id上，按cluster_name做索引等值查找
+        （idx_clusters_name_aligned），替代对aligned_problems.cluster_ids的LIKE全表扫描。
+        目前只能检测 Level 1（跨平台对齐）的验证。
+
+        Args:
+            cluster_name: 聚类名称
+            source_type: 来源类型
+            aligned_problem_id: 对齐问题ID
+            cluster_size: 聚类规模
+            aligned_by_name: 预取的 cluster_name -> aligned_problem_id 映射；
+                             提供时不再查询数据库（批量检查时使用）
+
+        Returns:
+            验证信息（共享的只读映射，需要修改时调用方自行dict()）
+        """
+        # Level 1: 检查 aligned source_type 或 aligned_problem_id
+        if source_type == 'aligned' or aligned_problem_id:
+            return _ALIGNED_SOURCE_VALIDATION
+
+        # Level 1: 同名聚类的其它记录是否已对齐
+        if aligned_by_name is not None:
+            found_problem_id = aligned_by_name.get(cluster_name)
+        else:
+            found_problem_id = None
+            try:
+                with self.get_connection("clusters", readonly=True) as conn:
+                    cursor = conn.execute("""
+                        SELECT aligned_problem_id
+                        FROM clusters
+                        WHERE cluster_name = ? AND aligned_problem_id IS NOT NULL
+                        LIMIT 1
+                    """, (cluster_name,))
+                    result = cursor.fetchone()
+                    if result:
+                        found_problem_id = result[0]
+            except Exception as e:
+                logger.warning(f"Failed to check alignment for {cluster_name}: {e}")
+
+        if found_problem_id:
+            return _aligned_problem_validation(found_problem_id)
+
+        # 无跨源验证
+        return _NO_CROSS_SOURCE_VALIDATION
+
         """获取跨表统计信息（仅在统一模式下有效）"""
         if not self.unified:
             logger.warning("Cross-table stats only available in unified mode")
@@ -1159,36 +1681,45 @@ class WiseCollectionDB:
         stats = {}
 
         try:
-            with self.get_connection("clusters") as conn:
-                # Workflow similarity distribution
-                cursor = conn.execute("""
-                    SELECT
-                        COUNT(*) as total_clusters,
-                        AVG(workflow_similarity) as avg_similarity,
-                        MIN(workflow_similarity) as min_similarity,
-                        MAX(workflow_similarity) as max_similarity
-                    FROM clusters
-                    WHERE workflow_similarity IS NOT NULL
-                """)
-                row = cursor.fetchone()
-                stats['workflow_similarity'] = dict(row) if row else {}
-
-                # Distribution buckets
-                cursor = conn.execute("""
-                    SELECT
-                        CASE
-                            WHEN workflow_similarity >= 0.8 THEN 'high'
-                            WHEN workflow_similarity >= 0.6 THEN 'medium'
-                            ELSE 'low'
-                        END as bucket,
-                        COUNT(*) as count
-                    FROM clusters
-                    WHERE workflow_similarity IS NOT NULL
-                    GROUP BY bucket
-                """)
-                stats['workflow_similarity_distribution'] = {row['bucket']: row['count'] for row in cursor.fetchall()}
+            # 统一数据库：一个连接、两条语句完成全部统计
+            with self.get_connection("clusters", readonly=True) as conn:
+                # Workflow similarity summary + distribution buckets (CTE)
+                rows = conn.execute("""
+                    WITH scored AS (
+                        SELECT workflow_similarity
+                        FROM clusters
+                        WHERE workflow_similarity IS NOT NULL
+                    ),
+                    stats AS (
+                        SELECT
+                            COUNT(*) as total_clusters,
+                            AVG(workflow_similarity) as avg_similarity,
+                            MIN(workflow_similarity) as min_similarity,
+                            MAX(workflow_similarity) as max_similarity
+                        FROM scored
+                    ),
+                    buckets AS (
+                        SELECT
+                            CASE
+                                WHEN workflow_similarity >= 0.8 THEN 'high'
+                                WHEN workflow_similarity >= 0.6 THEN 'medium'
+                                ELSE 'low'
+                            END as bucket,
+                            COUNT(*) as count
+                        FROM scored
+                        GROUP BY bucket
+                    )
+                    SELECT stats.*, buckets.bucket, buckets.count
+                    FROM stats LEFT JOIN buckets ON 1 = 1
+                """).fetchall()
+                stats['workflow_similarity'] = {
+                    key: rows[0][key]
+                    for key in ('total_clusters', 'avg_similarity', 'min_similarity', 'max_similarity')
+                } if rows else {}
+                stats['workflow_similarity_distribution'] = {
+                    row['bucket']: row['count'] for row in rows if row['bucket'] is not None
+                }
 
-            with self.get_connection("raw") as conn:
                 # Trust level distribution by source
                 cursor = conn.execute("""
                     SELECT
@@ -1207,5 +1738,23 @@ class WiseCollectionDB:
         return stats
 
 
-# 全局数据库实例（统一数据库）
-db = WiseCollectionDB()
\ No newline at end of file
+# 全局数据库实例（统一数据库），首次使用时才创建
+_db: Optional[WiseCollectionDB] = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> WiseCollectionDB:
+    """获取全局数据库实例（首次调用时初始化，只导入工具函数的模块不再触发建库）"""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = WiseCollectionDB()
+    return _db
+
+
+def __getattr__(name: str):
+    """兼容 `from utils.db import db`：首次访问db时才创建实例"""
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -3,25 +3,90 @@ Embedding utilities for Reddit Pain Point Finder
 向量化工具，用于痛点事件聚类
 """
 import os
+import io
+import hashlib
 import logging
-import pickle
+import tempfile
+import httpx
 import numpy as np
+import orjson
 from typing import List, Dict, Any, Optional, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import DBSCAN
-import yaml
-from openai import OpenAI
+from openai import (
+    OpenAI,
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
 import backoff
 
+from utils.config_loader import load_yaml_config
+
+# 可选依赖：配置embedding.local_model并安装sentence-transformers后，在本地CPU上生成嵌入
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# 可选依赖：安装faiss-cpu后，大规模聚类改用HNSW近邻图
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
 logger = logging.getLogger(__name__)
 
+# 只对暂时性错误重试：限流、超时、连接错误和服务端5xx；鉴权/参数错误和本地模型异常直接失败
+_RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# 痛点事件中参与嵌入的字段（按语义顺序）
+_PAIN_EVENT_TEXT_FIELDS = ("actor", "context", "problem", "current_workaround")
+
+# 事件数不少于此值且faiss可用时，使用近似近邻聚类替代O(N²)的DBSCAN
+ANN_CLUSTERING_MIN_EVENTS = 2000
+
+
+def _cache_key(text: str) -> bytes:
+    """嵌入缓存键：文本的16字节blake2b摘要（长文本只哈希一次，字典比较定长键）"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _as_matrix(embeddings) -> np.ndarray:
+    """将嵌入向量统一为连续的float32矩阵 (N, D)，已是float32 ndarray时不复制"""
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def _atomic_write(path: str, data: bytes):
+    """原子写文件：先写同目录下的临时文件再os.replace替换
+
+    读取方（包括以mmap打开旧文件的视图）只会看到完整的旧文件或新文件
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """按行L2归一化（归一化后余弦相似度即为点积）；对已归一化的向量结果不变"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / (norms + 1e-12)
+
+
 class EmbeddingClient:
     """嵌入向量客户端"""
 
     def __init__(self, config_path: str = "config/llm.yaml"):
         """初始化嵌入客户端"""
         self.config = self._load_config(config_path)
-        self.client = self._init_client()
+        self.local_model = self._init_local_model()
+        # 使用本地模型时不需要API客户端（也不要求配置API key）
+        self.client = self._init_client() if self.local_model is None else None
         self.model_name = self._get_model_name()
         self.embedding_cache = {}
         self.stats = {
@@ -33,8 +98,7 @@ class EmbeddingClient:
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """加载配置"""
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_yaml_config(config_path)
         except Exception as e:
             logger.error(f"Failed to load config from {config_path}: {e}")
             raise
@@ -45,14 +109,62 @@ class EmbeddingClient:
         if not api_key:
             raise ValueError(f"API key not found: {self.config['api']['api_key_env']}")
 
+        # 与LLM客户端共用api_settings.connection_pool：默认的5秒空闲超时下，
+        # 聚类中分批请求嵌入时几乎每批都要重新握手
+        pool = self.config.get('api_settings', {}).get('connection_pool', {})
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool.get('max_connections', 256),
+                max_keepalive_connections=pool.get('max_keepalive_connections', 128),
+                keepalive_expiry=pool.get('keepalive_expiry', 60.0)
+            ),
+            timeout=httpx.Timeout(180.0, connect=10.0)
+        )
+
         return OpenAI(
             api_key=api_key,
-            base_url=self.config['api']['base_url']
+            base_url=self.config['api']['base_url'],
+            http_client=http_client
+        )
+
+    def _init_local_model(self):
+        """初始化本地嵌入模型（未配置local_model或未安装sentence-transformers时返回None）
+
+        本地模型与远程模型的向量空间/维度不同，因此整个客户端只使用其中一种，
+        不在同一批数据中混用
+        """
+        embedding_config = self.config.get("embedding", {})
+        model_name = embedding_config.get("local_model")
+        if not model_name:
+            return None
+        if SentenceTransformer is None:
+            logger.warning(f"sentence-transformers not installed, ignoring local embedding model {model_name}")
+            return None
+
+        kwargs = {"device": "cpu"}
+        if embedding_config.get("local_backend"):
+            # 例如 "onnx"：由ONNX Runtime在CPU上推理
+            kwargs["backend"] = embedding_config["local_backend"]
+        logger.info(f"Using local embedding model {model_name}")
+        return SentenceTransformer(model_name, **kwargs)
+
+    def _encode_local(self, texts: List[str]) -> np.ndarray:
+        """用本地模型编码一批文本（float32，已L2归一化）"""
+        vectors = self.local_model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
         )
+        self.stats["embeddings_created"] += len(texts)
+        return _as_matrix(vectors)
 
     def _get_model_name(self) -> str:
         """获取嵌入模型名称"""
         embedding_config = self.config.get("embedding", {})
+        if self.local_model is not None:
+            return embedding_config["local_model"]
         env_name = embedding_config.get("env_name")
         if env_name and os.getenv(env_name):
             return os.getenv(env_name)
@@ -60,106 +172,163 @@ class EmbeddingClient:
 
     @backoff.on_exception(
         backoff.expo,
-        Exception,
+        _RETRYABLE_ERRORS,
         max_tries=3,
         base=1,
-        max_value=60
+        max_value=60,
+        jitter=backoff.full_jitter
     )
-    def create_embedding(self, text: str) -> List[float]:
-        """创建文本嵌入向量"""
+    def create_embedding(self, text: str) -> np.ndarray:
+        """创建文本嵌入向量（float32，已L2归一化）"""
         try:
             # 检查缓存
-            if text in self.embedding_cache:
+            key = _cache_key(text)
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
                 self.stats["cache_hits"] += 1
-                return self.embedding_cache[text]
+                return cached
 
-            # 调用API
-            response = self.client.embeddings.create(
-                model=self.model_name,
-                input=text
-            )
+            if self.local_model is not None:
+                # 本地模型：无网络往返，输出已归一化
+                embedding = self._encode_local([text])[0]
+            else:
+                # 调用API
+                response = self.client.embeddings.create(
+                    model=self.model_name,
+                    input=text
+                )
 
-            embedding = response.data[0].embedding
+                # 入缓存前归一化一次，之后的相似度计算只需点积
+                embedding = _l2_normalize(_as_matrix(response.data[0].embedding))
 
-            # 更新统计
-            self.stats["embeddings_created"] += 1
-            self.stats["total_tokens"] += response.usage.total_tokens
+                # 更新统计
+                self.stats["embeddings_created"] += 1
+                self.stats["total_tokens"] += response.usage.total_tokens
 
             # 缓存结果
-            self.embedding_cache[text] = embedding
+            self.embedding_cache[key] = embedding
 
-            logger.info(f"Created embedding for text length {len(text)}: {len(embedding)} dimensions")
+            logger.debug("Created embedding for text length %d: %d dimensions", len(text), len(embedding))
             return embedding
 
         except Exception as e:
             logger.error(f"Failed to create embedding: {e}")
             raise
 
-    def create_batch_embeddings(self, texts: List[str], batch_size: int = None) -> List[List[float]]:
-        """批量创建嵌入向量"""
+    @backoff.on_exception(
+        backoff.expo,
+        _RETRYABLE_ERRORS,
+        max_tries=3,
+        base=1,
+        max_value=60,
+        jitter=backoff.full_jitter
+    )
+    def _create_embedding_batch(self, texts: List[str]) -> List[List[float]]:
+        """一次API调用为一批文本创建嵌入向量（结果按index还原为输入顺序）；配置了本地模型时在本地编码"""
+        if self.local_model is not None:
+            return self._encode_local(texts)
+
+        response = self.client.embeddings.create(
+            model=self.model_name,
+            input=texts
+        )
+
+        # 更新统计
+        self.stats["embeddings_created"] += len(response.data)
+        self.stats["total_tokens"] += response.usage.total_tokens
+
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def create_batch_embeddings(self, texts: List[str], batch_size: int = None) -> np.ndarray:
+        """批量创建嵌入向量（每批只发送一次API请求，已缓存或批内重复的文本不再请求）
+
+        Returns:
+            float32矩阵，形状为 (len(texts), D)
+        """
         if batch_size is None:
             batch_size = self.config.get("embedding", {}).get("batch_size", 32)
 
-        embeddings = []
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
         for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
             logger.info(f"Processing batch {i//batch_size + 1}/{(len(texts) + batch_size - 1)//batch_size}")
 
-            for text in batch:
-                embedding = self.create_embedding(text)
-                embeddings.append(embedding)
-
-        return embeddings
-
-    def create_pain_event_embedding(self, pain_event: Dict[str, Any]) -> List[float]:
-        """为痛点事件创建嵌入向量"""
-        # 构建嵌入文本，重点关注问题的本质
-        text_parts = []
+            # 先用缓存命中的结果填充；未缓存的文本按内容去重（保持首次出现顺序）后再发送给API
+            uncached: Dict[bytes, List[int]] = {}
+            unique_texts = []
+            for j in range(i, min(i + batch_size, len(texts))):
+                key = _cache_key(texts[j])
+                cached = self.embedding_cache.get(key)
+                if cached is not None:
+                    self.stats["cache_hits"] += 1
+                    embeddings[j] = cached
+                elif key in uncached:
+                    uncached[key].append(j)
+                else:
+                    uncached[key] = [j]
+                    unique_texts.append(texts[j])
+
+            if not uncached:
+                continue
 
-        if pain_event.get("actor"):
-            text_parts.append(pain_event["actor"])
+            try:
+                vectors = self._create_embedding_batch(unique_texts)
+            except Exception as e:
+                logger.error(f"Failed to create batch embeddings: {e}")
+                raise
 
-        if pain_event.get("context"):
-            text_parts.append(pain_event["context"])
+            for (key, positions), embedding in zip(uncached.items(), _l2_normalize(_as_matrix(vectors))):
+                self.embedding_cache[key] = embedding
+                for j in positions:
+                    embeddings[j] = embedding
 
-        if pain_event.get("problem"):
-            text_parts.append(pain_event["problem"])
+        return _as_matrix(embeddings)
 
-        if pain_event.get("current_workaround"):
-            text_parts.append(pain_event["current_workaround"])
+    @staticmethod
+    def pain_event_text(pain_event: Dict[str, Any]) -> str:
+        """构建痛点事件的嵌入文本，重点关注问题的本质（用 " | " 连接非空字段，保持语义结构）"""
+        return " | ".join(
+            value for field in _PAIN_EVENT_TEXT_FIELDS if (value := pain_event.get(field))
+        )
 
-        # 用 " | " 连接各个部分，保持语义结构
-        embedding_text = " | ".join(text_parts)
+    def create_pain_event_embedding(self, pain_event: Dict[str, Any]) -> np.ndarray:
+        """为痛点事件创建嵌入向量"""
+        return self.create_embedding(self.pain_event_text(pain_event))
 
-        return self.create_embedding(embedding_text)
+    def create_pain_event_embeddings(self, pain_events: List[Dict[str, Any]]) -> np.ndarray:
+        """为一批痛点事件创建嵌入向量（按批次调用API）"""
+        return self.create_batch_embeddings([self.pain_event_text(event) for event in pain_events])
 
-    def calculate_similarity_matrix(self, embeddings: List[List[float]]) -> np.ndarray:
-        """计算相似度矩阵"""
-        return cosine_similarity(embeddings)
+    def calculate_similarity_matrix(self, embeddings: np.ndarray) -> np.ndarray:
+        """计算相似度矩阵（归一化后一次矩阵乘法）"""
+        normalized = _l2_normalize(_as_matrix(embeddings))
+        return normalized @ normalized.T
 
     def find_similar_events(
         self,
-        target_embedding: List[float],
-        candidate_embeddings: List[List[float]],
+        target_embedding: np.ndarray,
+        candidate_embeddings: np.ndarray,
         threshold: float = 0.7,
         top_k: int = 10
     ) -> List[Tuple[int, float]]:
         """找到相似的痛点事件"""
-        similarities = cosine_similarity([target_embedding], candidate_embeddings)[0]
+        target = _l2_normalize(_as_matrix(target_embedding).ravel())
+        similarities = _l2_normalize(_as_matrix(candidate_embeddings)) @ target
 
         # 筛选超过阈值的结果
-        results = []
-        for idx, similarity in enumerate(similarities):
-            if similarity >= threshold:
-                results.append((idx, similarity))
+        indices = np.flatnonzero(similarities >= threshold)
+        k = min(top_k, len(indices))
+        if k <= 0:
+            return []
+        values = similarities[indices]
 
-        # 按相似度排序，返回top_k
-        results.sort(key=lambda x: x[1], reverse=True)
-        return results[:top_k]
+        # argpartition取top_k（O(N)），只对这k个结果按相似度降序排序
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top], kind='stable')]
+        return list(zip(indices[top].tolist(), values[top].tolist()))
 
     def cluster_embeddings(
         self,
-        embeddings: List[List[float]],
+        embeddings: np.ndarray,
         eps: float = 0.5,
         min_samples: int = 3
     ) -> Dict[int, List[int]]:
@@ -167,8 +336,15 @@ class EmbeddingClient:
         if len(embeddings) < min_samples:
             return {0: list(range(len(embeddings)))}  # 如果样本太少，归为一类
 
-        dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine')
-        cluster_labels = dbscan.fit_predict(embeddings)
+        if faiss is not None and len(embeddings) >= ANN_CLUSTERING_MIN_EVENTS:
+            cluster_labels = self._cluster_labels_ann(embeddings, eps, min_samples)
+        else:
+            # 余弦距离矩阵以float32一次矩阵乘法算出，避免sklearn按float64逐对重算
+            distances = 1.0 - self.calculate_similarity_matrix(embeddings)
+            np.clip(distances, 0.0, 2.0, out=distances)
+            np.fill_diagonal(distances, 0.0)
+            dbscan = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+            cluster_labels = dbscan.fit_predict(distances)
 
         # 构建聚类字典
         clusters = {}
@@ -181,10 +357,52 @@ class EmbeddingClient:
 
         return clusters
 
+    @staticmethod
+    def _cluster_labels_ann(embeddings: np.ndarray, eps: float, min_samples: int) -> np.ndarray:
+        """基于FAISS HNSW范围搜索的DBSCAN等价聚类，返回每个点的标签（-1为噪声）
+
+        余弦距离 <= eps 等价于归一化向量内积 >= 1 - eps。
+        核心点（邻居数含自身 >= min_samples）之间的连通分量构成聚类，
+        边界点归入其第一个核心邻居所在的聚类。
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        vectors = _l2_normalize(_as_matrix(embeddings))
+        n, dim = vectors.shape
+
+        index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        index.add(vectors)
+        lims, _, neighbors = index.range_search(vectors, 1.0 - eps)
+        lims = lims.astype(np.int64)
+
+        counts = np.diff(lims)
+        core = counts >= min_samples
+        rows = np.repeat(np.arange(n), counts)
+        cols = neighbors.astype(np.int64)
+
+        # 只保留核心点之间的边
+        core_edges = core[rows] & core[cols]
+        graph = csr_matrix(
+            (np.ones(int(core_edges.sum()), dtype=np.int8), (rows[core_edges], cols[core_edges])),
+            shape=(n, n)
+        )
+        _, components = connected_components(graph, directed=False)
+
+        labels = np.full(n, -1, dtype=np.int64)
+        labels[core] = components[core]
+        for i in np.flatnonzero(~core):
+            point_neighbors = cols[lims[i]:lims[i + 1]]
+            core_neighbors = point_neighbors[core[point_neighbors]]
+            if len(core_neighbors):
+                labels[i] = components[core_neighbors[0]]
+
+        return labels
+
     def analyze_cluster(
         self,
         cluster_indices: List[int],
-        embeddings: List[List[float]],
+        embeddings: np.ndarray,
         pain_events: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """分析一个聚类"""
@@ -192,17 +410,14 @@ class EmbeddingClient:
             return {}
 
         # 计算聚类中心
-        cluster_embeddings = [embeddings[i] for i in cluster_indices]
-        centroid = np.mean(cluster_embeddings, axis=0)
+        cluster_embeddings = _as_matrix(embeddings)[cluster_indices]
+        centroid = cluster_embeddings.mean(axis=0)
 
-        # 计算每个点到中心的距离
-        distances_to_center = [
-            1 - cosine_similarity([embeddings[i]], [centroid])[0][0]
-            for i in cluster_indices
-        ]
+        # 计算每个点到中心的余弦距离（一次矩阵-向量乘法）
+        distances_to_center = 1.0 - _l2_normalize(cluster_embeddings) @ _l2_normalize(centroid)
 
         # 计算聚类的内聚性（平均距离）
-        cohesion = 1 - np.mean(distances_to_center)
+        cohesion = 1 - float(distances_to_center.mean())
 
         # 获取该聚类的痛点事件
         cluster_events = [pain_events[i] for i in cluster_indices]
@@ -212,30 +427,61 @@ class EmbeddingClient:
             "centroid": centroid.tolist(),
             "cohesion": cohesion,
             "events": cluster_events,
-            "avg_distance_to_center": np.mean(distances_to_center),
-            "max_distance_to_center": np.max(distances_to_center)
+            "avg_distance_to_center": float(distances_to_center.mean()),
+            "max_distance_to_center": float(distances_to_center.max())
         }
 
     def get_embedding_statistics(self) -> Dict[str, Any]:
         """获取嵌入统计信息"""
         return self.stats.copy()
 
+    @staticmethod
+    def _embedding_cache_paths(cache_path: str) -> Tuple[str, str]:
+        """缓存文件路径：向量矩阵(.npy) + 按行顺序排列的缓存键(.keys.json，十六进制摘要)"""
+        base = os.path.splitext(cache_path)[0]
+        return f"{base}.npy", f"{base}.keys.json"
+
     def save_embedding_cache(self, cache_path: str):
-        """保存嵌入缓存"""
+        """保存嵌入缓存（float32矩阵 + 十六进制缓存键列表，不使用pickle）"""
         try:
-            with open(cache_path, 'wb') as f:
-                pickle.dump(self.embedding_cache, f)
-            logger.info(f"Saved embedding cache to {cache_path}")
+            vectors_path, keys_path = self._embedding_cache_paths(cache_path)
+            keys = list(self.embedding_cache)
+            if keys:
+                vectors = np.stack([_as_matrix(self.embedding_cache[key]) for key in keys])
+            else:
+                vectors = np.empty((0, 0), dtype=np.float32)
+
+            # 缓存中的向量可能是load_embedding_cache以mmap打开的同一个.npy的视图：
+            # 直接np.save会截断并重写仍在映射中的文件，因此写临时文件后原子替换
+            # （旧文件的映射在替换后仍然有效）
+            buffer = io.BytesIO()
+            np.save(buffer, vectors)
+            _atomic_write(vectors_path, buffer.getvalue())
+            _atomic_write(keys_path, orjson.dumps([key.hex() for key in keys]))
+            logger.info(f"Saved embedding cache to {vectors_path}: {len(keys)} entries")
         except Exception as e:
             logger.error(f"Failed to save embedding cache: {e}")
 
     def load_embedding_cache(self, cache_path: str):
-        """加载嵌入缓存"""
+        """加载嵌入缓存
+
+        向量矩阵以mmap方式打开（由页缓存支撑），每个缓存条目是矩阵的一行视图，
+        不需要逐条反序列化为Python浮点数
+        """
         try:
-            if os.path.exists(cache_path):
-                with open(cache_path, 'rb') as f:
-                    self.embedding_cache = pickle.load(f)
-                logger.info(f"Loaded embedding cache from {cache_path}: {len(self.embedding_cache)} entries")
+            vectors_path, keys_path = self._embedding_cache_paths(cache_path)
+            if os.path.exists(vectors_path) and os.path.exists(keys_path):
+                vectors = np.load(vectors_path, mmap_mode='r')
+                with open(keys_path, 'rb') as f:
+                    keys = orjson.loads(f.read())
+                self.embedding_cache = dict(zip(map(bytes.fromhex, keys), vectors))
+                logger.info(f"Loaded embedding cache from {vectors_path}: {len(self.embedding_cache)} entries")
+            elif os.path.isfile(cache_path) and cache_path not in (vectors_path, keys_path):
+                # 旧版本的pickle缓存不再读取（不反序列化pickle），重新生成嵌入
+                logger.warning(
+                    f"Ignoring legacy pickle embedding cache {cache_path}; "
+                    f"embeddings will be recreated and saved to {vectors_path}"
+                )
         except Exception as e:
             logger.error(f"Failed to load embedding cache: {e}")
 
@@ -250,10 +496,7 @@ class PainEventClustering:
     def _load_clustering_config(self) -> Dict[str, Any]:
         """加载聚类配置"""
         try:
-            config_path = "config/clustering.yaml"
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-            return config
+            return load_yaml_config("config/clustering.yaml")
         except Exception as e:
             logger.error(f"Failed to load clustering config: {e}")
             # 返回默认配置
@@ -273,10 +516,7 @@ class PainEventClustering:
 
         # 1. 创建嵌入向量
         logger.info("Creating embeddings for pain events...")
-        embeddings = []
-        for event in pain_events:
-            embedding = self.embedding_client.create_pain_event_embedding(event)
-            embeddings.append(embedding)
+        embeddings = self.embedding_client.create_pain_event_embeddings(pain_events)
 
         # 2. 使用向量相似度进行初步聚类
         logger.info("Performing vector similarity clustering...")
@@ -337,14 +577,11 @@ class PainEventClustering:
                 "vector_similarity", {}
             ).get("similarity_threshold", 0.7)
 
-        # 创建目标事件的嵌入
-        target_embedding = self.embedding_client.create_pain_event_embedding(target_event)
-
-        # 创建候选事件的嵌入
-        candidate_embeddings = []
-        for event in candidate_events:
-            embedding = self.embedding_client.create_pain_event_embedding(event)
-            candidate_embeddings.append(embedding)
+        # 目标事件和候选事件的嵌入一起按批次创建
+        embeddings = self.embedding_client.create_pain_event_embeddings(
+            [target_event] + list(candidate_events)
+        )
+        target_embedding, candidate_embeddings = embeddings[0], embeddings[1:]
 
         # 找到相似事件
         similar_indices = self.embedding_client.find_similar_events(
@@ -360,6 +597,31 @@ class PainEventClustering:
 
         return results
 
-# 全局嵌入客户端实例
-embedding_client = EmbeddingClient()
-pain_clustering = PainEventClustering(embedding_client)
\ No newline at end of file
+# 全局嵌入客户端实例（首次使用时才读取配置、创建API客户端）
+_embedding_client: Optional[EmbeddingClient] = None
+_pain_clustering: Optional[PainEventClustering] = None
+
+
+def get_embedding_client() -> EmbeddingClient:
+    """获取全局嵌入客户端实例"""
+    global _embedding_client
+    if _embedding_client is None:
+        _embedding_client = EmbeddingClient()
+    return _embedding_client
+
+
+def get_pain_clustering() -> PainEventClustering:
+    """获取全局痛点聚类工具实例"""
+    global _pain_clustering
+    if _pain_clustering is None:
+        _pain_clustering = PainEventClustering(get_embedding_client())
+    return _pain_clustering
+
+
+def __getattr__(name: str):
+    """兼容 `from utils.embedding import embedding_client / pain_clustering`"""
+    if name == "embedding_client":
+        return get_embedding_client()
+    if name == "pain_clustering":
+        return get_pain_clustering()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
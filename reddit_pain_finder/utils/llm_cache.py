@@ -0,0 +1,251 @@
+"""
+LLM response cache for Reddit Pain Point Finder
+LLM响应缓存 - 相同输入（模型、消息、参数）的确定性请求直接返回上次结果；
+语义缓存 - 嵌入向量足够相似的近似重复输入复用上次结果
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """基于SQLite的LLM响应缓存（cache-aside），前面加一层进程内LRU
+
+    Args:
+        cache_path: SQLite缓存文件路径
+        ttl: 条目有效期（秒），None表示不过期
+        memory_size: 进程内LRU保留的条目数（0表示不使用）
+    """
+
+    def __init__(self, cache_path: str = "data/llm_cache.db", ttl: Optional[float] = None, memory_size: int = 1000):
+        """初始化缓存数据库"""
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        # key -> (写入时间, 结果JSON)；保存序列化文本，调用方修改返回值不会影响缓存
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # 同步与异步请求可能来自不同线程，共用一个连接并加锁
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        # 过期条目读取时只是视为未命中，打开时顺带删除，避免缓存文件无限增长
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool
+    ) -> str:
+        """根据影响输出的全部请求参数计算缓存键
+
+        键的序列化保持使用标准库json，已有缓存文件中的键继续有效
+        """
+        payload = json.dumps(
+            [model_name, messages, temperature, max_tokens, json_mode],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created_at: float) -> bool:
+        """条目是否已超过有效期"""
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, payload: str):
+        """写入进程内LRU（调用方持有锁）"""
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = (created_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存结果（先查进程内LRU，再查SQLite），未命中或已过期返回None"""
+        try:
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is not None:
+                    self._memory.move_to_end(key)
+                else:
+                    entry = self._conn.execute(
+                        "SELECT created_at, result FROM llm_responses WHERE cache_key = ?", (key,)
+                    ).fetchone()
+                    if entry is not None:
+                        self._remember(key, *entry)
+            if entry is None or self._expired(entry[0]):
+                return None
+            return orjson.loads(entry[1])
+        except Exception as e:
+            logger.warning(f"Failed to read LLM cache: {e}")
+            return None
+
+    def set(self, key: str, result: Dict[str, Any]) -> bool:
+        """写入缓存结果"""
+        try:
+            payload = orjson.dumps(result).decode()
+            created_at = time.time()
+            with self._lock:
+                self._conn.execute("""
+                    INSERT OR REPLACE INTO llm_responses (cache_key, model, result, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (key, result.get("model"), payload, created_at))
+                self._conn.commit()
+                self._remember(key, created_at, payload)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to write LLM cache: {e}")
+            return False
+
+    def purge_expired(self) -> int:
+        """删除已超过有效期的条目，返回删除的条目数（ttl为None时不删除）"""
+        if self.ttl is None:
+            return 0
+        try:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.ttl,)
+                )
+                self._conn.commit()
+            if cursor.rowcount:
+                logger.info("Purged %d expired LLM cache entries", cursor.rowcount)
+            return cursor.rowcount
+        except Exception as e:
+            logger.warning(f"Failed to purge LLM cache: {e}")
+            return 0
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        with self._lock:
+            self._memory.clear()
+            cursor = self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        """关闭缓存数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class SemanticResponseCache:
+    """按嵌入向量余弦相似度命中的LLM响应缓存（近似重复的输入复用结果）
+
+    条目按namespace（模型、系统提示等除输入文本外的全部请求参数）分组，只在同组内比较；
+    向量持久化在SQLite中，启动时载入内存，查询为一次矩阵-向量点积（向量需已L2归一化）
+
+    Args:
+        cache_path: SQLite缓存文件路径
+        threshold: 命中所需的最小余弦相似度
+    """
+
+    def __init__(self, cache_path: str = "data/llm_semantic_cache.db", threshold: float = 0.92):
+        """初始化缓存数据库并载入已有向量"""
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self.cache_path = cache_path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        # namespace -> (行id列表, 向量列表, 堆叠后的矩阵；新增条目后置None，查询时重新堆叠)
+        self._index: Dict[str, List[Any]] = {}
+        for row_id, namespace, blob in self._conn.execute(
+            "SELECT id, namespace, embedding FROM semantic_responses ORDER BY id"
+        ):
+            self._add_to_index(namespace, row_id, np.frombuffer(blob, dtype=np.float32))
+
+    def _add_to_index(self, namespace: str, row_id: int, embedding: np.ndarray):
+        """加入内存索引（调用方持有锁或处于初始化阶段）"""
+        entry = self._index.setdefault(namespace, [[], [], None])
+        entry[0].append(row_id)
+        entry[1].append(embedding)
+        entry[2] = None
+
+    def get(self, namespace: str, embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """返回同namespace中最相似且相似度不低于threshold的结果，否则返回None"""
+        try:
+            with self._lock:
+                entry = self._index.get(namespace)
+                if entry is None:
+                    return None
+                if entry[2] is None:
+                    entry[2] = np.vstack(entry[1])
+                similarities = entry[2] @ np.asarray(embedding, dtype=np.float32)
+                best = int(np.argmax(similarities))
+                if similarities[best] < self.threshold:
+                    return None
+                row = self._conn.execute(
+                    "SELECT result FROM semantic_responses WHERE id = ?", (entry[0][best],)
+                ).fetchone()
+            logger.debug(f"Semantic cache hit (similarity {similarities[best]:.3f})")
+            return orjson.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning(f"Failed to read semantic cache: {e}")
+            return None
+
+    def set(self, namespace: str, embedding: np.ndarray, result: Dict[str, Any]) -> bool:
+        """写入结果及其输入的嵌入向量"""
+        try:
+            embedding = np.asarray(embedding, dtype=np.float32)
+            payload = orjson.dumps(result).decode()
+            with self._lock:
+                cursor = self._conn.execute("""
+                    INSERT INTO semantic_responses (namespace, embedding, result, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (namespace, embedding.tobytes(), payload, time.time()))
+                self._conn.commit()
+                self._add_to_index(namespace, cursor.lastrowid, embedding)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to write semantic cache: {e}")
+            return False
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        with self._lock:
+            self._index.clear()
+            cursor = self._conn.execute("DELETE FROM semantic_responses")
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        """关闭缓存数据库连接"""
+        with self._lock:
+            self._conn.close()
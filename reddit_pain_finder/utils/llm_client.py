@@ -3,12 +3,27 @@ LLM Client for Reddit Pain Point Finder
 基于SiliconFlow API的LLM客户端
 """
 import os
-import json
+import re
+import asyncio
 import logging
+import functools
+import itertools
+import importlib.util
+import threading
 import time
-from typing import Dict, List, Any, Optional, Union
-import yaml
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType, SimpleNamespace
+from typing import Awaitable, Callable, Dict, Iterable, List, Any, Optional, Union, Mapping, Tuple, Final
+import httpx
+import orjson
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
 import backoff
 from dotenv import load_dotenv
 
@@ -16,527 +31,356 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from utils.performance_monitor import performance_monitor
+from utils.llm_cache import LLMResponseCache, SemanticResponseCache
+from utils.rate_limiter import RateLimiter
+from utils.config_loader import load_yaml_config
+from utils.llm_schemas import (
+    PainExtractionResult,
+    WorkflowClusterResult,
+    OpportunityMappingResult,
+    ViabilityResult,
+    SignalValidationResult,
+)
+
+# 可选依赖：安装json-repair后，用它修复LLM常见的几乎合法的JSON（尾逗号、缺失引号、被截断等）
+try:
+    import json_repair
+except ImportError:
+    json_repair = None
+
+# 可选依赖：安装msgspec后，按utils.llm_schemas中的结构解码JSON响应（比orjson更快，并校验字段类型）
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# 可选依赖：安装tiktoken后按BPE精确计算tokens，否则按约4字符/token估算
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 logger = logging.getLogger(__name__)
+# httpx每个请求都输出一条INFO日志，只保留警告及以上
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# 安装h2后异步连接池启用HTTP/2（单连接多路复用，并发请求不再各自建立TLS连接）
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 安装openai[aiohttp]后可选用aiohttp作为异步传输层（api_settings.async_transport: aiohttp）
+try:
+    from openai import DefaultAioHttpClient
+except ImportError:
+    DefaultAioHttpClient = None
+_AIOHTTP_AVAILABLE = (
+    DefaultAioHttpClient is not None and importlib.util.find_spec("httpx_aiohttp") is not None
+)
+
+# HTTP连接池默认值（可在api_settings.connection_pool中覆盖）；httpx默认空闲连接只保持5秒，
+# 请求间隔稍长（如两批之间写库）就要重新TCP/TLS握手，因此延长keepalive_expiry
+_DEFAULT_CONNECTION_POOL: Final[Mapping[str, float]] = MappingProxyType({
+    "max_connections": 256,
+    "max_keepalive_connections": 128,
+    "keepalive_expiry": 60.0,
+})
+
+# 语义缓存按标题+正文开头匹配痛点抽取输入（subreddit、赞数与评论不参与匹配；
+# 不同提示（帖子/评论）的条目互不比较）
+_SEMANTIC_KEY_BODY_CHARS = 1000
+
+# 日志中记录响应内容时的最大字符数
+_LOG_CONTENT_CHARS = 512
+
+# 只对暂时性错误重试：限流、超时、连接错误和服务端5xx；鉴权/参数等4xx错误直接失败
+_RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+
+def _retry_after_seconds(exception: Exception) -> Optional[float]:
+    """从错误响应的Retry-After头读取服务端建议的等待秒数"""
+    response = getattr(exception, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_wait_gen(base: float = 1, max_value: float = 120):
+    """backoff等待生成器：优先服从Retry-After，否则指数退避 + full jitter
+
+    backoff会把本次异常send进生成器，因此可以按异常决定等待时间
+    """
+    attempt = 0
+    exception = yield
+    while True:
+        retry_after = _retry_after_seconds(exception)
+        if retry_after is not None:
+            delay = min(retry_after, max_value)
+        else:
+            # full jitter：在[0, 指数上限]内随机，避免并发请求同时重试
+            delay = backoff.full_jitter(min(base * (2 ** attempt), max_value))
+        attempt += 1
+        exception = yield delay
 
-class LLMClient:
-    """SiliconFlow LLM客户端"""
-
-    def __init__(self, config_path: str = "config/llm.yaml"):
-        """初始化LLM客户端"""
-        self.config = self._load_config(config_path)
-        self.client = self._init_client()
-        self.stats = {
-            "requests": 0,
-            "tokens_used": 0,
-            "cost": 0.0,
-            "errors": 0
-        }
 
-    def _load_config(self, config_path: str) -> Dict[str, Any]:
-        """加载LLM配置"""
-        try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logger.error(f"Failed to load LLM config from {config_path}: {e}")
-            raise
+def _on_llm_backoff(details: Dict[str, Any]):
+    """每次退避前记录失败，计入客户端错误统计和性能监控的重试统计"""
+    details["args"][0]._count(errors=1)
+    performance_monitor.record_llm_retry(details["kwargs"].get("stage", "main"), details["wait"])
+    logger.warning(
+        "❌ LLM request attempt %d failed: %s - Retrying in %.2fs...",
+        details["tries"], details["exception"], details["wait"]
+    )
 
-    def _init_client(self) -> OpenAI:
-        """初始化OpenAI客户端"""
-        api_key = os.getenv(self.config['api']['api_key_env'])
-        if not api_key:
-            raise ValueError(f"API key not found in environment variable: {self.config['api']['api_key_env']}")
 
-        return OpenAI(
-            api_key=api_key,
-            base_url=self.config['api']['base_url']
-        )
+# 包裹JSON的markdown代码块标记（```json ... ```）
+_JSON_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
 
-    def get_model_name(self, model_type: str = "main") -> str:
-        """获取指定类型的模型名称"""
-        if model_type in self.config.get("models", {}):
-            model_config = self.config["models"][model_type]
-            # 如果有环境变量配置，优先使用
-            env_name = model_config.get("env_name")
-            if env_name and os.getenv(env_name):
-                return os.getenv(env_name)
-            return model_config["name"]
 
-        # 从task_mapping中查找
-        task_mapping = self.config.get("task_mapping", {})
-        if model_type in task_mapping:
-            mapped_model = task_mapping[model_type]["model"]
-            return self.get_model_name(mapped_model)
+# 预检上下文长度时为消息格式开销预留的tokens
+_CONTEXT_SAFETY_TOKENS = 256
 
-        # 默认返回main模型
-        return self.config["models"]["main"]["name"]
 
-    def get_model_config(self, model_type: str = "main") -> Dict[str, Any]:
-        """获取模型配置"""
-        # 从task_mapping中查找
-        task_mapping = self.config.get("task_mapping", {})
-        if model_type in task_mapping:
-            mapped_model = task_mapping[model_type]["model"]
-            base_config = self.config["models"][mapped_model].copy()
-            # 覆盖任务特定配置
-            base_config.update(task_mapping[model_type])
-            return base_config
+@functools.lru_cache(maxsize=1)
+def _token_encoding():
+    """获取tiktoken编码（任一BPE对SiliconFlow上的模型都足够接近）；不可用时返回None"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, falling back to estimates: %s", e)
+        return None
 
-        # 直接从models中查找
-        if model_type in self.config.get("models", {}):
-            return self.config["models"][model_type].copy()
 
-        # 默认返回main模型配置
-        return self.config["models"]["main"].copy()
+@functools.lru_cache(maxsize=64)
+def _count_tokens(text: str) -> int:
+    """计算文本的tokens数（提示模板等重复文本命中缓存）"""
+    encoding = _token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
 
-    def chat_completion(
-        self,
-        messages: List[Dict[str, str]],
-        model_type: str = "main",
-        temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None,
-        json_mode: bool = False
-    ) -> Dict[str, Any]:
-        """聊天补全请求"""
 
-        max_retries = 5
-        base_delay = 1
-        max_delay = 120
+_TRUNCATION_MARK = "... [truncated]"
 
-        for attempt in range(max_retries):
-            try:
-                model_config = self.get_model_config(model_type)
-                model_name = self.get_model_name(model_type)
-
-                # 参数配置
-                params = {
-                    "model": model_name,
-                    "messages": messages,
-                    "temperature": temperature if temperature is not None else model_config.get("temperature", 0.1),
-                    "max_tokens": max_tokens if max_tokens is not None else model_config.get("max_tokens", 2000),
-                    "timeout": model_config.get("timeout", 180)
-                }
-
-                # JSON模式
-                if json_mode:
-                    params["response_format"] = {"type": "json_object"}
-
-                # 记录请求开始时间
-                start_time = time.time()
-
-                logger.info(f"LLM Request {attempt + 1}/{max_retries}: model={model_name}, timeout={params['timeout']}s")
-
-                # 发送请求
-                response = self.client.chat.completions.create(**params)
-
-                # 计算请求时间
-                request_time = time.time() - start_time
-
-                # 更新统计信息
-                self.stats["requests"] += 1
-                if hasattr(response.usage, 'total_tokens'):
-                    self.stats["tokens_used"] += response.usage.total_tokens
-
-                # 提取响应内容
-                content = response.choices[0].message.content
-
-                # 如果是JSON模式，尝试解析
-                if json_mode:
-                    try:
-                        content = json.loads(content)
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Failed to parse JSON response: {e}")
-                        logger.error(f"Raw content: {content}")
-                        # 尝试修复JSON
-                        content = self._try_fix_json(content)
-
-                result = {
-                    "content": content,
-                    "model": model_name,
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-                        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                        "total_tokens": response.usage.total_tokens if response.usage else 0
-                    },
-                    "request_time": request_time
-                }
-
-                # Record in performance monitor
-                performance_monitor.record_llm_call(
-                    stage_name=model_type,
-                    usage=result["usage"]
-                )
 
-                logger.info(f"✅ LLM request {attempt + 1}/{max_retries} completed: {result['usage']['total_tokens']} tokens in {request_time:.2f}s")
-                return result
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """将文本截断到不超过max_tokens个tokens（含截断标记）"""
+    # 为截断标记和边界处的合并误差各预留tokens
+    keep = max(max_tokens - _count_tokens(_TRUNCATION_MARK) - 1, 0)
+    encoding = _token_encoding()
+    if encoding is None:
+        truncated = text[:keep * 4]
+    else:
+        truncated = encoding.decode(encoding.encode(text, disallowed_special=())[:keep])
+    return truncated + _TRUNCATION_MARK
 
-            except Exception as e:
-                error_msg = f"❌ LLM request {attempt + 1}/{max_retries} failed: {e}"
-                self.stats["errors"] += 1
-
-                if attempt < max_retries - 1:
-                    # 计算退避延迟
-                    delay = min(base_delay * (2 ** attempt), max_delay)
-                    logger.warning(f"{error_msg} - Retrying in {delay:.2f}s...")
-                    time.sleep(delay)
-                    continue
-                else:
-                    logger.error(f"{error_msg} - Max retries exceeded")
-                    raise
 
-    def _clean_json_string(self, json_str: str) -> str:
-        """清理JSON字符串中的控制字符和非法格式
+def is_json_parse_failure(content: Any) -> bool:
+    """content是否为JSON解析失败时_try_fix_json返回的错误占位结果"""
+    return isinstance(content, dict) and "raw_content" in content and "error" in content
 
-        Args:
-            json_str: 原始JSON字符串
 
-        Returns:
-            清理后的JSON字符串
-        """
-        import re
+def _semantic_key_text(title: str, body: str) -> str:
+    """痛点抽取语义缓存的匹配文本：标题+正文开头"""
+    return f"{title or ''}\n{(body or '')[:_SEMANTIC_KEY_BODY_CHARS]}"
 
-        # 移除markdown格式（**加粗**）
-        json_str = re.sub(r'\*\*', '', json_str)
 
-        # 更简单的方法：直接替换所有控制字符
-        # 但需要保留JSON结构中的合法字符（引号、逗号、冒号、花括号等）
+def _prewarm_connection(http_client: httpx.Client, base_url: str):
+    """向API主机发送一个HEAD请求，把建立好的连接留在连接池中（失败时忽略）"""
+    try:
+        http_client.head(base_url, timeout=5.0)
+    except Exception as e:
+        logger.debug("LLM connection prewarm failed: %s", e)
 
-        # 策略：逐字符处理，保留JSON结构字符，替换字符串值中的控制字符
-        result = []
-        in_string = False
-        escape_next = False
-        string_delimiter = None
 
-        for char in json_str:
-            if escape_next:
-                # 转义字符，直接保留
-                result.append(char)
-                escape_next = False
-                continue
+def _event_columns(pain_events: List[Dict[str, Any]]):
+    """逐个事件取出(problem, context, current_workaround)，缺失或为NULL的字段取空串"""
+    for event in pain_events:
+        yield (
+            event.get("problem") or "",
+            event.get("context") or "",
+            event.get("current_workaround") or ""
+        )
 
-            if char == '\\' and in_string:
-                # 转义符
-                result.append(char)
-                escape_next = True
-                continue
 
-            if char in ('"', "'") and not escape_next:
-                if not in_string:
-                    # 字符串开始
-                    in_string = True
-                    string_delimiter = char
-                    result.append(char)
-                elif char == string_delimiter:
-                    # 字符串结束
-                    in_string = False
-                    string_delimiter = None
-                    result.append(char)
-                else:
-                    # 不同的引号，在字符串内
-                    result.append(char)
+# 单条评论写入提示时的最大字符数（超出部分截断以节省tokens）
+_MAX_COMMENT_CHARS = 500
+
+
+def _truncate_comment(body: str) -> str:
+    """截断过长的评论以节省tokens"""
+    if len(body) > _MAX_COMMENT_CHARS:
+        return body[:_MAX_COMMENT_CHARS] + "... [truncated]"
+    return body
+
+
+class _JsonCompletionScanner:
+    """增量扫描流式输出，检测顶层JSON对象/数组何时闭合（忽略字符串内的括号）"""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, text: str) -> int:
+        """扫描新到达的文本，返回顶层JSON闭合处之后的下标；尚未闭合返回-1"""
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char in '{[':
+                self.depth += 1
+                self.started = True
+            elif not self.started:
+                # JSON开始前的文本（如```json代码块标记）不参与计数
                 continue
-
-            if in_string:
-                # 在字符串内，处理控制字符
-                if ord(char) < 32 or char == '\x7f':
-                    # 控制字符，替换为空格
-                    result.append(' ')
+            elif char == '"':
+                self.in_string = True
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
+
+class _StreamAccumulator:
+    """累积流式响应的增量内容，JSON模式下顶层JSON闭合后不再累积内容
+
+    include_usage时用量随最后一个（choices为空的）数据块返回：JSON闭合后仍需继续读取到
+    该数据块，否则令牌统计、成本估算与限流结算都拿不到实际用量
+    """
+
+    def __init__(self, json_mode: bool):
+        self._parts: List[str] = []
+        self._scanner = _JsonCompletionScanner() if json_mode else None
+        self._complete = False
+        self._usage = None
+
+    def add(self, chunk: Any) -> bool:
+        """加入一个数据块，返回是否可以结束读取（JSON已闭合且已收到用量）"""
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self._usage = usage
+        if not self._complete and chunk.choices:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                end = self._scanner.feed(delta) if self._scanner is not None else -1
+                if end >= 0:
+                    # JSON之后的输出（说明文字等）丢弃
+                    self._parts.append(delta[:end])
+                    self._complete = True
                 else:
-                    result.append(char)
-            else:
-                # 不在字符串内，直接保留
-                result.append(char)
+                    self._parts.append(delta)
+        return self._complete and self._usage is not None
 
-        return ''.join(result)
+    def response(self) -> SimpleNamespace:
+        """组装成与非流式响应结构一致的对象（供_build_result使用）"""
+        content = "".join(self._parts)
+        if self._scanner is not None and self._scanner.started:
+            # 去掉JSON之前的文本（如```json代码块标记）
+            content = content[min(i for i in (content.find('{'), content.find('[')) if i >= 0):]
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self._usage)
 
-    def _try_fix_json(self, content: str) -> Dict[str, Any]:
-        """尝试修复损坏的JSON
 
-        Handles:
-        - Control characters in string values
-        - Markdown formatting (**bold**)
-        - Malformed JSON structure
-        """
-        try:
-            # 尝试提取JSON部分
-            start_idx = content.find('{')
-            end_idx = content.rfind('}') + 1
-            if start_idx != -1 and end_idx > start_idx:
-                json_str = content[start_idx:end_idx]
+# ---------------------------------------------------------------------------
+# 提示模板：模块级常量，每次请求直接引用，不再在方法内重新构建
+# ---------------------------------------------------------------------------
 
-                # 清理JSON字符串
-                json_str = self._clean_json_string(json_str)
+# 痛点抽取提示 - 分析单条评论
+_PAIN_PROMPT_COMMENT: Final[str] = """You are an information extraction engine specializing in user pain point analysis from Reddit COMMENTS.
 
-                return json.loads(json_str)
-            else:
-                raise ValueError("No JSON found in response")
-        except Exception as e:
-            logger.error(f"Failed to fix JSON: {e}")
-            logger.debug(f"Content after cleaning: {content[:500]}...")
-            return {"error": "Failed to parse JSON", "raw_content": content}
+Your task:
+From the provided COMMENT, extract concrete PAIN EVENTS expressed by the commenter.
 
-    def extract_pain_points(
-        self,
-        title: str,
-        body: str,
-        subreddit: str,
-        upvotes: int,
-        comments_count: int,
-        top_comments: Optional[List[Dict[str, Any]]] = None,
-        metadata: Optional[Dict[str, Any]] = None
-    ) -> Dict[str, Any]:
-        """从Reddit帖子或评论中提取痛点（支持评论上下文）
+IMPORTANT CONTEXT:
+- You are analyzing a COMMENT, not a post
+- The COMMENT BODY is the PRIMARY source of pain signals
+- The parent post title provides context only
+- Focus on pain expressed IN THE COMMENT itself
 
-        Args:
-            title: Post title (or parent post title if analyzing a comment)
-            body: Post body or comment body
-            subreddit: Subreddit name
-            upvotes: Upvote count
-            comments_count: Number of comments
-            top_comments: List of top comments (only used for post analysis)
-            metadata: Optional metadata dict with 'source_type' key ('post' or 'comment')
-        """
-        # Determine if analyzing a comment or post
-        is_comment = metadata and metadata.get("source_type") == "comment" if metadata else False
+Comment characteristics:
+- Comments are often more direct and specific than posts
+- Commenters share personal experiences and frustrations
+- Pain signals in comments are frequently actionable and concrete
+- Comments reveal real-world implementation details
 
-        # Get appropriate prompt based on source type
-        prompt = self._get_pain_extraction_prompt(is_comment=is_comment)
+Rules:
+- Do NOT summarize the comment
+- Do NOT give advice
+- If no concrete pain exists in the comment, return an empty list
+- Be literal and conservative
+- Focus on actionable problems mentioned by the commenter
+- Extract pains from the COMMENT BODY, not the parent post title
+- The parent post title is only context to understand what they're responding to
 
-        # Build user message - format differs for comments vs posts
-        if is_comment:
-            # Analyzing a standalone comment
-            user_message = f"""ANALYZING A COMMENT
+Output JSON only with this format:
+{
+  "pain_events": [
+    {
+      "actor": "who experiences the problem",
+      "context": "what they are trying to do",
+      "problem": "the concrete difficulty",
+      "current_workaround": "how they currently cope (if any)",
+      "frequency": "how often it happens (explicit or inferred)",
+      "emotional_signal": "frustration, anxiety, exhaustion, etc.",
+      "mentioned_tools": ["tool1", "tool2"],
+      "confidence": 0.8,
+      "evidence_sources": ["comment"]
+    }
+  ],
+  "extraction_summary": "brief summary of findings"
+}
 
-Parent Post Title (context only): {title}
-Comment Body (PRIMARY PAIN SOURCE): {body}
-Subreddit: {subreddit}
-Comment Upvotes: {upvotes}
-"""
-            # Note: Don't include top_comments when analyzing a comment itself
-        else:
-            # Analyzing a post (original behavior)
-            user_message = f"""ANALYZING A POST
+Fields explanation:
+- actor: who has this problem (developer, manager, user, etc.)
+- context: the situation or workflow where the problem occurs
+- problem: specific, concrete issue (e.g., "compilation takes 30 minutes" not "things are slow")
+- current_workaround: current solutions people use (if mentioned)
+- frequency: how often this happens (daily, weekly, occasionally, etc.)
+- emotional_signal: the emotion expressed (frustration, anger, disappointment, etc.)
+- mentioned_tools: tools, software, or methods explicitly mentioned
+- confidence: how confident you are this is a real pain point (0-1)
+- evidence_sources: should always be ["comment"] for comment analysis
 
-Title: {title}
-Body: {body}
-Subreddit: {subreddit}
-Upvotes: {upvotes}
-Comments: {comments_count}
-"""
+Extract ONLY from the comment body. Use parent post title only for context."""
 
-            # Add top comments if available
-            if top_comments and len(top_comments) > 0:
-                user_message += f"\nTop {len(top_comments)} Comments:\n"
-                for i, comment in enumerate(top_comments, 1):
-                    comment_body = comment.get('body', '')
-                    comment_score = comment.get('score', 0)
-                    comment_author = comment.get('author', 'unknown')
-                    # Truncate very long comments to save tokens
-                    if len(comment_body) > 500:
-                        comment_body = comment_body[:500] + "... [truncated]"
-                    user_message += f"\n{i}. [{comment_score} upvotes] {comment_author}: {comment_body}\n"
+# 痛点抽取提示 - 分析帖子（含热门评论）
+_PAIN_PROMPT_POST: Final[str] = """You are an information extraction engine specializing in user pain point analysis.
 
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": user_message}
-        ]
+Your task:
+From the provided Reddit post and its top comments, extract concrete PAIN EVENTS.
 
-        return self.chat_completion(
-            messages=messages,
-            model_type="pain_extraction",
-            json_mode=True
-        )
+A pain event is a specific recurring problem experienced by users, supported by evidence from discussions.
 
-    def cluster_pain_events(
-        self,
-        pain_events: List[Dict[str, Any]]
-    ) -> Dict[str, Any]:
-        """聚类痛点事件"""
-        prompt = self._get_workflow_clustering_prompt()
+Rules:
+- Do NOT summarize the post
+- Do NOT give advice
+- If no concrete pain exists, return an empty list
+- Be literal and conservative
+- Focus on actionable problems people face repeatedly
 
-        # 构建痛点事件文本
-        events_text = "\n\n".join([
-            f"Event {i+1}: {event.get('problem', '')} (Context: {event.get('context', '')}, Workaround: {event.get('current_workaround', '')})"
-            for i, event in enumerate(pain_events)
-        ])
+**Using Comment Context:**
+Top comments often reveal:
+- Additional specific pain instances mentioned by others
+- Confirmation/refinement of the main pain point
+- Alternative perspectives on the same problem
+- Workarounds people are actually using
+- Frequency indicators (how often this occurs)
 
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Pain events:\n{events_text}"}
-        ]
-
-        return self.chat_completion(
-            messages=messages,
-            model_type="clustering",
-            json_mode=True
-        )
-
-    def summarize_source_cluster(
-        self,
-        pain_events: List[Dict[str, Any]],
-        source_type: str
-    ) -> Dict[str, Any]:
-        """为同一source的聚类生成摘要"""
-        prompt = self._get_cluster_summarizer_prompt()
-
-        # 构建痛点事件文本，重点关注问题和上下文
-        events_text = "\n\n".join([
-            f"Event {i+1}:\nProblem: {event.get('problem', '')}\nContext: {event.get('context', '')}\nWorkaround: {event.get('current_workaround', '')}\n"
-            for i, event in enumerate(pain_events[:10])  # 最多处理10个事件以控制token长度
-        ])
-
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Source Type: {source_type}\n\nPain Events:\n{events_text}"}
-        ]
-
-        return self.chat_completion(
-            messages=messages,
-            model_type="cluster_summarizer",
-            json_mode=True
-        )
-
-    def generate_jtbd_from_cluster(
-        self,
-        cluster_data: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """从已验证的聚类生成详细JTBD分析"""
-        prompt = """You are a product analyst specializing in Jobs To Be Done (JTBD) framework.
-
-Given this cluster information, extract a detailed JTBD analysis.
-
-CLUSTER DATA:
-- Name: {cluster_name}
-- Description: {cluster_description}
-- Common Pain: {common_pain}
-- Context: {common_context}
-- Representative Events: {example_events}
-
-Your task:
-1. Refine the JTBD statement to follow exact format: "当[某类人]想完成[某个任务]时，会因为[某个结构性原因]而失败。"
-2. Break down the task into explicit steps
-3. Identify where exactly the failure occurs
-4. Describe the user profile precisely
-5. Categorize the semantic type
-
-Return JSON only:
-{{
-  "job_statement": "当[用户类型]想完成[核心任务]时，会因为[结构性障碍]而失败",
-  "job_steps": ["步骤1: ...", "步骤2: ...", "步骤3: ..."],
-  "desired_outcomes": ["期望结果1", "期望结果2", "期望结果3"],
-  "job_context": "detailed context description",
-  "customer_profile": "specific user role and context",
-  "semantic_category": "category_name",
-  "product_impact": 0.85
-}}
-
-Be actionable and precise.""".format(
-            cluster_name=cluster_data.get('cluster_name', ''),
-            cluster_description=cluster_data.get('cluster_description', ''),
-            common_pain=cluster_data.get('common_pain', ''),
-            common_context=cluster_data.get('common_context', ''),
-            example_events=json.dumps(cluster_data.get('example_events', [])[:3])
-        )
-
-        messages = [
-            {"role": "system", "content": "You are a JTBD analysis expert. Extract precise, actionable product insights."},
-            {"role": "user", "content": prompt}
-        ]
-
-        return self.chat_completion(
-            messages=messages,
-            model_type="cluster_summarizer",
-            json_mode=True
-        )
-
-    def map_opportunity(
-        self,
-        cluster_summary: Dict[str, Any]
-    ) -> Dict[str, Any]:
-        """从痛点聚类映射机会"""
-        prompt = self._get_opportunity_mapping_prompt()
-
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Pain cluster:\n{json.dumps(cluster_summary, indent=2)}"}
-        ]
-
-        return self.chat_completion(
-            messages=messages,
-            model_type="opportunity_mapping",
-            json_mode=True
-        )
-
-    def score_viability(
-        self,
-        opportunity_description: str
-    ) -> Dict[str, Any]:
-        """评估机会可行性"""
-        prompt = self._get_viability_scoring_prompt()
-
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Idea:\n{opportunity_description}"}
-        ]
-
-        return self.chat_completion(
-            messages=messages,
-            model_type="viability_scoring",
-            json_mode=True
-        )
-
-    def validate_pain_signal(
-        self,
-        text: str
-    ) -> Dict[str, Any]:
-        """验证痛点信号"""
-        prompt = self._get_signal_validation_prompt()
-
-        messages = [
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": text}
-        ]
-
-        return self.chat_completion(
-            messages=messages,
-            model_type="signal_validation",
-            json_mode=True
-        )
-
-    def _get_pain_extraction_prompt(self, is_comment: bool = False) -> str:
-        """获取痛点抽取提示 - 支持帖子或评论分析
-
-        Args:
-            is_comment: True if analyzing a comment, False if analyzing a post
-        """
-        if is_comment:
-            # Prompt for analyzing standalone comments
-            return """You are an information extraction engine specializing in user pain point analysis from Reddit COMMENTS.
-
-Your task:
-From the provided COMMENT, extract concrete PAIN EVENTS expressed by the commenter.
-
-IMPORTANT CONTEXT:
-- You are analyzing a COMMENT, not a post
-- The COMMENT BODY is the PRIMARY source of pain signals
-- The parent post title provides context only
-- Focus on pain expressed IN THE COMMENT itself
-
-Comment characteristics:
-- Comments are often more direct and specific than posts
-- Commenters share personal experiences and frustrations
-- Pain signals in comments are frequently actionable and concrete
-- Comments reveal real-world implementation details
-
-Rules:
-- Do NOT summarize the comment
-- Do NOT give advice
-- If no concrete pain exists in the comment, return an empty list
-- Be literal and conservative
-- Focus on actionable problems mentioned by the commenter
-- Extract pains from the COMMENT BODY, not the parent post title
-- The parent post title is only context to understand what they're responding to
+When extracting pain events:
+1. Look for pains mentioned in BOTH the post AND comments
+2. Use comments to add specificity to vague problems in the post
+3. Include alternative formulations of the same pain
+4. Note if multiple commenters confirm the same issue
 
 Output JSON only with this format:
 {
@@ -550,7 +394,7 @@ Output JSON only with this format:
       "emotional_signal": "frustration, anxiety, exhaustion, etc.",
       "mentioned_tools": ["tool1", "tool2"],
       "confidence": 0.8,
-      "evidence_sources": ["comment"]
+      "evidence_sources": ["post", "comments"]  # where this pain was mentioned
     }
   ],
   "extraction_summary": "brief summary of findings"
@@ -565,73 +409,30 @@ Fields explanation:
 - emotional_signal: the emotion expressed (frustration, anger, disappointment, etc.)
 - mentioned_tools: tools, software, or methods explicitly mentioned
 - confidence: how confident you are this is a real pain point (0-1)
-- evidence_sources: should always be ["comment"] for comment analysis
-
-Extract ONLY from the comment body. Use parent post title only for context."""
-        else:
-            # Prompt for analyzing posts (original behavior)
-            return """You are an information extraction engine specializing in user pain point analysis.
-
-Your task:
-From the provided Reddit post and its top comments, extract concrete PAIN EVENTS.
-
-A pain event is a specific recurring problem experienced by users, supported by evidence from discussions.
+- evidence_sources: list of where pain was found ("post", "comments", or both)
 
-Rules:
-- Do NOT summarize the post
-- Do NOT give advice
-- If no concrete pain exists, return an empty list
-- Be literal and conservative
-- Focus on actionable problems people face repeatedly
+Be more confident when the same pain appears in both post and comments."""
 
-**Using Comment Context:**
-Top comments often reveal:
-- Additional specific pain instances mentioned by others
-- Confirmation/refinement of the main pain point
-- Alternative perspectives on the same problem
-- Workarounds people are actually using
-- Frequency indicators (how often this occurs)
+# 批量痛点抽取提示 - 帖子抽取提示 + 批量输入输出格式说明
+_PAIN_PROMPT_POST_BATCH: Final[str] = _PAIN_PROMPT_POST + """
 
-When extracting pain events:
-1. Look for pains mentioned in BOTH the post AND comments
-2. Use comments to add specificity to vague problems in the post
-3. Include alternative formulations of the same pain
-4. Note if multiple commenters confirm the same issue
+BATCH MODE:
+You will receive N posts as a JSON object {"inputs": [...]}; each input has an "id", "title", "body", "subreddit", "upvotes" and "comments".
+Analyze every post independently, applying all the rules above to each one.
 
-Output JSON only with this format:
+Respond with JSON only in this format:
 {
-  "pain_events": [
-    {
-      "actor": "who experiences the problem",
-      "context": "what they are trying to do",
-      "problem": "the concrete difficulty",
-      "current_workaround": "how they currently cope (if any)",
-      "frequency": "how often it happens (explicit or inferred)",
-      "emotional_signal": "frustration, anxiety, exhaustion, etc.",
-      "mentioned_tools": ["tool1", "tool2"],
-      "confidence": 0.8,
-      "evidence_sources": ["post", "comments"]  # where this pain was mentioned
-    }
-  ],
-  "extraction_summary": "brief summary of findings"
+  "outputs": [
+    {"id": 0, "pain_events": [ ...pain event objects in the format above... ]},
+    {"id": 1, "pain_events": []}
+  ]
 }
 
-Fields explanation:
-- actor: who has this problem (developer, manager, user, etc.)
-- context: the situation or workflow where the problem occurs
-- problem: specific, concrete issue (e.g., "compilation takes 30 minutes" not "things are slow")
-- current_workaround: current solutions people use (if mentioned)
-- frequency: how often this happens (daily, weekly, occasionally, etc.)
-- emotional_signal: the emotion expressed (frustration, anger, disappointment, etc.)
-- mentioned_tools: tools, software, or methods explicitly mentioned
-- confidence: how confident you are this is a real pain point (0-1)
-- evidence_sources: list of where pain was found ("post", "comments", or both)
-
-Be more confident when the same pain appears in both post and comments."""
+Return exactly one output per input, with outputs[i].id equal to the id of the input it describes.
+Use an empty pain_events list for posts without concrete pain."""
 
-    def _get_workflow_clustering_prompt(self) -> str:
-        """Get workflow clustering prompt with JTBD extraction"""
-        return """You are analyzing user pain events to extract product opportunities.
+# 工作流聚类提示（含JTBD抽取）
+_WORKFLOW_CLUSTERING_PROMPT: Final[str] = """You are analyzing user pain events to extract product opportunities.
 
 Given the following pain events, rate how similar their UNDERLYING WORKFLOWS are on a continuous scale.
 
@@ -666,9 +467,8 @@ Return JSON only with this format:
 
 Be precise with your similarity score and JTBD statement. The job_statement MUST follow the exact format."""
 
-    def _get_opportunity_mapping_prompt(self) -> str:
-        """获取机会映射提示 - Phase 3 简化版（仅定性描述）"""
-        return """You are a practical product thinker for solo founders.
+# 机会映射提示 - Phase 3 简化版（仅定性描述）
+_OPPORTUNITY_MAPPING_PROMPT: Final[str] = """You are a practical product thinker for solo founders.
 
 Given a cluster of pain events from the same workflow:
 
@@ -701,9 +501,8 @@ Return JSON only with this format:
 
 NO quantitative scores - focus on clear, specific descriptions that capture the essence of the problem and solution."""
 
-    def _get_viability_scoring_prompt(self) -> str:
-        """获取可行性评分提示"""
-        return """You are an experienced solo-founder investor.
+# 可行性评分提示
+_VIABILITY_SCORING_PROMPT: Final[str] = """You are an experienced solo-founder investor.
 
 Score the following idea for a ONE-PERSON COMPANY.
 
@@ -738,9 +537,8 @@ Return JSON only with this format:
 
 Be realistic and conservative in scoring."""
 
-    def _get_cluster_summarizer_prompt(self) -> str:
-        """获取聚类摘要提示（增强JTBD版本）"""
-        return """You are a cluster summarizer for pain events with focus on product semantics.
+# 聚类摘要提示（增强JTBD版本）
+_CLUSTER_SUMMARIZER_PROMPT: Final[str] = """You are a cluster summarizer for pain events with focus on product semantics.
 
 These pain events come from the same source and discourse style.
 Your task is to extract:
@@ -787,9 +585,8 @@ Return JSON only with this format:
 
 BE PRECISE - extract real patterns, don't invent. The job_statement MUST follow the exact format."""
 
-    def _get_signal_validation_prompt(self) -> str:
-        """获取信号验证提示"""
-        return """You are a pain signal validator.
+# 信号验证提示
+_SIGNAL_VALIDATION_PROMPT: Final[str] = """You are a pain signal validator.
 
 Given this text, determine if it contains a genuine pain point.
 
@@ -811,18 +608,1632 @@ Return JSON only with this format:
 
 Be conservative - only flag clear pain points."""
 
-    def get_statistics(self) -> Dict[str, Any]:
-        """获取使用统计"""
-        return self.stats.copy()
+# JTBD分析提示（系统消息；聚类数据放在用户消息中，见_JTBD_CLUSTER_TEMPLATE）
+_JTBD_PROMPT: Final[str] = """You are a product analyst specializing in Jobs To Be Done (JTBD) framework.
+Extract precise, actionable product insights.
 
-    def reset_statistics(self):
-        """重置统计"""
+Given the cluster information in the user message, extract a detailed JTBD analysis.
+
+Your task:
+1. Refine the JTBD statement to follow exact format: "当[某类人]想完成[某个任务]时，会因为[某个结构性原因]而失败。"
+2. Break down the task into explicit steps
+3. Identify where exactly the failure occurs
+4. Describe the user profile precisely
+5. Categorize the semantic type
+
+Return JSON only:
+{
+  "job_statement": "当[用户类型]想完成[核心任务]时，会因为[结构性障碍]而失败",
+  "job_steps": ["步骤1: ...", "步骤2: ...", "步骤3: ..."],
+  "desired_outcomes": ["期望结果1", "期望结果2", "期望结果3"],
+  "job_context": "detailed context description",
+  "customer_profile": "specific user role and context",
+  "semantic_category": "category_name",
+  "product_impact": 0.85
+}
+
+Be actionable and precise."""
+
+# JTBD分析的用户消息模板（str.format填充聚类数据）
+_JTBD_CLUSTER_TEMPLATE: Final[str] = """CLUSTER DATA:
+- Name: {cluster_name}
+- Description: {cluster_description}
+- Common Pain: {common_pain}
+- Context: {common_context}
+- Representative Events: {example_events}"""
+
+class _Endpoint:
+    """一组API凭据（api_key + base_url）：各自的同步/异步客户端与独立的限流配额"""
+
+    def __init__(self, api_key: str, base_url: str, request_limiter: RateLimiter, token_limiter: RateLimiter):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.request_limiter = request_limiter
+        self.token_limiter = token_limiter
+        self.client: Optional[OpenAI] = None
+        # 异步客户端按事件循环惰性创建（见LLMClient._get_async_client）
+        self.aclient: Optional[AsyncOpenAI] = None
+        self.aclient_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class LLMClient:
+    """SiliconFlow LLM客户端
+
+    每个实例持有自己的连接池、限流配额和缓存连接：流水线各模块应通过get_llm_client()
+    共享同一个实例，不要在循环或worker中创建LLMClient()
+    """
+
+    def __init__(self, config_path: str = "config/llm.yaml"):
+        """初始化LLM客户端"""
+        self.config_path = config_path
+        self.config = self._load_config(config_path)
+        # 每个API密钥/端点一组客户端与限流配额，请求按轮询分配（见_next_endpoint）
+        self._endpoints = self._init_endpoints()
+        self._endpoint_cycle = itertools.cycle(self._endpoints)
+        # 文件上传、Batch API等非轮询调用使用第一个端点
+        self.client = self._endpoints[0].client
+        # model_type -> (模型名称, 只读模型配置)，见_resolve；配置中的模型与任务在初始化时一次解析
+        self._resolved: Dict[str, Tuple[str, Mapping[str, Any]]] = {}
+        self._resolve_configured_models()
+        self.response_cache = self._init_response_cache()
+        self.semantic_cache = self._init_semantic_cache()
+        # 统计计数可能被多个线程/协程同时更新，读写都在锁内进行
+        self._stats_lock = threading.Lock()
         self.stats = {
             "requests": 0,
             "tokens_used": 0,
             "cost": 0.0,
-            "errors": 0
+            "errors": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "cached_prompt_tokens": 0
         }
 
-# 全局LLM客户端实例
-llm_client = LLMClient()
\ No newline at end of file
+    def _load_config(self, config_path: str) -> Dict[str, Any]:
+        """加载LLM配置"""
+        try:
+            return load_yaml_config(config_path)
+        except Exception as e:
+            logger.error("Failed to load LLM config from %s: %s", config_path, e)
+            raise
+
+    def _init_endpoints(self) -> List[_Endpoint]:
+        """按api.endpoints初始化端点列表；未配置时只使用api.api_key_env/base_url
+
+        每个端点有独立的每分钟请求数/令牌数限流（同步与异步请求共用），
+        默认取api_settings.rate_limit，端点条目中可单独覆盖
+        """
+        api_config = self.config['api']
+        rate_limit = self.config.get("api_settings", {}).get("rate_limit", {})
+        entries = api_config.get("endpoints") or [{}]
+
+        endpoints = []
+        for entry in entries:
+            api_key_env = entry.get("api_key_env", api_config['api_key_env'])
+            api_key = os.getenv(api_key_env)
+            if not api_key:
+                raise ValueError(f"API key not found in environment variable: {api_key_env}")
+
+            endpoint = _Endpoint(
+                api_key=api_key,
+                base_url=entry.get("base_url", api_config['base_url']),
+                request_limiter=RateLimiter(
+                    entry.get("requests_per_minute", rate_limit.get("requests_per_minute", 60))
+                ),
+                token_limiter=RateLimiter(
+                    entry.get("tokens_per_minute", rate_limit.get("tokens_per_minute", 30000))
+                )
+            )
+            endpoint.client = self._init_client(endpoint)
+            endpoints.append(endpoint)
+
+        if len(endpoints) > 1:
+            logger.info("LLM client using %d endpoints (round-robin)", len(endpoints))
+        return endpoints
+
+    def _next_endpoint(self) -> _Endpoint:
+        """轮询选择下一个端点（重试时也换到下一个端点）"""
+        return next(self._endpoint_cycle)
+
+    def _connection_limits(self) -> httpx.Limits:
+        """连接池配置：_DEFAULT_CONNECTION_POOL与api_settings.connection_pool合并"""
+        pool = dict(_DEFAULT_CONNECTION_POOL)
+        pool.update(self.config.get("api_settings", {}).get("connection_pool", {}))
+        return httpx.Limits(**pool)
+
+    def _init_client(self, endpoint: _Endpoint) -> OpenAI:
+        """初始化端点的OpenAI客户端"""
+        # 显式配置连接池（见_connection_limits）：连续请求复用已完成TCP/TLS握手的连接；
+        # 重试由backoff负责，传输层不重试（limits需传给自定义transport）
+        http_client = httpx.Client(
+            transport=httpx.HTTPTransport(
+                retries=0,
+                http2=_HTTP2_AVAILABLE,
+                limits=self._connection_limits()
+            ),
+            timeout=httpx.Timeout(180.0, connect=10.0)
+        )
+
+        # 后台预热：提前完成到API主机的TCP/TLS握手，首个请求直接复用连接
+        if self.config['api'].get('prewarm', True):
+            threading.Thread(
+                target=_prewarm_connection,
+                args=(http_client, endpoint.base_url),
+                daemon=True
+            ).start()
+
+        return OpenAI(
+            api_key=endpoint.api_key,
+            base_url=endpoint.base_url,
+            http_client=http_client
+        )
+
+    def _init_async_client(self, endpoint: _Endpoint) -> AsyncOpenAI:
+        """初始化端点的AsyncOpenAI客户端（用于并发请求）"""
+        transport = self.config.get("api_settings", {}).get("async_transport", "httpx")
+        if transport == "aiohttp":
+            if _AIOHTTP_AVAILABLE:
+                # aiohttp自行管理连接池（按主机复用keep-alive连接），高并发下调度开销低于httpx
+                return AsyncOpenAI(
+                    api_key=endpoint.api_key,
+                    base_url=endpoint.base_url,
+                    http_client=DefaultAioHttpClient(timeout=httpx.Timeout(180.0, connect=10.0))
+                )
+            logger.warning("async_transport is 'aiohttp' but openai[aiohttp] is not installed, using httpx")
+
+        # 自定义连接池：默认连接池在高并发下争用严重；重试由achat_completion负责，传输层不重试
+        # （使用自定义transport时httpx忽略Client上的limits，因此limits传给transport）
+        # 同一事件循环内的后续请求复用已完成握手的连接
+        http_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                retries=0,
+                http2=_HTTP2_AVAILABLE,
+                limits=self._connection_limits()
+            ),
+            timeout=httpx.Timeout(180.0, connect=10.0)
+        )
+
+        return AsyncOpenAI(
+            api_key=endpoint.api_key,
+            base_url=endpoint.base_url,
+            http_client=http_client
+        )
+
+    def _init_response_cache(self) -> Optional[LLMResponseCache]:
+        """初始化响应缓存（api_settings.response_cache.enabled为false时不启用）"""
+        cache_config = self.config.get("api_settings", {}).get("response_cache", {})
+        if not cache_config.get("enabled", False):
+            return None
+        try:
+            return LLMResponseCache(
+                cache_config.get("path", "data/llm_cache.db"),
+                ttl=cache_config.get("ttl"),
+                memory_size=cache_config.get("memory_size", 1000)
+            )
+        except Exception as e:
+            logger.warning("LLM response cache disabled: %s", e)
+            return None
+
+    def _init_semantic_cache(self) -> Optional[SemanticResponseCache]:
+        """初始化语义缓存（api_settings.semantic_cache.enabled为false时不启用）"""
+        cache_config = self.config.get("api_settings", {}).get("semantic_cache", {})
+        if not cache_config.get("enabled", False):
+            return None
+        try:
+            return SemanticResponseCache(
+                cache_config.get("path", "data/llm_semantic_cache.db"),
+                threshold=cache_config.get("threshold", 0.92)
+            )
+        except Exception as e:
+            logger.warning("LLM semantic cache disabled: %s", e)
+            return None
+
+    def _semantic_lookup(
+        self,
+        messages: List[Dict[str, str]],
+        model_type: str,
+        json_mode: bool,
+        key_text: Optional[str] = None
+    ) -> Tuple[Optional[str], Any, Optional[Dict[str, Any]]]:
+        """按key_text（默认为用户消息）的嵌入向量查语义缓存
+
+        Returns:
+            (namespace, 嵌入向量, 命中的结果或None)；嵌入失败时返回(None, None, None)，
+            调用方直接请求LLM（语义缓存只是优化，不影响主流程）
+        """
+        params = self._build_request_params(messages, model_type, None, None, json_mode)
+        # 除用户消息外的全部请求参数相同的条目才互相比较
+        namespace = LLMResponseCache.make_key(
+            params["model"], messages[:-1], params["temperature"], params["max_tokens"], json_mode
+        )
+        try:
+            # 延迟导入：嵌入模块依赖sklearn等较重的包，未启用语义缓存时不加载
+            from utils.embedding import get_embedding_client
+            embedding = get_embedding_client().create_embedding(
+                key_text if key_text is not None else messages[-1]["content"]
+            )
+        except Exception as e:
+            logger.warning("Semantic cache lookup skipped: %s", e)
+            return None, None, None
+
+        cached = self.semantic_cache.get(namespace, embedding)
+        if cached is not None:
+            self._count(cache_hits=1)
+            performance_monitor.record_llm_call(stage_name=model_type, cache_hit=True)
+            logger.debug("LLM semantic cache hit: model=%s", cached.get("model"))
+        return namespace, embedding, cached
+
+    def _semantic_store(self, namespace: Optional[str], embedding: Any, result: Dict[str, Any]):
+        """写入语义缓存（查询时嵌入失败或结果不可缓存时跳过）"""
+        if namespace is not None and self._cacheable(result):
+            self.semantic_cache.set(namespace, embedding, result)
+
+    def _semantic_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model_type: str,
+        json_mode: bool,
+        schema: Optional[type] = None,
+        key_text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """先查语义缓存（见_semantic_lookup），未命中时请求LLM并写入缓存"""
+        namespace, embedding, cached = self._semantic_lookup(messages, model_type, json_mode, key_text)
+        if cached is not None:
+            return cached
+
+        result = self.chat_completion(messages=messages, model_type=model_type, json_mode=json_mode, schema=schema)
+        self._semantic_store(namespace, embedding, result)
+        return result
+
+    async def _asemantic_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model_type: str,
+        json_mode: bool,
+        schema: Optional[type] = None,
+        key_text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """_semantic_chat_completion的异步版本（嵌入请求与缓存查询在线程中执行，不阻塞事件循环）"""
+        namespace, embedding, cached = await asyncio.to_thread(
+            self._semantic_lookup, messages, model_type, json_mode, key_text
+        )
+        if cached is not None:
+            return cached
+
+        result = await self.achat_completion(
+            messages=messages, model_type=model_type, json_mode=json_mode, schema=schema
+        )
+        self._semantic_store(namespace, embedding, result)
+        return result
+
+    def _response_cache_key(self, params: Dict[str, Any], json_mode: bool, bypass_cache: bool) -> Optional[str]:
+        """计算响应缓存键；不使用缓存时（未启用/显式绕过/温度过高）返回None
+
+        设置环境变量LLM_CACHE_FORCE=1时不限制温度（开发时重复运行流水线）
+        """
+        if self.response_cache is None or bypass_cache:
+            return None
+        cache_config = self.config.get("api_settings", {}).get("response_cache", {})
+        # 只缓存低温度（近似确定性）的请求
+        if params["temperature"] > cache_config.get("max_temperature", 0.2) and not os.getenv("LLM_CACHE_FORCE"):
+            return None
+        return self.response_cache.make_key(
+            params["model"], params["messages"], params["temperature"], params["max_tokens"], json_mode
+        )
+
+    def _cached_response(self, cache_key: Optional[str], model_type: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的响应（命中时计入统计）"""
+        if cache_key is None:
+            return None
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            self._count(cache_misses=1)
+            return None
+        self._count(cache_hits=1)
+        performance_monitor.record_llm_call(stage_name=model_type, cache_hit=True)
+        logger.debug("LLM cache hit: model=%s", cached.get("model"))
+        return cached
+
+    def _store_response(self, cache_key: Optional[str], result: Dict[str, Any]):
+        """缓存成功的响应（JSON解析失败的结果不缓存）"""
+        if cache_key is None or not self._cacheable(result):
+            return
+        self.response_cache.set(cache_key, result)
+
+    @staticmethod
+    def _cacheable(result: Dict[str, Any]) -> bool:
+        """JSON解析失败（_try_fix_json返回的错误占位结果）的响应不缓存"""
+        return not is_json_parse_failure(result["content"])
+
+    def get_model_name(self, model_type: str = "main") -> str:
+        """获取指定类型的模型名称（按model_type缓存）"""
+        return self._resolve(model_type)[0]
+
+    def get_model_config(self, model_type: str = "main") -> Mapping[str, Any]:
+        """获取模型配置（缓存配置的只读视图，不再每次复制；需要修改时调用方自行dict()）"""
+        return self._resolve(model_type)[1]
+
+    def _lookup_model_name(self, model_type: str) -> str:
+        """从配置中查找模型名称"""
+        if model_type in self.config.get("models", {}):
+            model_config = self.config["models"][model_type]
+            # 如果有环境变量配置，优先使用
+            env_name = model_config.get("env_name")
+            if env_name and os.getenv(env_name):
+                return os.getenv(env_name)
+            return model_config["name"]
+
+        # 从task_mapping中查找
+        task_mapping = self.config.get("task_mapping", {})
+        if model_type in task_mapping:
+            mapped_model = task_mapping[model_type]["model"]
+            return self._lookup_model_name(mapped_model)
+
+        # 默认返回main模型
+        return self.config["models"]["main"]["name"]
+
+    def _lookup_model_config(self, model_type: str) -> Dict[str, Any]:
+        """从配置中查找模型配置"""
+        # 从task_mapping中查找
+        task_mapping = self.config.get("task_mapping", {})
+        if model_type in task_mapping:
+            mapped_model = task_mapping[model_type]["model"]
+            base_config = self.config["models"][mapped_model].copy()
+            # 覆盖任务特定配置
+            base_config.update(task_mapping[model_type])
+            return base_config
+
+        # 直接从models中查找
+        if model_type in self.config.get("models", {}):
+            return self.config["models"][model_type].copy()
+
+        # 默认返回main模型配置
+        return self.config["models"]["main"].copy()
+
+    def _resolve(self, model_type: str) -> Tuple[str, Mapping[str, Any]]:
+        """解析并缓存模型名称与配置（只读视图），每个model_type只解析一次
+
+        配置在客户端生命周期内不变；修改self.config后需调用clear_model_cache
+        """
+        resolved = self._resolved.get(model_type)
+        if resolved is None:
+            resolved = (
+                self._lookup_model_name(model_type),
+                MappingProxyType(self._lookup_model_config(model_type))
+            )
+            self._resolved[model_type] = resolved
+        return resolved
+
+    def _resolve_configured_models(self):
+        """预先解析models与task_mapping中的全部model_type（未配置的类型仍在首次使用时解析）"""
+        for model_type in (*self.config.get("models", {}), *self.config.get("task_mapping", {})):
+            self._resolve(model_type)
+
+    def clear_model_cache(self):
+        """清空模型名称/配置缓存（重新读取环境变量与配置）"""
+        self._resolved.clear()
+        self._resolve_configured_models()
+
+    def _build_request_params(
+        self,
+        messages: List[Dict[str, str]],
+        model_type: str,
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        json_mode: bool,
+        stream: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """构建chat.completions.create的请求参数（同步/异步共用）
+
+        stream为None时按任务配置（stream: true）决定是否流式接收
+        """
+        model_name, model_config = self._resolve(model_type)
+
+        # 参数配置
+        params = {
+            "model": model_name,
+            "messages": messages,
+            "temperature": temperature if temperature is not None else model_config.get("temperature", 0.1),
+            "max_tokens": max_tokens if max_tokens is not None else model_config.get("max_tokens", 2000),
+            "timeout": model_config.get("timeout", 180)
+        }
+
+        # JSON模式
+        if json_mode:
+            params["response_format"] = {"type": "json_object"}
+
+        # 流式输出：边接收边检测JSON是否完整，见_read_stream
+        if stream is None:
+            stream = model_config.get("stream", False)
+        if stream:
+            params["stream"] = True
+            params["stream_options"] = {"include_usage": True}
+
+        return params
+
+    def _build_result(
+        self,
+        response: Any,
+        model_type: str,
+        model_name: str,
+        json_mode: bool,
+        request_time: float,
+        schema: Optional[type] = None
+    ) -> Dict[str, Any]:
+        """解析响应、更新统计并构建返回结果（同步/异步共用）"""
+        # 用量只读取一次（流式响应提前结束时可能没有usage，计为0）
+        usage = response.usage
+        usage_stats = {
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "total_tokens": getattr(usage, "total_tokens", 0) or 0
+        }
+
+        # 更新统计信息；cached_prompt_tokens为服务端前缀缓存命中的提示tokens（不支持时为0）
+        details = getattr(usage, "prompt_tokens_details", None)
+        self._count(
+            requests=1,
+            tokens_used=usage_stats["total_tokens"],
+            cached_prompt_tokens=getattr(details, "cached_tokens", 0) or 0
+        )
+
+        # 提取响应内容
+        content = response.choices[0].message.content
+
+        # 如果是JSON模式，尝试解析
+        if json_mode:
+            content = self._decode_json(content, schema)
+
+        result = {
+            "content": content,
+            "model": model_name,
+            "usage": usage_stats,
+            "request_time": request_time
+        }
+
+        # Record in performance monitor
+        performance_monitor.record_llm_call(
+            stage_name=model_type,
+            usage=usage_stats,
+            request_time=request_time
+        )
+
+        return result
+
+    def _decode_json(self, content: str, schema: Optional[type] = None) -> Any:
+        """解析JSON响应：有schema且安装了msgspec时按结构解码，类型不符或无法解析时退回orjson与修复逻辑"""
+        if schema is not None and msgspec is not None:
+            try:
+                return msgspec.json.decode(content, type=schema)
+            except msgspec.MsgspecError as e:
+                logger.debug("Schema decode failed, falling back to untyped JSON: %s", e)
+
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError as e:
+            logger.error("Failed to parse JSON response: %s", e)
+            # 只记录开头部分，避免把数KB的响应写进日志
+            logger.error("Raw content: %s", content[:_LOG_CONTENT_CHARS])
+            # 尝试修复JSON
+            return self._try_fix_json(content)
+
+    def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model_type: str = "main",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        bypass_cache: bool = False,
+        stream: Optional[bool] = None,
+        schema: Optional[type] = None
+    ) -> Dict[str, Any]:
+        """聊天补全请求（限流、超时、连接错误和5xx自动退避重试，其它错误直接抛出）
+
+        启用响应缓存时，温度不高于response_cache.max_temperature的请求先查缓存；
+        bypass_cache=True时总是请求API（且不写缓存）。
+        stream=True/False覆盖任务配置中的stream（流式接收，JSON闭合即返回）。
+        schema为utils.llm_schemas中的结构时，JSON模式下按该结构解码（见_decode_json）
+        """
+        # 请求参数在重试之间不变，只构建一次
+        params = self._build_request_params(messages, model_type, temperature, max_tokens, json_mode, stream)
+        model_name = params["model"]
+
+        # cache-aside：确定性请求命中缓存时不发送网络请求
+        cache_key = self._response_cache_key(params, json_mode, bypass_cache)
+        cached = self._cached_response(cache_key, model_type)
+        if cached is not None:
+            return cached
+
+        logger.debug("LLM Request: model=%s, timeout=%ss", model_name, params["timeout"])
+
+        # 记录请求开始时间（含重试等待）
+        start_time = time.time()
+
+        try:
+            response = self._send_request(params, stage=model_type)
+        except Exception as e:
+            self._count(errors=1)
+            performance_monitor.record_llm_call(
+                stage_name=model_type, request_time=time.time() - start_time, failed=True
+            )
+            logger.error("❌ LLM request failed: %s", e)
+            raise
+
+        # 计算请求时间
+        request_time = time.time() - start_time
+
+        result = self._build_result(response, model_type, model_name, json_mode, request_time, schema)
+        self._store_response(cache_key, result)
+
+        logger.debug("✅ LLM request completed: %d tokens in %.2fs", result["usage"]["total_tokens"], request_time)
+        return result
+
+    @backoff.on_exception(
+        _retry_wait_gen,
+        _RETRYABLE_ERRORS,
+        max_tries=5,
+        max_time=600,
+        jitter=None,  # 抖动在_retry_wait_gen中施加（Retry-After不加抖动）
+        on_backoff=_on_llm_backoff
+    )
+    def _send_request(self, params: Dict[str, Any], stage: str = "main") -> Any:
+        """发送一次聊天补全请求（可重试错误由backoff处理；每次尝试轮询一个端点并先获取其限流配额）
+
+        stage只用于按阶段记录重试（见_on_llm_backoff）
+        """
+        endpoint = self._next_endpoint()
+        estimated_tokens = self._estimate_request_tokens(params)
+        endpoint.request_limiter.acquire()
+        endpoint.token_limiter.acquire(estimated_tokens)
+        response = endpoint.client.chat.completions.create(**params)
+        if params.get("stream"):
+            response = self._read_stream(response, "response_format" in params)
+        self._settle_tokens(endpoint, estimated_tokens, response)
+        return response
+
+    @staticmethod
+    def _read_stream(stream: Any, json_mode: bool) -> SimpleNamespace:
+        """读取流式响应；JSON模式下顶层JSON闭合且收到用量数据块后即关闭连接"""
+        accumulator = _StreamAccumulator(json_mode)
+        try:
+            for chunk in stream:
+                if accumulator.add(chunk):
+                    break
+        finally:
+            stream.close()
+        return accumulator.response()
+
+    @staticmethod
+    async def _aread_stream(stream: Any, json_mode: bool) -> SimpleNamespace:
+        """异步读取流式响应（见_read_stream）"""
+        accumulator = _StreamAccumulator(json_mode)
+        try:
+            async for chunk in stream:
+                if accumulator.add(chunk):
+                    break
+        finally:
+            await stream.close()
+        return accumulator.response()
+
+    @staticmethod
+    def _settle_tokens(endpoint: _Endpoint, estimated_tokens: int, response: Any):
+        """按响应中的实际用量结算端点的令牌桶（预约按max_tokens估算，通常远多于实际用量）"""
+        actual_tokens = getattr(response.usage, "total_tokens", None)
+        if actual_tokens:
+            endpoint.token_limiter.refund(estimated_tokens - actual_tokens)
+
+    @staticmethod
+    def _estimate_request_tokens(params: Dict[str, Any]) -> int:
+        """估算一次请求占用的令牌数：提示（约4字符/令牌）+ 最大输出令牌数"""
+        prompt_chars = sum(len(message.get("content") or "") for message in params["messages"])
+        return prompt_chars // 4 + params["max_tokens"]
+
+    def _get_async_client(self, endpoint: _Endpoint) -> AsyncOpenAI:
+        """获取端点在当前事件循环的异步客户端
+
+        AsyncOpenAI底层的连接池绑定在创建它的事件循环上，每次asyncio.run()
+        都是新的事件循环，因此按事件循环复用客户端
+        """
+        loop = asyncio.get_running_loop()
+        if endpoint.aclient is None or endpoint.aclient_loop is not loop:
+            endpoint.aclient = self._init_async_client(endpoint)
+            endpoint.aclient_loop = loop
+        return endpoint.aclient
+
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model_type: str = "main",
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False,
+        bypass_cache: bool = False,
+        stream: Optional[bool] = None,
+        schema: Optional[type] = None
+    ) -> Dict[str, Any]:
+        """异步聊天补全请求（与chat_completion参数、返回值、重试策略一致）"""
+        # 请求参数在重试之间不变，只构建一次
+        params = self._build_request_params(messages, model_type, temperature, max_tokens, json_mode, stream)
+        model_name = params["model"]
+
+        # cache-aside：确定性请求命中缓存时不发送网络请求
+        cache_key = self._response_cache_key(params, json_mode, bypass_cache)
+        cached = self._cached_response(cache_key, model_type)
+        if cached is not None:
+            return cached
+
+        logger.debug("LLM Request: model=%s, timeout=%ss", model_name, params["timeout"])
+
+        start_time = time.time()
+
+        try:
+            # 等待网络I/O时让出事件循环，其它请求并发进行
+            response = await self._asend_request(params, stage=model_type)
+        except Exception as e:
+            self._count(errors=1)
+            performance_monitor.record_llm_call(
+                stage_name=model_type, request_time=time.time() - start_time, failed=True
+            )
+            logger.error("❌ LLM request failed: %s", e)
+            raise
+
+        request_time = time.time() - start_time
+
+        result = self._build_result(response, model_type, model_name, json_mode, request_time, schema)
+        self._store_response(cache_key, result)
+
+        logger.debug("✅ LLM request completed: %d tokens in %.2fs", result["usage"]["total_tokens"], request_time)
+        return result
+
+    @backoff.on_exception(
+        _retry_wait_gen,
+        _RETRYABLE_ERRORS,
+        max_tries=5,
+        max_time=600,
+        jitter=None,
+        on_backoff=_on_llm_backoff
+    )
+    async def _asend_request(self, params: Dict[str, Any], stage: str = "main") -> Any:
+        """异步发送一次聊天补全请求（可重试错误由backoff处理；每次尝试轮询一个端点并先获取其限流配额）"""
+        endpoint = self._next_endpoint()
+        estimated_tokens = self._estimate_request_tokens(params)
+        await endpoint.request_limiter.aacquire()
+        await endpoint.token_limiter.aacquire(estimated_tokens)
+        response = await self._get_async_client(endpoint).chat.completions.create(**params)
+        if params.get("stream"):
+            response = await self._aread_stream(response, "response_format" in params)
+        self._settle_tokens(endpoint, estimated_tokens, response)
+        return response
+
+    async def abatch(self, jobs: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], BaseException]]:
+        """并发执行多个聊天补全请求
+
+        Args:
+            jobs: 每项为achat_completion的关键字参数（messages, model_type, json_mode等）
+
+        Returns:
+            与jobs顺序一致的结果列表；失败的请求位置上是对应的异常对象
+        """
+        return await self.agather(self.achat_completion(**job) for job in jobs)
+
+    async def agather(self, coros: Iterable[Awaitable[Any]]) -> List[Any]:
+        """并发执行多个协程，同时运行的数量不超过api_settings.concurrency
+
+        Returns:
+            与coros顺序一致的结果列表；失败的位置上是对应的异常对象
+        """
+        concurrency = self.config.get("api_settings", {}).get("concurrency", 16)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(coro: Awaitable[Any]) -> Any:
+            async with semaphore:
+                return await coro
+
+        return await asyncio.gather(*(run(coro) for coro in coros), return_exceptions=True)
+
+    def run_batch(self, coros: Iterable[Awaitable[Any]]) -> List[Any]:
+        """同步入口：在新的事件循环中执行agather
+
+        coros可以是生成器（如 `self.aextract_pain_points(**post) for post in posts`），
+        协程在事件循环内才创建
+        """
+        return asyncio.run(self._agather_and_close(coros))
+
+    async def _agather_and_close(self, coros: Iterable[Awaitable[Any]]) -> List[Any]:
+        """执行agather，结束后在同一事件循环内关闭异步客户端的连接池
+
+        asyncio.run()结束后事件循环即关闭，留下的连接无法再复用也无法正常关闭
+        """
+        try:
+            return await self.agather(coros)
+        finally:
+            await self.aclose()
+
+    def chat_completion_many(self, jobs: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], BaseException]]:
+        """同步入口：并发执行多个聊天补全请求（见abatch）"""
+        if not jobs:
+            return []
+        return self.run_batch(self.achat_completion(**job) for job in jobs)
+
+    def map_calls(
+        self,
+        fn: Callable[..., Dict[str, Any]],
+        args_iter: Iterable[Dict[str, Any]],
+        max_workers: int = 16
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """用线程池并发执行同步调用（供无法改用asyncio的调用方）
+
+        同步客户端（httpx连接池）、限流器与统计计数都是线程安全的；
+        请求耗时主要是等待服务端，线程数与异步并发效果相近，实际速率仍受限流器约束。
+
+        Args:
+            fn: 同步方法，如self.chat_completion或self.validate_pain_signal
+            args_iter: 每项为fn的关键字参数
+            max_workers: 最大线程数
+
+        Returns:
+            与args_iter顺序一致的结果列表；失败的位置上是对应的异常对象
+        """
+        def call(kwargs: Dict[str, Any]) -> Union[Dict[str, Any], BaseException]:
+            try:
+                return fn(**kwargs)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(call, args_iter))
+
+    async def aclose(self):
+        """关闭各端点在当前事件循环的异步客户端（在使用它们的事件循环结束前调用）"""
+        for endpoint in self._endpoints:
+            aclient, endpoint.aclient, endpoint.aclient_loop = endpoint.aclient, None, None
+            if aclient is not None:
+                await aclient.close()
+
+    def close(self):
+        """关闭同步客户端的连接池和缓存数据库连接（进程退出前调用）"""
+        for endpoint in self._endpoints:
+            endpoint.client.close()
+        for cache in (self.response_cache, self.semantic_cache):
+            if cache is not None:
+                cache.close()
+
+    # 离线批处理请求体中不包含的客户端参数
+    _CLIENT_ONLY_PARAMS = ("timeout", "stream", "stream_options")
+
+    def submit_offline_batch(self, jobs: List[Dict[str, Any]]) -> str:
+        """通过Batch API提交离线批处理（费用约为实时请求的一半，24小时内完成）
+
+        Args:
+            jobs: 每项为chat_completion的关键字参数（messages, model_type, json_mode等）
+
+        Returns:
+            批处理ID（用poll_batch获取结果）
+        """
+        lines = []
+        for i, job in enumerate(jobs):
+            params = self._build_request_params(
+                job["messages"],
+                job.get("model_type", "main"),
+                job.get("temperature"),
+                job.get("max_tokens"),
+                job.get("json_mode", False)
+            )
+            body = {k: v for k, v in params.items() if k not in self._CLIENT_ONLY_PARAMS}
+            lines.append(orjson.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            }))
+
+        input_file = self.client.files.create(
+            file=("batch_input.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("Submitted offline batch %s with %d requests", batch.id, len(jobs))
+        return batch.id
+
+    def poll_batch(
+        self,
+        batch_id: str,
+        num_requests: int,
+        json_mode: bool = True
+    ) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """查询离线批处理结果
+
+        Args:
+            batch_id: submit_offline_batch返回的批处理ID
+            num_requests: 提交的请求数（结果列表长度；不依赖服务端的request_counts，
+                          批处理在校验阶段失败或服务端未返回计数时该值可能为0）
+            json_mode: 是否将响应内容解析为JSON
+
+        Returns:
+            尚未完成时返回None；完成后返回与提交顺序一致的结果列表
+            （结构同chat_completion的返回值，失败的请求位置上为None）
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "cancelled"):
+            raise RuntimeError(f"Offline batch {batch_id} {batch.status}")
+        if batch.status not in ("completed", "expired"):
+            return None
+
+        results: List[Optional[Dict[str, Any]]] = [None] * num_requests
+        if not batch.output_file_id:
+            return results
+
+        output = self.client.files.content(batch.output_file_id).read()
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.warning("Offline batch request %s failed: %s", record.get("custom_id"), record.get("error"))
+                continue
+            index = int(record["custom_id"])
+            if not 0 <= index < num_requests:
+                logger.warning("Offline batch %s returned unexpected custom_id %s", batch_id, record["custom_id"])
+                continue
+            results[index] = self._build_batch_result(response["body"], json_mode)
+
+        return results
+
+    def _build_batch_result(self, body: Dict[str, Any], json_mode: bool) -> Dict[str, Any]:
+        """将批处理输出中的响应体转换为chat_completion的返回结构"""
+        usage = body.get("usage") or {}
+        self._count(requests=1, tokens_used=usage.get("total_tokens", 0))
+
+        content = body["choices"][0]["message"]["content"]
+        if json_mode:
+            try:
+                content = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                content = self._try_fix_json(content)
+
+        return {
+            "content": content,
+            "model": body.get("model"),
+            "usage": {
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0)
+            },
+            "request_time": 0.0
+        }
+
+    def _clean_json_string(self, json_str: str) -> str:
+        """清理JSON字符串中的控制字符和非法格式
+
+        Args:
+            json_str: 原始JSON字符串
+
+        Returns:
+            清理后的JSON字符串
+        """
+
+        # 移除markdown格式（**加粗**）
+        json_str = re.sub(r'\*\*', '', json_str)
+
+        # 更简单的方法：直接替换所有控制字符
+        # 但需要保留JSON结构中的合法字符（引号、逗号、冒号、花括号等）
+
+        # 策略：逐字符处理，保留JSON结构字符，替换字符串值中的控制字符
+        result = []
+        in_string = False
+        escape_next = False
+        string_delimiter = None
+
+        for char in json_str:
+            if escape_next:
+                # 转义字符，直接保留
+                result.append(char)
+                escape_next = False
+                continue
+
+            if char == '\\' and in_string:
+                # 转义符
+                result.append(char)
+                escape_next = True
+                continue
+
+            if char in ('"', "'") and not escape_next:
+                if not in_string:
+                    # 字符串开始
+                    in_string = True
+                    string_delimiter = char
+                    result.append(char)
+                elif char == string_delimiter:
+                    # 字符串结束
+                    in_string = False
+                    string_delimiter = None
+                    result.append(char)
+                else:
+                    # 不同的引号，在字符串内
+                    result.append(char)
+                continue
+
+            if in_string:
+                # 在字符串内，处理控制字符
+                if ord(char) < 32 or char == '\x7f':
+                    # 控制字符，替换为空格
+                    result.append(' ')
+                else:
+                    result.append(char)
+            else:
+                # 不在字符串内，直接保留
+                result.append(char)
+
+        return ''.join(result)
+
+    def _try_fix_json(self, content: str) -> Dict[str, Any]:
+        """尝试修复损坏的JSON
+
+        依次尝试：
+        - 去掉markdown代码块标记后直接解析
+        - json-repair修复（尾逗号、单引号、缺失括号/被截断等，需安装json-repair）
+        - 截取首尾花括号之间的内容，清理控制字符和markdown格式（**bold**）后解析
+        """
+        unfenced = _JSON_FENCE.sub("", content)
+        try:
+            return orjson.loads(unfenced)
+        except orjson.JSONDecodeError:
+            pass
+
+        if json_repair is not None:
+            try:
+                repaired = json_repair.loads(unfenced)
+                # 修复结果必须是JSON对象，无法修复时json-repair返回空字符串等
+                if isinstance(repaired, dict) and repaired:
+                    return repaired
+            except Exception as e:
+                logger.debug("json-repair failed: %s", e)
+
+        try:
+            # 尝试提取JSON部分
+            start_idx = content.find('{')
+            end_idx = content.rfind('}') + 1
+            if start_idx != -1 and end_idx > start_idx:
+                json_str = content[start_idx:end_idx]
+
+                # 清理JSON字符串
+                json_str = self._clean_json_string(json_str)
+
+                return orjson.loads(json_str)
+            else:
+                raise ValueError("No JSON found in response")
+        except Exception as e:
+            logger.error("Failed to fix JSON: %s", e)
+            logger.debug("Content after cleaning: %s...", content[:_LOG_CONTENT_CHARS])
+            return {"error": "Failed to parse JSON", "raw_content": content}
+
+    def extract_pain_points(
+        self,
+        title: str,
+        body: str,
+        subreddit: str,
+        upvotes: int,
+        comments_count: int,
+        top_comments: Optional[List[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """从Reddit帖子或评论中提取痛点（支持评论上下文）
+
+        Args:
+            title: Post title (or parent post title if analyzing a comment)
+            body: Post body or comment body
+            subreddit: Subreddit name
+            upvotes: Upvote count
+            comments_count: Number of comments
+            top_comments: List of top comments (only used for post analysis)
+            metadata: Optional metadata dict with 'source_type' key ('post' or 'comment')
+        """
+        messages = self._build_pain_extraction_messages(
+            title, body, subreddit, upvotes, comments_count, top_comments, metadata
+        )
+
+        # 启用语义缓存时，内容近似重复的帖子/评论复用已有的抽取结果
+        if self.semantic_cache is not None:
+            return self._semantic_chat_completion(
+                messages, "pain_extraction", json_mode=True, schema=PainExtractionResult,
+                key_text=_semantic_key_text(title, body)
+            )
+
+        return self.chat_completion(
+            messages=messages,
+            model_type="pain_extraction",
+            json_mode=True,
+            schema=PainExtractionResult
+        )
+
+    async def aextract_pain_points(
+        self,
+        title: str,
+        body: str,
+        subreddit: str,
+        upvotes: int,
+        comments_count: int,
+        top_comments: Optional[List[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """异步从Reddit帖子或评论中提取痛点（参数、返回值与语义缓存行为同extract_pain_points）"""
+        messages = self._build_pain_extraction_messages(
+            title, body, subreddit, upvotes, comments_count, top_comments, metadata
+        )
+
+        if self.semantic_cache is not None:
+            return await self._asemantic_chat_completion(
+                messages, "pain_extraction", json_mode=True, schema=PainExtractionResult,
+                key_text=_semantic_key_text(title, body)
+            )
+
+        return await self.achat_completion(
+            messages=messages,
+            model_type="pain_extraction",
+            json_mode=True,
+            schema=PainExtractionResult
+        )
+
+    def extract_pain_points_many(self, posts: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], BaseException]]:
+        """并发地从多个帖子/评论中提取痛点
+
+        Args:
+            posts: 每项为extract_pain_points的关键字参数
+                   （title, body, subreddit, upvotes, comments_count, 可选top_comments/metadata）
+
+        Returns:
+            与posts顺序一致的结果列表；失败的位置上是对应的异常对象
+        """
+        return self.chat_completion_many([self._pain_extraction_job(post) for post in posts])
+
+    def map_extract(
+        self,
+        posts: List[Dict[str, Any]],
+        max_workers: int = 16
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """用线程池并发地从多个帖子/评论中提取痛点（extract_pain_points_many的同步线程版）"""
+        return self.map_calls(
+            self.chat_completion,
+            (self._pain_extraction_job(post) for post in posts),
+            max_workers=max_workers
+        )
+
+    def extract_pain_points_batch_api(
+        self,
+        posts: List[Dict[str, Any]],
+        poll_interval: float = 30.0,
+        max_poll_interval: float = 600.0
+    ) -> List[Optional[Dict[str, Any]]]:
+        """通过Batch API离线提取痛点（费用约为实时请求的一半，阻塞直到批处理完成）
+
+        Args:
+            posts: 每项为extract_pain_points的关键字参数（同extract_pain_points_many）
+            poll_interval: 首次查询间隔（秒），之后每次翻倍
+            max_poll_interval: 查询间隔上限（秒）
+
+        Returns:
+            与posts顺序一致的结果列表（结构同extract_pain_points的返回值），失败的位置上为None
+        """
+        if not posts:
+            return []
+
+        batch_id = self.submit_offline_batch([self._pain_extraction_job(post) for post in posts])
+        while True:
+            results = self.poll_batch(batch_id, len(posts), json_mode=True)
+            if results is not None:
+                return results
+            logger.info("Offline batch %s still running, checking again in %.0fs", batch_id, poll_interval)
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+    def _pain_extraction_job(self, post: Dict[str, Any]) -> Dict[str, Any]:
+        """构建单个帖子/评论痛点抽取请求的chat_completion参数"""
+        return {
+            "messages": self._build_pain_extraction_messages(
+                post.get("title", ""),
+                post.get("body", ""),
+                post.get("subreddit", ""),
+                post.get("upvotes", 0),
+                post.get("comments_count", 0),
+                post.get("top_comments"),
+                post.get("metadata")
+            ),
+            "model_type": "pain_extraction",
+            "json_mode": True,
+            "schema": PainExtractionResult
+        }
+
+    def _build_pain_extraction_messages(
+        self,
+        title: str,
+        body: str,
+        subreddit: str,
+        upvotes: int,
+        comments_count: int,
+        top_comments: Optional[List[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, str]]:
+        """构建痛点抽取的消息（帖子与评论格式不同）"""
+        # Determine if analyzing a comment or post
+        is_comment = metadata and metadata.get("source_type") == "comment" if metadata else False
+
+        # Get appropriate prompt based on source type
+        prompt = _PAIN_PROMPT_COMMENT if is_comment else _PAIN_PROMPT_POST
+
+        user_message = self._format_pain_user_message(
+            title, body, subreddit, upvotes, comments_count, top_comments, is_comment
+        )
+
+        # 预检长度：超出模型上下文时先去掉排名靠后的评论，再截断正文，避免请求被API拒绝
+        budget = self._input_token_budget("pain_extraction", prompt)
+        if budget is not None and _count_tokens(user_message) > budget:
+            comments = list(top_comments or [])
+            while comments and _count_tokens(user_message) > budget:
+                comments.pop()
+                user_message = self._format_pain_user_message(
+                    title, body, subreddit, upvotes, comments_count, comments, is_comment
+                )
+            overflow = _count_tokens(user_message) - budget
+            if overflow > 0:
+                body = _truncate_to_tokens(body, max(_count_tokens(body) - overflow, 0))
+                user_message = self._format_pain_user_message(
+                    title, body, subreddit, upvotes, comments_count, comments, is_comment
+                )
+            logger.warning(
+                "Pain extraction input exceeded context budget (%d tokens), kept %d/%d comments",
+                budget, len(comments), len(top_comments or [])
+            )
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_message}
+        ]
+
+        return messages
+
+    @staticmethod
+    def _format_pain_user_message(
+        title: str,
+        body: str,
+        subreddit: str,
+        upvotes: int,
+        comments_count: int,
+        top_comments: Optional[List[Dict[str, Any]]],
+        is_comment: bool
+    ) -> str:
+        """构建痛点抽取的用户消息 - format differs for comments vs posts"""
+        if is_comment:
+            # Analyzing a standalone comment
+            # Note: Don't include top_comments when analyzing a comment itself
+            return f"""ANALYZING A COMMENT
+
+Parent Post Title (context only): {title}
+Comment Body (PRIMARY PAIN SOURCE): {body}
+Subreddit: {subreddit}
+Comment Upvotes: {upvotes}
+"""
+
+        # Analyzing a post (original behavior)
+        user_message = f"""ANALYZING A POST
+
+Title: {title}
+Body: {body}
+Subreddit: {subreddit}
+Upvotes: {upvotes}
+Comments: {comments_count}
+"""
+
+        # Add top comments if available（一次join拼接，避免循环内字符串+=）
+        if top_comments:
+            user_message += f"\nTop {len(top_comments)} Comments:\n" + "".join(
+                f"\n{i}. [{comment.get('score', 0)} upvotes] {comment.get('author', 'unknown')}: "
+                f"{_truncate_comment(comment.get('body', ''))}\n"
+                for i, comment in enumerate(top_comments, 1)
+            )
+
+        return user_message
+
+    def _input_token_budget(
+        self,
+        model_type: str,
+        system_prompt: str,
+        max_tokens: Optional[int] = None
+    ) -> Optional[int]:
+        """用户消息可用的tokens数：max_context - max_tokens - 系统提示 - 预留；未配置max_context时返回None
+
+        max_tokens默认取模型配置，调用方放大了输出上限时（如批量抽取）需显式传入
+        """
+        _, model_config = self._resolve(model_type)
+        max_context = model_config.get("max_context")
+        if not max_context:
+            return None
+        return (
+            max_context
+            - (max_tokens or model_config.get("max_tokens", 2000))
+            - _count_tokens(system_prompt)
+            - _CONTEXT_SAFETY_TOKENS
+        )
+
+    async def aextract_pain_points_batch(
+        self,
+        items: List[Dict[str, Any]],
+        max_batch_chars: int = 12000
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """在一次LLM请求中为多个帖子提取痛点（系统提示每批只发送一次）
+
+        Args:
+            items: 帖子列表，每项为aextract_pain_points的关键字参数
+                   （title, body, subreddit, upvotes, comments_count）
+            max_batch_chars: 每批帖子标题+正文的总字符上限，超过时拆成多次并发请求
+
+        Returns:
+            与items顺序一致的结果列表，每项格式同extract_pain_points的返回值
+            （content为{"pain_events": [...]}）；批量结果缺失的帖子单独重新请求，
+            单独请求仍失败的位置上是对应的异常对象
+        """
+        def single(item: Dict[str, Any]) -> Awaitable[Dict[str, Any]]:
+            return self.aextract_pain_points(
+                title=item.get("title", ""),
+                body=item.get("body", ""),
+                subreddit=item.get("subreddit", ""),
+                upvotes=item.get("upvotes", 0),
+                comments_count=item.get("comments_count", 0)
+            )
+
+        # 语义缓存按单个帖子查找，启用时逐个请求
+        if self.semantic_cache is not None:
+            return await asyncio.gather(*(single(item) for item in items), return_exceptions=True)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+        # 按字符预算切分批次
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_chars = 0
+        for i, item in enumerate(items):
+            item_chars = len(item.get("title") or "") + len(item.get("body") or "")
+            if current and current_chars + item_chars > max_batch_chars:
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(i)
+            current_chars += item_chars
+        if current:
+            batches.append(current)
+
+        responses = await asyncio.gather(
+            *(self._aextract_pain_batch_request(items, batch) for batch in batches),
+            return_exceptions=True
+        )
+
+        for batch, response in zip(batches, responses):
+            if isinstance(response, BaseException):
+                logger.error("Batch pain extraction failed for %d posts: %s", len(batch), response)
+                continue
+            outputs = response["content"].get("outputs") if isinstance(response["content"], dict) else None
+            if not isinstance(outputs, list):
+                # JSON无法修复或格式不符时整批按缺失处理
+                logger.error("Unparseable batch pain extraction response for %d posts", len(batch))
+                continue
+
+            for output in outputs:
+                if not isinstance(output, dict) or not isinstance(output.get("pain_events", []), list):
+                    continue
+                local_id = output.get("id")
+                if isinstance(local_id, int) and 0 <= local_id < len(batch):
+                    results[batch[local_id]] = {
+                        "content": {"pain_events": output.get("pain_events") or []},
+                        "model": response["model"],
+                        "usage": response["usage"],
+                        "request_time": response["request_time"]
+                    }
+
+        # 批量结果缺失的帖子（请求失败或模型漏掉）逐个重新提取
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            logger.warning("Batch extraction missing %d/%d posts, extracting individually", len(missing), len(items))
+            retried = await asyncio.gather(*(single(items[i]) for i in missing), return_exceptions=True)
+            for i, result in zip(missing, retried):
+                results[i] = result
+
+        return results
+
+    async def _aextract_pain_batch_request(
+        self,
+        items: List[Dict[str, Any]],
+        batch: List[int]
+    ) -> Dict[str, Any]:
+        """发送一个批量抽取请求；输入id为帖子在批内的序号"""
+        # 输出随批大小增长
+        model_config = self._resolve("pain_extraction")[1]
+        max_tokens = min(model_config.get("max_tokens", 2000) * len(batch), 8192)
+
+        inputs = [
+            {
+                "id": local_id,
+                "title": items[i].get("title", ""),
+                "body": items[i].get("body", ""),
+                "subreddit": items[i].get("subreddit", ""),
+                "upvotes": items[i].get("upvotes", 0),
+                "comments": items[i].get("comments_count", 0)
+            }
+            for local_id, i in enumerate(batch)
+        ]
+
+        # 预检长度：单个超长帖子会独占一批，按每帖平均预算截断正文，避免请求超出上下文
+        budget = self._input_token_budget("pain_extraction", _PAIN_PROMPT_POST_BATCH, max_tokens)
+        if budget is not None:
+            # 扣除标题、元数据等JSON结构本身的tokens
+            overhead = _count_tokens(orjson.dumps(
+                {"inputs": [dict(entry, body="") for entry in inputs]}
+            ).decode())
+            per_post = max((budget - overhead) // len(batch), 0)
+            for entry in inputs:
+                body = entry["body"] or ""
+                if len(body) > per_post and _count_tokens(body) > per_post:
+                    entry["body"] = _truncate_to_tokens(body, per_post)
+                    logger.warning(
+                        "Truncated post body to %d tokens for batch pain extraction", per_post
+                    )
+
+        messages = [
+            {"role": "system", "content": _PAIN_PROMPT_POST_BATCH},
+            {"role": "user", "content": orjson.dumps({"inputs": inputs}).decode()}
+        ]
+
+        return await self.achat_completion(
+            messages=messages,
+            model_type="pain_extraction",
+            max_tokens=max_tokens,
+            json_mode=True
+        )
+
+    def cluster_pain_events(
+        self,
+        pain_events: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """聚类痛点事件"""
+        prompt = _WORKFLOW_CLUSTERING_PROMPT
+
+        # 构建痛点事件文本（生成器直接交给join，不构建中间列表）
+        events_text = "\n\n".join(
+            f"Event {i}: {problem} (Context: {context}, Workaround: {workaround})"
+            for i, (problem, context, workaround) in enumerate(_event_columns(pain_events), 1)
+        )
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"Pain events:\n{events_text}"}
+        ]
+
+        return self.chat_completion(
+            messages=messages,
+            model_type="clustering",
+            json_mode=True,
+            schema=WorkflowClusterResult
+        )
+
+    def summarize_source_cluster(
+        self,
+        pain_events: List[Dict[str, Any]],
+        source_type: str
+    ) -> Dict[str, Any]:
+        """为同一source的聚类生成摘要"""
+        prompt = _CLUSTER_SUMMARIZER_PROMPT
+
+        # 构建痛点事件文本，重点关注问题和上下文
+        # 最多处理10个事件以控制token长度
+        events_text = "\n\n".join(
+            f"Event {i}:\nProblem: {problem}\nContext: {context}\nWorkaround: {workaround}\n"
+            for i, (problem, context, workaround) in enumerate(_event_columns(pain_events[:10]), 1)
+        )
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"Source Type: {source_type}\n\nPain Events:\n{events_text}"}
+        ]
+
+        return self.chat_completion(
+            messages=messages,
+            model_type="cluster_summarizer",
+            json_mode=True
+        )
+
+    def generate_jtbd_from_cluster(
+        self,
+        cluster_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """从已验证的聚类生成详细JTBD分析"""
+        return self.chat_completion(**self.build_jtbd_job(cluster_data))
+
+    def build_jtbd_job(self, cluster_data: Dict[str, Any]) -> Dict[str, Any]:
+        """构建JTBD分析请求（chat_completion关键字参数，也可用于submit_offline_batch）"""
+        # 静态说明全部在系统消息中，各聚类的请求共享完全相同的前缀（服务端前缀缓存可复用）
+        cluster_text = _JTBD_CLUSTER_TEMPLATE.format(
+            cluster_name=cluster_data.get('cluster_name', ''),
+            cluster_description=cluster_data.get('cluster_description', ''),
+            common_pain=cluster_data.get('common_pain', ''),
+            common_context=cluster_data.get('common_context', ''),
+            example_events=orjson.dumps(cluster_data.get('example_events', [])[:3]).decode()
+        )
+
+        messages = [
+            {"role": "system", "content": _JTBD_PROMPT},
+            {"role": "user", "content": cluster_text}
+        ]
+
+        return {
+            "messages": messages,
+            "model_type": "cluster_summarizer",
+            "json_mode": True
+        }
+
+    def map_opportunity(
+        self,
+        cluster_summary: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """从痛点聚类映射机会"""
+        prompt = _OPPORTUNITY_MAPPING_PROMPT
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"Pain cluster:\n{orjson.dumps(cluster_summary, option=orjson.OPT_INDENT_2).decode()}"}
+        ]
+
+        return self.chat_completion(
+            messages=messages,
+            model_type="opportunity_mapping",
+            json_mode=True,
+            schema=OpportunityMappingResult
+        )
+
+    def score_viability(
+        self,
+        opportunity_description: str
+    ) -> Dict[str, Any]:
+        """评估机会可行性"""
+        return self.chat_completion(**self._viability_job(opportunity_description))
+
+    def score_viability_many(
+        self,
+        opportunity_descriptions: List[str]
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """并发评估多个机会的可行性
+
+        Returns:
+            与opportunity_descriptions顺序一致的结果列表；失败的位置上是对应的异常对象
+        """
+        return self.chat_completion_many([
+            self._viability_job(description) for description in opportunity_descriptions
+        ])
+
+    def _viability_job(self, opportunity_description: str) -> Dict[str, Any]:
+        """构建可行性评分请求（chat_completion关键字参数）"""
+        prompt = _VIABILITY_SCORING_PROMPT
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"Idea:\n{opportunity_description}"}
+        ]
+
+        return {
+            "messages": messages,
+            "model_type": "viability_scoring",
+            "json_mode": True,
+            "schema": ViabilityResult
+        }
+
+    def validate_pain_signal(
+        self,
+        text: str
+    ) -> Dict[str, Any]:
+        """验证痛点信号"""
+        prompt = _SIGNAL_VALIDATION_PROMPT
+
+        messages = [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": text}
+        ]
+
+        return self.chat_completion(
+            messages=messages,
+            model_type="signal_validation",
+            json_mode=True,
+            schema=SignalValidationResult
+        )
+
+    def _get_pain_extraction_prompt(self, is_comment: bool = False) -> str:
+        """获取痛点抽取提示 - 支持帖子或评论分析
+
+        Args:
+            is_comment: True if analyzing a comment, False if analyzing a post
+        """
+        return _PAIN_PROMPT_COMMENT if is_comment else _PAIN_PROMPT_POST
+
+    def _get_pain_extraction_batch_prompt(self) -> str:
+        """获取批量痛点抽取提示（帖子抽取提示 + 批量输入输出格式说明）"""
+        return _PAIN_PROMPT_POST_BATCH
+
+    def _get_workflow_clustering_prompt(self) -> str:
+        """Get workflow clustering prompt with JTBD extraction"""
+        return _WORKFLOW_CLUSTERING_PROMPT
+
+    def _get_opportunity_mapping_prompt(self) -> str:
+        """获取机会映射提示 - Phase 3 简化版（仅定性描述）"""
+        return _OPPORTUNITY_MAPPING_PROMPT
+
+    def _get_viability_scoring_prompt(self) -> str:
+        """获取可行性评分提示"""
+        return _VIABILITY_SCORING_PROMPT
+
+    def _get_cluster_summarizer_prompt(self) -> str:
+        """获取聚类摘要提示（增强JTBD版本）"""
+        return _CLUSTER_SUMMARIZER_PROMPT
+
+    def _get_signal_validation_prompt(self) -> str:
+        """获取信号验证提示"""
+        return _SIGNAL_VALIDATION_PROMPT
+
+    def _count(self, **increments: Union[int, float]):
+        """原子地累加统计计数"""
+        with self._stats_lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """获取使用统计（加锁取快照）"""
+        with self._stats_lock:
+            return self.stats.copy()
+
+    def reset_statistics(self):
+        """重置统计"""
+        with self._stats_lock:
+            self.stats = {
+                "requests": 0,
+                "tokens_used": 0,
+                "cost": 0.0,
+                "errors": 0,
+                "cache_hits": 0,
+                "cache_misses": 0,
+                "cached_prompt_tokens": 0
+            }
+
+# 全局LLM客户端实例，首次使用时才创建（只导入模块时不读取配置、不创建HTTP客户端）
+_llm_client: Optional[LLMClient] = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client(config_path: str = "config/llm.yaml") -> LLMClient:
+    """获取全局LLM客户端实例（首次调用时才读取配置与环境变量并创建）
+
+    config_path与现有实例不同时，关闭现有实例并按新配置重新创建
+    """
+    global _llm_client
+    client = _llm_client
+    if client is not None and client.config_path == config_path:
+        return client
+
+    with _llm_client_lock:
+        stale = None
+        if _llm_client is not None and _llm_client.config_path != config_path:
+            stale, _llm_client = _llm_client, None
+        if _llm_client is None:
+            _llm_client = LLMClient(config_path)
+        client = _llm_client
+    if stale is not None:
+        stale.close()
+    return client
+
+
+def close_llm_client():
+    """关闭并丢弃全局LLM客户端实例（之后再调用get_llm_client()会重新创建）"""
+    global _llm_client
+    with _llm_client_lock:
+        client, _llm_client = _llm_client, None
+    if client is not None:
+        client.close()
@@ -0,0 +1,66 @@
+"""
+LLM output schemas for Reddit Pain Point Finder
+LLM输出结构 - 与各提示要求的JSON格式一一对应，安装msgspec后用于带类型校验的快速解码
+
+使用TypedDict而不是msgspec.Struct：解码结果仍是普通dict，下游的.get()等用法不变。
+字段均为可选（total=False），只校验出现的字段的类型；未在此列出的字段解码时丢弃，
+因此新增提示字段时需同步补充这里。
+"""
+from typing import Any, Dict, List, Optional, TypedDict
+
+
+class PainEvent(TypedDict, total=False):
+    """单个痛点事件（_PAIN_PROMPT_POST / _PAIN_PROMPT_COMMENT）"""
+    actor: Optional[str]
+    context: Optional[str]
+    problem: Optional[str]
+    current_workaround: Optional[str]
+    frequency: Optional[str]
+    emotional_signal: Optional[str]
+    mentioned_tools: List[str]
+    confidence: float
+    evidence_sources: List[str]
+
+
+class PainExtractionResult(TypedDict, total=False):
+    """痛点抽取结果"""
+    pain_events: List[PainEvent]
+    extraction_summary: Optional[str]
+
+
+class WorkflowClusterResult(TypedDict, total=False):
+    """工作流聚类验证结果（_WORKFLOW_CLUSTERING_PROMPT）"""
+    workflow_similarity: float
+    workflow_name: Optional[str]
+    workflow_description: Optional[str]
+    confidence: float
+    reasoning: Optional[str]
+    job_statement: Optional[str]
+    customer_profile: Optional[str]
+    desired_outcomes: List[str]
+
+
+class OpportunityMappingResult(TypedDict, total=False):
+    """机会映射结果（_OPPORTUNITY_MAPPING_PROMPT）；没有可行机会时opportunity为null"""
+    current_tools: List[str]
+    missing_capability: Optional[str]
+    why_existing_fail: Optional[str]
+    opportunity: Optional[Dict[str, Any]]
+
+
+class ViabilityResult(TypedDict, total=False):
+    """可行性评分结果（_VIABILITY_SCORING_PROMPT）"""
+    scores: Dict[str, float]
+    total_score: float
+    killer_risks: List[str]
+    recommendation: Optional[str]
+
+
+class SignalValidationResult(TypedDict, total=False):
+    """痛点信号验证结果（_SIGNAL_VALIDATION_PROMPT）"""
+    is_pain_point: bool
+    confidence: float
+    pain_type: Optional[str]
+    specificity: float
+    emotional_intensity: float
+    keywords: List[str]
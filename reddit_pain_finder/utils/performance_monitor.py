@@ -4,21 +4,36 @@ Tracks LLM calls, token usage, and execution time
 """
 import time
 import json
+import math
+import threading
 from datetime import datetime
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, List
 from functools import wraps
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
 class PerformanceMonitor:
     """性能监控器"""
 
     def __init__(self):
+        # LLM请求可能来自多个线程/协程，记录时加锁
+        self._lock = threading.Lock()
         self.reset()
 
     def reset(self):
         """重置所有指标"""
+        # 每个阶段（model_type）的请求耗时，用于计算p50/p99
+        self._latencies: Dict[str, List[float]] = {}
         self.metrics = {
             "start_time": None,
             "end_time": None,
@@ -56,27 +71,80 @@ class PerformanceMonitor:
             self.metrics["stages"][stage_name]["duration_seconds"] = (end - start).total_seconds()
             self.metrics["stages"][stage_name]["items_processed"] = items_processed
 
-    def record_llm_call(self, stage_name: str, usage: Dict[str, Any]):
-        """记录LLM调用"""
-        self.metrics["llm_calls"]["total_calls"] += 1
-
-        prompt_tokens = usage.get("prompt_tokens", 0)
-        completion_tokens = usage.get("completion_tokens", 0)
-        total_tokens = usage.get("total_tokens", 0)
-
-        self.metrics["llm_calls"]["prompt_tokens"] += prompt_tokens
-        self.metrics["llm_calls"]["completion_tokens"] += completion_tokens
-        self.metrics["llm_calls"]["total_tokens"] += total_tokens
-
-        if stage_name not in self.metrics["llm_calls"]["calls_by_stage"]:
-            self.metrics["llm_calls"]["calls_by_stage"][stage_name] = {"calls": 0, "tokens": 0}
-
-        self.metrics["llm_calls"]["calls_by_stage"][stage_name]["calls"] += 1
-        self.metrics["llm_calls"]["calls_by_stage"][stage_name]["tokens"] += total_tokens
-
-        if stage_name in self.metrics["stages"]:
-            self.metrics["stages"][stage_name]["llm_calls"] += 1
-            self.metrics["stages"][stage_name]["tokens_used"] += total_tokens
+    def _llm_stage(self, stage_name: str) -> Dict[str, Any]:
+        """获取（必要时创建）阶段的LLM调用统计"""
+        stage = self.metrics["llm_calls"]["calls_by_stage"].setdefault(stage_name, {})
+        for key in ("calls", "tokens", "cache_hits", "errors", "retries"):
+            stage.setdefault(key, 0)
+        stage.setdefault("backoff_seconds", 0.0)
+        return stage
+
+    def record_llm_call(
+        self,
+        stage_name: str,
+        usage: Optional[Dict[str, Any]] = None,
+        request_time: Optional[float] = None,
+        cache_hit: bool = False,
+        failed: bool = False
+    ):
+        """记录LLM调用（成功、缓存命中或重试后最终失败）
+
+        Args:
+            stage_name: 阶段名称（LLM客户端传入model_type）
+            usage: tokens用量（成功调用时）
+            request_time: 请求耗时（含重试等待）
+            cache_hit: 是否命中响应缓存（未发送请求）
+            failed: 是否最终失败
+        """
+        with self._lock:
+            stage = self._llm_stage(stage_name)
+            if request_time is not None:
+                self._latencies.setdefault(stage_name, []).append(request_time)
+            if cache_hit:
+                stage["cache_hits"] += 1
+                return
+            if failed:
+                stage["errors"] += 1
+                return
+
+            usage = usage or {}
+            self.metrics["llm_calls"]["total_calls"] += 1
+
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            total_tokens = usage.get("total_tokens", 0)
+
+            self.metrics["llm_calls"]["prompt_tokens"] += prompt_tokens
+            self.metrics["llm_calls"]["completion_tokens"] += completion_tokens
+            self.metrics["llm_calls"]["total_tokens"] += total_tokens
+
+            stage["calls"] += 1
+            stage["tokens"] += total_tokens
+
+            if stage_name in self.metrics["stages"]:
+                self.metrics["stages"][stage_name]["llm_calls"] += 1
+                self.metrics["stages"][stage_name]["tokens_used"] += total_tokens
+
+    def record_llm_retry(self, stage_name: str, wait_seconds: float):
+        """记录一次LLM请求重试及退避等待时间"""
+        with self._lock:
+            stage = self._llm_stage(stage_name)
+            stage["retries"] += 1
+            stage["backoff_seconds"] += wait_seconds
+
+    def get_llm_stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """按阶段汇总LLM调用：缓存命中率、重试、错误和耗时分位数"""
+        with self._lock:
+            summary = {}
+            for name, stage in self.metrics["llm_calls"]["calls_by_stage"].items():
+                stage = dict(stage)
+                requests = stage.get("calls", 0) + stage.get("cache_hits", 0)
+                latencies = self._latencies.get(name, [])
+                stage["cache_hit_ratio"] = round(stage.get("cache_hits", 0) / requests, 4) if requests else 0.0
+                stage["latency_p50_seconds"] = round(_percentile(latencies, 50), 3)
+                stage["latency_p99_seconds"] = round(_percentile(latencies, 99), 3)
+                summary[name] = stage
+            return summary
 
     def calculate_cost(self, prompt_price_per_1k: float = 0.001,
                       completion_price_per_1k: float = 0.002):
@@ -99,6 +167,7 @@ class PerformanceMonitor:
             "total_llm_calls": self.metrics["llm_calls"]["total_calls"],
             "total_tokens": self.metrics["llm_calls"]["total_tokens"],
             "estimated_cost_usd": self.calculate_cost(),
+            "llm_stages": self.get_llm_stage_summary(),
             "stages_summary": {
                 name: {
                     "duration_seconds": stage["duration_seconds"],
@@ -111,7 +180,8 @@ class PerformanceMonitor:
         }
 
     def save_metrics(self, filepath: str):
-        """保存指标到文件"""
+        """保存指标到文件（各阶段LLM统计附带缓存命中率和耗时分位数）"""
+        self.metrics["llm_calls"]["calls_by_stage"] = self.get_llm_stage_summary()
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(self.metrics, f, indent=2, default=str)
 
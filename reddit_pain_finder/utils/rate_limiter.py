@@ -0,0 +1,55 @@
+"""
+Rate limiter for Reddit Pain Point Finder
+令牌桶限流器 - 控制每分钟的请求数/令牌数，同步线程与异步协程共用
+"""
+import time
+import asyncio
+import threading
+
+
+class RateLimiter:
+    """每分钟配额的令牌桶
+
+    采用预约方式：acquire时立即扣减配额（允许为负），并按欠额计算需要等待的时间，
+    因此无需轮询，且多个调用方按到达顺序依次放行。
+    """
+
+    def __init__(self, per_minute: float):
+        """初始化令牌桶（容量与每分钟配额相同，初始为满）"""
+        if per_minute <= 0:
+            raise ValueError(f"per_minute must be positive: {per_minute}")
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0  # 每秒补充量
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """扣减配额并返回需要等待的秒数"""
+        # 单次请求超过桶容量时按容量计，避免永远等待
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, amount: float = 1):
+        """同步获取配额（不足时阻塞等待）"""
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1):
+        """异步获取配额（不足时让出事件循环等待）"""
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def refund(self, amount: float):
+        """按实际用量结算：退还多预约的配额（amount为负时补扣不足部分，不等待）"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)